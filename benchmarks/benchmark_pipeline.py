@@ -0,0 +1,131 @@
+"""
+End-to-end throughput benchmark of the InputParser -> URLGenerator -> CensusAPIClient -> MarkdownFormatter
+pipeline against the local mock Census API server (src/mock_census_server.py).
+
+Usage:
+    python benchmarks/benchmark_pipeline.py --statistics 30 --years 10 --locations 50 --latency-median 0.05
+    python benchmarks/benchmark_pipeline.py --config data/input/census_stats_config.json --throttle-rate 0.05
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.config_loader import config
+from input_parser import InputParser
+from url_generator import URLGenerator
+from census_api_client import CensusAPIClient
+from markdown_formatter import MarkdownFormatter
+from mock_census_server import MockCensusServer
+
+DATASETS = ['acs/acs5', 'acs/acs5/profile', 'acs/acs5/subject']
+
+
+def synthetic_config(statistics: int, years: int, locations: int) -> Dict[str, Any]:
+    """Build a stats config with `statistics` variables spread over a few datasets and `locations` places."""
+    year_list = list(range(2023 - years, 2023))
+    stats = []
+    for index in range(statistics):
+        dataset = DATASETS[index % len(DATASETS)]
+        stats.append({
+            'name': f"Statistic {index}",
+            'description': f"Synthetic statistic {index}",
+            'api_url': f"https://api.census.gov/data/[year]/{dataset}?get=B{index:05d}_001E&ucgid=1600000US1743250",
+            'years': year_list,
+        })
+    data = {'statistics': stats, 'location': "Benchmark, Illinois"}
+    if locations > 1:
+        data['locations'] = [{'name': f"Place {index}", 'ucgid': f"1600000US17{index:05d}"} for index in range(locations)]
+    return data
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_pipeline(config_path: str, output_dir: str, latencies: List[float]) -> int:
+    input_parser = InputParser(config_path)
+    input_parser.validate_structure()
+    geography = input_parser.get_geography()
+    batches = URLGenerator(input_parser.get_statistics(), geography).generate_batched_urls()
+
+    async with CensusAPIClient() as client:
+        make_request = client._make_request
+
+        async def timed_request(session, url):
+            start = time.perf_counter()
+            try:
+                return await make_request(session, url)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        client._make_request = timed_request
+        if geography:
+            results = await client.fetch_locations(batches)
+        else:
+            results = {input_parser.get_location(): await client.fetch_batched_data(batches)}
+
+    cells = 0
+    for name, location_results in results.items():
+        MarkdownFormatter(location_results).save_markdown(os.path.join(output_dir, f"{name}.md"), show_variable_key=False)
+        cells += sum(len(years) for years in location_results.values())
+    return cells
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    server = MockCensusServer(args.latency_median, args.latency_sigma, args.error_rate, args.throttle_rate, seed=args.seed)
+    base_url = await server.start()
+
+    config.config['api']['base_url'] = base_url
+    config.config.setdefault('cache', {})['enabled'] = False
+    if args.concurrency:
+        config.config['performance']['concurrent_requests'] = args.concurrency
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        config_path = args.config
+        if not config_path:
+            config_path = os.path.join(output_dir, 'benchmark_config.json')
+            with open(config_path, 'w') as f:
+                json.dump(synthetic_config(args.statistics, args.years, args.locations), f)
+
+        latencies: List[float] = []
+        start = time.perf_counter()
+        cells = await run_pipeline(config_path, output_dir, latencies)
+        elapsed = time.perf_counter() - start
+    await server.stop()
+
+    return {
+        'wall_time_s': round(elapsed, 3),
+        'requests': server.request_count,
+        'status_counts': server.status_counts,
+        'cells': cells,
+        'requests_per_s': round(server.request_count / elapsed, 1),
+        'cells_per_s': round(cells / elapsed, 1),
+        'latency_p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the full pipeline against the mock Census API")
+    parser.add_argument('--config', help="Stats config to run (default: a synthetic config)")
+    parser.add_argument('--statistics', type=int, default=30, help="Synthetic statistics")
+    parser.add_argument('--years', type=int, default=10, help="Synthetic years per statistic")
+    parser.add_argument('--locations', type=int, default=1, help="Synthetic locations")
+    parser.add_argument('--concurrency', type=int, help="Override performance.concurrent_requests")
+    parser.add_argument('--latency-median', type=float, default=0.05)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,64 @@
+"""
+Microbenchmarks for the CPU-bound parts of the pipeline at 10k+ items:
+CensusAPIClient.reformat_data / reformat_rows, URLGenerator.generate_urls / generate_batched_urls
+and MarkdownFormatter.generate_markdown.
+
+Usage:
+    python benchmarks/microbenchmarks.py --items 10000 --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Callable, Dict, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from url_generator import URLGenerator
+from census_api_client import CensusAPIClient
+from markdown_formatter import MarkdownFormatter
+from benchmark_pipeline import synthetic_config
+
+
+def best_of(function: Callable[[], Any], repeat: int) -> float:
+    """Return the fastest of `repeat` runs in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(items: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    client = CensusAPIClient()
+    years = 10
+    statistics = synthetic_config(items // years, years, 1)['statistics']
+    url_generator = URLGenerator(statistics)
+
+    responses = [[[f"B{index:05d}_001E", 'ucgid'], [str(index), '1600000US1743250']] for index in range(items)]
+    rows = [['B01003_001E', 'GEO_ID']] + [[str(index), f"1600000US17{index:05d}"] for index in range(items)]
+    report = {f"Statistic {index}": {2013 + year: [float(index * year), f"B{index:05d}_001E"] for year in range(years)}
+              for index in range(items // years)}
+
+    benchmarks = {
+        'reformat_data': lambda: [client.reformat_data(response) for response in responses],
+        'reformat_rows': lambda: client.reformat_rows(rows),
+        'generate_urls': url_generator.generate_urls,
+        'generate_batched_urls': url_generator.generate_batched_urls,
+        'generate_markdown': lambda: MarkdownFormatter(report).generate_markdown(show_variable_key=True),
+    }
+    results = {}
+    for name, function in benchmarks.items():
+        elapsed = best_of(function, repeat)
+        results[name] = {'items': items, 'seconds': round(elapsed, 4), 'items_per_s': round(items / elapsed)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks for parsing, URL generation and rendering")
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(main(args.items, args.repeat), indent=2))
@@ -1,125 +1,580 @@
 import aiohttp
 import asyncio
-from typing import Dict, Any, List, Tuple, Optional, Union
-import os, time, json
+import tempfile
+import numpy as np
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Tuple, Optional, Union, AsyncIterator, Iterable, NamedTuple, IO
+import os, time, json, itertools
+import urllib.parse
 from utils.logging_config import get_logger
 from utils.config_loader import config
-from input_parser import InputParser
-from url_generator import URLGenerator
+from response_cache import ResponseCache, CacheMissError, CACHE_MODES
+from request_scheduler import RequestScheduler
+from metrics import MetricsCollector
+from response_parser import RowStreamParser, parse_rows
+from variable_codes import LearnedCodes
+from result_cube import ResultCube
+from retry_policy import RetryPolicy, CircuitBreaker, CircuitOpenError, first_successful
 
 logger = get_logger(__name__)
+# Per-request records, rate-limited and sampled by the logging config; messages are formatted lazily
+request_logger = get_logger(f"{__name__}.requests")
+
+
+class ResultRecord(NamedTuple):
+    """One fetched cell: the [value, header] of a statistic for a year and geography (None for single-location fetches)."""
+    statistic: str
+    year: int
+    geography: Optional[str]
+    value: Optional[List[Union[float, str]]]
+
+
+class _Flight:
+    """An in-flight request shared by every caller that asks for the same URL while it runs."""
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: 'asyncio.Task'):
+        self.task = task
+        self.waiters = 0
+
 
 class CensusAPIClient:
-    def __init__(self):
-        self.max_retries = config.get('error_handling.max_retries', 3)
-        self.retry_delay = config.get('error_handling.retry_delay', 5)
-        self.concurrent_requests = config.get('performance.concurrent_requests', 5)
+    def __init__(self, cache_mode: Optional[str] = None, scheduler: Optional[RequestScheduler] = None):
+        """
+        Args:
+            cache_mode: 'use' serves responses from the persistent cache when present, 'refresh' always
+                re-downloads and updates the cache, 'offline' never touches the network. Defaults to
+                `cache.mode` in config.yaml. The cache is skipped entirely when `cache.enabled` is false,
+                except in 'offline' mode, which can only answer from it.
+            scheduler: The request scheduler to issue requests through. Defaults to one with the full rate limit.
+        """
+        self.retry_policy = RetryPolicy()
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
         self.request_timeout = config.get('performance.request_timeout', 30)
+        self.max_pending_batches = config.get('performance.max_pending_batches', 100)
+        self.stream_parse_threshold = config.get('performance.stream_parse_threshold', 1048576)
+        self.location_names: Dict[str, str] = {}
+        self.learn_codes = config.get('variable_codes.learn', True)
+        # {(year, primary_url): backup_url} of codes learned since they were last written to LearnedCodes
+        self.learned_codes: Dict[Tuple[int, str], str] = {}
+        # URLs answered with a deterministic 4xx, e.g. a variable code that does not exist in that vintage (an ordered set)
+        self.rejected_urls: Dict[str, None] = {}
+        # Both maps live as long as the client, so the oldest entries are dropped past this size
+        self.max_tracked_entries = config.get('performance.max_tracked_entries', 100000)
+        self.scheduler = scheduler or RequestScheduler()
+        self.metrics = MetricsCollector()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._in_flight: Dict[str, _Flight] = {}
+
+        self.cache_mode = cache_mode or config.get('cache.mode', 'use')
+        if self.cache_mode not in CACHE_MODES:
+            raise ValueError(f"Invalid cache mode '{self.cache_mode}', expected one of {CACHE_MODES}")
+        self.cache = ResponseCache() if config.get('cache.enabled', True) or self.cache_mode == 'offline' else None
+
+    async def __aenter__(self) -> 'CensusAPIClient':
+        self.session = self.scheduler.create_session(trace_configs=[self.metrics.trace_config()])
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the pooled session opened by `async with CensusAPIClient()` and the response cache."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        await self._save_learned_codes()
+        if self.cache is not None:
+            await self.cache.flush_async()
+            # Stops the cache's worker thread and closes its SQLite connection
+            self.cache.close()
+
+    @asynccontextmanager
+    async def _session_scope(self) -> AsyncIterator[aiohttp.ClientSession]:
+        # Reuse the pooled session when the client is used as a context manager, otherwise open one per fetch
+        if self.session is not None and not self.session.closed:
+            yield self.session
+            return
+        async with self.scheduler.create_session(trace_configs=[self.metrics.trace_config()]) as session:
+            yield session
+        await self._save_learned_codes()
+        if self.cache is not None:
+            await self.cache.flush_async()
 
     async def fetch_data(self, urls: Dict[str, Dict[int, Dict[str, str]]]) -> Dict[str, Dict[int, Optional[Dict[str, Any]]]]:
         """Fetch data for multiple URLs concurrently."""
         logger.info("Starting data fetch process")
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for stat_name, year_urls in urls.items():
-                for year, url_types in year_urls.items():
-                    primary_url = url_types.get('primary')
-                    backup_url = url_types.get('backup')
-                    task = asyncio.ensure_future(self._fetch_with_retry(session, stat_name, year, primary_url, backup_url))
-                    tasks.append(task)
-
-            semaphore = asyncio.Semaphore(self.concurrent_requests)
-            results = await asyncio.gather(*[self._bounded_fetch(semaphore, task) for task in tasks])
-
-        organized_results = {}
-        for result in results:
-            stat_name, year, data = result
-            if stat_name not in organized_results:
-                organized_results[stat_name] = {}
-            # organized_results[stat_name][year] = self.process_response(data) if data else None
-            organized_results[stat_name][year] = self.reformat_data(data) if data else None
-            # data is [[header1, header2], [VALUE1, value2]]
-            # Creae a function to process the response
-            # Function should return a list like so[VALUE1, header1]
+        batches = [
+            {'year': year, 'primary': url_types.get('primary'), 'statistics': {stat_name: None}, 'fallback': {stat_name: url_types}}
+            for stat_name, year_urls in urls.items()
+            for year, url_types in year_urls.items()
+        ]
+        organized_results = self._result_order(batches)
+        async for record in self.iter_results(batches):
+            organized_results[record.statistic][record.year] = record.value
 
         logger.info("Data fetch process completed")
         return organized_results
 
-    async def _bounded_fetch(self, semaphore: asyncio.Semaphore, task: asyncio.Future) -> Tuple[str, int, Any]:
-        async with semaphore:
-            return await task
+    async def fetch_batched_data(self, batches: List[Dict[str, Any]]) -> Dict[str, Dict[int, Optional[List[Union[float, str]]]]]:
+        """
+        Fetch data for batched requests generated by URLGenerator.generate_batched_urls.
+
+        Each batch is issued as a single `get=A,B,C` request and its columns are split back into
+        per-statistic results. Statistics missing from a batched response (or batches that fail
+        outright) fall back to the per-statistic primary/backup URLs.
+        """
+        logger.info(f"Starting batched data fetch process for {len(batches)} requests")
+        organized_results = self._result_order(batches)
+        async for record in self.iter_results(batches):
+            organized_results[record.statistic][record.year] = record.value
+
+        logger.info("Batched data fetch process completed")
+        return organized_results
+
+    async def fetch_locations(self, batches: List[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[int, Optional[List[Union[float, str]]]]]]:
+        """
+        Fetch data for multi-geography batches and demultiplex the rows by geography identifier.
+
+        Location names found in the responses' NAME column are collected in `self.location_names`.
+
+        Returns:
+            A dictionary keyed by geography identifier (ucgid / GEO_ID), each holding the same
+            {statistic: {year: [value, header]}} structure returned by fetch_batched_data.
+        """
+        logger.info(f"Starting multi-location data fetch process for {len(batches)} requests")
+        location_results = {}
+        async for record in self.iter_results(batches):
+            location_results.setdefault(record.geography, {}).setdefault(record.statistic, {})[record.year] = record.value
+
+        # Results arrive in completion order, restore the statistic/year order of the config for each location
+        order = self._result_order(batches)
+        organized_results = {
+            geo_id: {stat_name: {year: cells[stat_name][year] for year in years if year in cells[stat_name]}
+                     for stat_name, years in order.items() if stat_name in cells}
+            for geo_id, cells in location_results.items()
+        }
+
+        logger.info(f"Multi-location data fetch process completed for {len(organized_results)} locations")
+        return organized_results
+
+    async def fetch_cube(self, batches: List[Dict[str, Any]], cube: Optional[ResultCube] = None) -> ResultCube:
+        """
+        Fetch batches straight into an array-backed ResultCube, filling it in place as each request completes.
+        Works for single-location batches (geography None) and multi-geography batches alike.
+
+        Args:
+            batches: Batches generated by URLGenerator.generate_batched_urls.
+            cube: A cube to fill; by default a new one is created for the batches' statistics and years.
+        """
+        cube = cube if cube is not None else ResultCube.from_batches(batches)
+        logger.info(f"Starting data fetch into a result cube for {len(batches)} requests")
+        async for record in self.iter_results(batches):
+            cube.add(record)
+        logger.info(f"Filled result cube with {len(cube.geographies)} locations ({cube.nbytes / 1e6:.1f} MB)")
+        return cube
+
+    def _result_order(self, batches: List[Dict[str, Any]]) -> Dict[str, Dict[int, None]]:
+        """Return an empty {statistic: {year: None}} skeleton with statistics in config order."""
+        order = {}
+        positions = {}
+        for batch in batches:
+            for stat_name in batch['statistics']:
+                order.setdefault(stat_name, {})[batch['year']] = None
+                positions.setdefault(stat_name, batch.get('positions', {}).get(stat_name, len(positions)))
+        return {stat_name: order[stat_name] for stat_name in sorted(order, key=positions.get)}
+
+    async def iter_results(self, batches: Iterable[Dict[str, Any]]) -> AsyncIterator[ResultRecord]:
+        """
+        Fetch batches and yield one ResultRecord per statistic, year and geography as soon as its request completes.
+
+        At most `performance.max_pending_batches` batches are scheduled at a time, so results are handed to the
+        consumer incrementally instead of accumulating until the slowest request finishes. `batches` may be a
+        lazy iterable. The geography of a record is None for single-location batches.
+        """
+        batch_iter = iter(batches)
+        pending = set()
+        async with self._session_scope() as session:
+            try:
+                while True:
+                    while len(pending) < self.max_pending_batches:
+                        batch = next(batch_iter, None)
+                        if batch is None:
+                            break
+                        pending.add(asyncio.ensure_future(self._fetch_batch(session, batch)))
+                    if not pending:
+                        break
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        for record in task.result():
+                            yield record
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    async def _fetch_batch(self, session: aiohttp.ClientSession, batch: Dict[str, Any]) -> List[ResultRecord]:
+        year = batch['year']
+        statistics = batch['statistics']
+        multi_location = bool(batch.get('geography'))
+        data = None
+        if len(statistics) > 1 or batch.get('strategy') == 'group':
+            try:
+                # A batched get=A,B,C or get=group(TABLE) request; each statistic's column is extracted locally
+                data = await self._make_request(session, batch['primary'])
+                request_logger.info("Successfully fetched %d statistics for year %s in one request", len(statistics), year)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                request_logger.warning("Batched request failed for year %s, falling back to single requests: %s", year, e)
+
+        results = []
+        fallbacks = []
+        for stat_name, variable in statistics.items():
+            split = self._split_response(data, variable, multi_location) if data else []
+            if not split:
+                url_types = batch['fallback'][stat_name]
+                fallbacks.append(self._fetch_with_retry(session, stat_name, year, url_types.get('primary'), url_types.get('backup')))
+            else:
+                results.extend(ResultRecord(stat_name, year, geo_id, value) for geo_id, value in split)
+
+        for stat_name, year, single in await asyncio.gather(*fallbacks):
+            split = self._split_response(single, None, multi_location) if single else []
+            if not split and not multi_location:
+                split = [(None, None)]
+            results.extend(ResultRecord(stat_name, year, geo_id, value) for geo_id, value in split)
+        return results
+
+    def _split_response(self, data: List[List[str]], variable: Optional[str], multi_location: bool) -> List[Tuple[Optional[str], Optional[List[Union[float, str]]]]]:
+        """Split a response into (geography identifier, [value, header]) pairs for one statistic."""
+        if multi_location:
+            return list(self.reformat_rows(data, variable).items())
+        value = self.reformat_data(data, variable)
+        return [(None, value)] if value is not None else []
 
     async def _fetch_with_retry(self, session: aiohttp.ClientSession, stat_name: str, year: int, primary_url: str, backup_url: Optional[str] = None) -> Tuple[str, int, Optional[List[List[str]]]]:
-        for attempt in range(self.max_retries):
+        if backup_url and self.retry_policy.hedge_delay is not None:
+            data = await self._fetch_hedged(session, stat_name, year, primary_url, backup_url)
+        else:
+            data = await self._fetch_url_with_retry(session, stat_name, year, primary_url, 'primary')
+            if data is None and backup_url:
+                self.metrics.increment('backup_requests')
+                data = await self._fetch_url_with_retry(session, stat_name, year, backup_url, 'backup')
+                if data is not None:
+                    self._learn_code(year, primary_url, backup_url)
+        if data is None:
+            request_logger.error("Failed to fetch data for %s, year %s", stat_name, year)
+        return stat_name, year, data
+
+    async def _fetch_hedged(self, session: aiohttp.ClientSession, stat_name: str, year: int, primary_url: str, backup_url: str) -> Optional[List[List[str]]]:
+        """Issue the primary URL, and the backup URL as well if the primary has not succeeded within the hedge delay."""
+        primary = asyncio.ensure_future(self._fetch_url_with_retry(session, stat_name, year, primary_url, 'primary'))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.retry_policy.hedge_delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done and primary.result() is not None:
+            return primary.result()
+        self.metrics.increment('backup_requests')
+        if done:
+            data = await self._fetch_url_with_retry(session, stat_name, year, backup_url, 'backup')
+            if data is not None:
+                self._learn_code(year, primary_url, backup_url)
+            return data
+        request_logger.info("Primary URL for %s, year %s is slow, hedging with backup URL", stat_name, year)
+        self.metrics.increment('hedged_requests')
+        backup = asyncio.ensure_future(self._fetch_url_with_retry(session, stat_name, year, backup_url, 'backup'))
+        return await first_successful(primary, backup)
+
+    def _learn_code(self, year: int, primary_url: str, backup_url: str) -> None:
+        """
+        Remember the backup code when the primary URL was rejected, so the next plan requests it up front. Codes
+        are kept in memory and written out together when the session is closed (see `_save_learned_codes`).
+        """
+        if self.learn_codes and primary_url in self.rejected_urls:
+            self.learned_codes[(year, primary_url)] = backup_url
+
+    async def _save_learned_codes(self) -> None:
+        """Write the learned codes to LearnedCodes in one transaction, off the event loop."""
+        if not self.learned_codes:
+            return
+        learned, self.learned_codes = self.learned_codes, {}
+
+        def save():
+            learned_codes = LearnedCodes()
+            try:
+                learned_codes.record_many((year, primary_url, backup_url) for (year, primary_url), backup_url in learned.items())
+            finally:
+                learned_codes.close()
+        await asyncio.get_running_loop().run_in_executor(None, save)
+
+    async def _fetch_url_with_retry(self, session: aiohttp.ClientSession, stat_name: str, year: int, url: str, url_type: str) -> Optional[List[List[str]]]:
+        if not url:
+            return None
+        breaker = self._circuit_breaker_for(url)
+        for attempt in range(self.retry_policy.max_retries):
+            trial = False
             try:
-                data = await self._make_request(session, primary_url)
-                logger.info(f"Successfully fetched data for {stat_name}, year {year} using primary URL")
-                return stat_name, year, data
-            except aiohttp.ClientError as e:
-                logger.warning(f"Attempt {attempt + 1} failed for {stat_name}, year {year} using primary URL: {str(e)}")
-                if backup_url and attempt == self.max_retries - 1:
-                    try:
-                        data = await self._make_request(session, backup_url)
-                        logger.info(f"Successfully fetched data for {stat_name}, year {year} using backup URL")
-                        return stat_name, year, data
-                    except aiohttp.ClientError as be:
-                        logger.error(f"Backup URL fetch failed for {stat_name}, year {year}: {str(be)}")
-                elif attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                else:
-                    logger.error(f"Failed to fetch data for {stat_name}, year {year} after {self.max_retries} attempts")
-        return stat_name, year, None
+                state = breaker.state
+                if not breaker.allow():
+                    raise CircuitOpenError(f"Circuit breaker for {breaker.name} is open")
+                trial = state != 'closed'
+                try:
+                    data = await self._make_request(session, url)
+                    breaker.record_success()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if self.retry_policy.is_retryable(e):
+                        breaker.record_failure()
+                    elif isinstance(e, aiohttp.ClientResponseError):
+                        # A deterministic 4xx still means the endpoint is up
+                        breaker.record_success()
+                        self.rejected_urls[url] = None
+                        self._bound(self.rejected_urls)
+                    raise
+                finally:
+                    if trial:
+                        # A trial that was cancelled, or that failed in a way that says nothing about the endpoint
+                        # (a malformed payload, an offline cache miss), is released without being counted
+                        breaker.release_trial()
+                request_logger.info("Successfully fetched data for %s, year %s using %s URL", stat_name, year, url_type)
+                return data
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                retryable = self.retry_policy.is_retryable(e)
+                request_logger.warning("Attempt %d failed for %s, year %s using %s URL: %s", attempt + 1, stat_name, year, url_type, e)
+                if not retryable or attempt == self.retry_policy.max_retries - 1:
+                    return None
+                self.metrics.increment('retries')
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+        return None
+
+    def _circuit_breaker_for(self, url: str) -> CircuitBreaker:
+        parts = urllib.parse.urlsplit(url)
+        endpoint = f"{parts.netloc}{parts.path}"
+        if endpoint not in self.circuit_breakers:
+            self.circuit_breakers[endpoint] = CircuitBreaker(endpoint)
+        return self.circuit_breakers[endpoint]
 
     async def _make_request(self, session: aiohttp.ClientSession, url: str) -> List[List[str]]:
-        async with session.get(url, timeout=self.request_timeout) as response:
-            response.raise_for_status()
-            data = await response.json()
-            if not isinstance(data, list) or not all(isinstance(row, list) for row in data):
-                raise ValueError("Unexpected response format from API")
-            return data
+        """
+        Request a URL, coalescing concurrent calls for the same normalized URL (API key and parameter
+        order ignored) into a single request whose parsed response is shared by every caller.
+        The shared request is only cancelled once every caller waiting on it has been cancelled.
+        """
+        key = ResponseCache.normalize_url(url)
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._send_request(session, url)))
+            self._in_flight[key] = flight
+            flight.task.add_done_callback(lambda _: self._in_flight.pop(key, None) if self._in_flight.get(key) is flight else None)
+        else:
+            self.metrics.increment('coalesced_requests')
+            request_logger.debug("Joining in-flight request for %s", key)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    async def _send_request(self, session: aiohttp.ClientSession, url: str) -> List[List[str]]:
+        if self.cache is not None and self.cache_mode != 'refresh':
+            body = await self.cache.get_async(url)
+            if body is not None:
+                self.metrics.increment('cache_hits')
+                return parse_rows(body)
+            self.metrics.increment('cache_misses')
+            if self.cache_mode == 'offline':
+                raise CacheMissError(f"No cached response for {ResponseCache.normalize_url(url)}")
+
+        start = time.perf_counter()
+        async with self.scheduler.slot(url) as slot:
+            self.metrics.increment('requests')
+            request_start = time.perf_counter()
+            try:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=self.request_timeout)) as response:
+                    slot.status = response.status
+                    self.metrics.record_status(response.status)
+                    headers_received = time.perf_counter()
+                    response.raise_for_status()
+                    spool = None
+                    if response.content_length is not None and response.content_length < self.stream_parse_threshold:
+                        raw_body = await response.read()
+                        body_read = time.perf_counter()
+                        data = parse_rows(raw_body)
+                        parse_seconds = time.perf_counter() - body_read
+                        bytes_received = len(raw_body)
+                    else:
+                        data, spool, parse_seconds, bytes_received = await self._stream_rows(response)
+                        body_read = time.perf_counter() - parse_seconds
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.metrics.increment('errors')
+                raise
+        self.metrics.observe('concurrency_wait', slot.concurrency_wait)
+        self.metrics.observe('rate_limit_wait', slot.rate_limit_wait)
+        self.metrics.observe('ttfb', headers_received - request_start)
+        self.metrics.observe('body_read', body_read - headers_received)
+        self.metrics.observe('parse', parse_seconds)
+        self.metrics.observe('total', time.perf_counter() - start)
+        self.metrics.increment('bytes_received', bytes_received)
+        if spool is not None:
+            try:
+                await self.cache.set_file_async(url, spool, bytes_received)
+            finally:
+                spool.close()
+        elif self.cache is not None:
+            await self.cache.set_async(url, raw_body)
+        return data
+
+    async def _stream_rows(self, response: aiohttp.ClientResponse) -> Tuple[List[List[str]], Optional[IO[bytes]], float, int]:
+        """
+        Parse a large (or unsized) response row by row as its chunks arrive, instead of buffering the whole body
+        and parsing it in one go. When the cache is enabled the body is spooled to a temporary file, which the
+        cache copies in chunks, so the raw body is never held in memory next to the parsed rows.
+
+        Returns:
+            The rows, the spooled body (None when the cache is disabled), the seconds spent parsing and the bytes received.
+        """
+        parser = RowStreamParser()
+        rows: List[List[str]] = []
+        spool = tempfile.TemporaryFile() if self.cache is not None else None
+        parse_seconds = 0.0
+        try:
+            async for chunk in response.content.iter_chunked(65536):
+                if spool is not None:
+                    spool.write(chunk)
+                parse_start = time.perf_counter()
+                rows.extend(parser.feed(chunk))
+                parse_seconds += time.perf_counter() - parse_start
+            parser.close()
+        except BaseException:
+            if spool is not None:
+                spool.close()
+            raise
+        return rows, spool, parse_seconds, parser.bytes_parsed
     
-    def reformat_data(self, data: List[List[str]]) -> Optional[List[Union[float, str]]]:
+    def reformat_data(self, data: List[List[str]], variable: Optional[str] = None) -> Optional[List[Union[float, str]]]:
         """
         Reformats data by getting header1 (key identifier of the stat data) and value1 (value of the stat data) from the input list.
         Input list is the response data from the API.
         Output is a list with header1 and value1 as the first two elements.
 
+        When `variable` is given (batched requests), the column whose header matches it is used instead of the first column.
+
         Args:
             data (List[List[str]]): Response from the Census API in the format: [[header1, header2], [value1, value2]]
+            variable (Optional[str]): Header of the column to extract. Defaults to the first column.
 
         Returns:
             List[str]: Reformatted data in the format: [value1, header1]
         """
-        logger.debug(f"Reformatting data: {data}")
+        logger.debug("Reformatting data: %s", data)
 
         # Check if input is valid format, check if there is a value for the first elements of each list
         if len(data) != 2 or len(data[0]) != len(data[1]):
             logger.error("Invalid input data format")
             return None
-        elif not data[0][0] or not data[1][0]:
-            logger.error(f"No data found as statistic header or value.\nStatistic:{data}")
+
+        column = 0
+        if variable is not None:
+            if variable not in data[0]:
+                logger.warning("Variable %s not found in response headers: %s", variable, data[0])
+                return None
+            column = data[0].index(variable)
+
+        if not data[0][column] or not data[1][column]:
+            logger.error("No data found as statistic header or value.\nStatistic:%s", data)
             return None
 
         # Extract the headers and values from the input list
-        header = data[0][0]
-        value = data[1][0]
+        header = data[0][column]
+        value = data[1][column]
 
         # Try to convert value to an float, except error and give warning
-        try:
-            value = float(value)
-        except ValueError as e:
-            logger.warning(f"Failed to convert value ({value}) to float: {str(e)}")
+        value = self._convert_value(value)
         
         # Reformat the data by swapping the positions of the first value and first header
         reformatted_data = [value, header]
-        logger.debug(f"Reformatted data: {reformatted_data}")
+        logger.debug("Reformatted data: %s", reformatted_data)
         return reformatted_data
 
+    def reformat_rows(self, data: List[List[str]], variable: Optional[str] = None) -> Dict[str, Optional[List[Union[float, str]]]]:
+        """
+        Reformats a multi-row response (one row per geography) into [value, header] pairs keyed by geography.
+        Rows are keyed by the GEO_ID column when present, otherwise by the ucgid column.
+        Names from the NAME column are recorded in `self.location_names`.
+
+        Args:
+            data (List[List[str]]): Response from the Census API in the format: [[header1, ..., GEO_ID], [value1, ..., geo_id1], ...]
+            variable (Optional[str]): Header of the column to extract. Defaults to the first column.
+
+        Returns:
+            Dict[str, List]: Reformatted data in the format: {geo_id: [value, header]}
+        """
+        if not data or len(data) < 2:
+            logger.error("Invalid input data format")
+            return {}
+
+        headers = data[0]
+        geo_column = next((headers.index(key) for key in ('GEO_ID', 'ucgid') if key in headers), None)
+        if geo_column is None:
+            logger.error("No geography identifier column found in response headers: %s", headers)
+            return {}
+
+        column = 0
+        if variable is not None:
+            if variable not in headers:
+                logger.warning("Variable %s not found in response headers: %s", variable, headers)
+                return {}
+            column = headers.index(variable)
+        name_column = headers.index('NAME') if 'NAME' in headers else None
+
+        header = headers[column]
+        body = data[1:]
+        geo_ids = [row[geo_column] for row in body]
+        if name_column is not None:
+            self.location_names.update(zip(geo_ids, [row[name_column] for row in body]))
+            self._bound(self.location_names)
+        values = self._convert_values([row[column] for row in body])
+        rows = {geo_id: [value, header] if value is not None else None for geo_id, value in zip(geo_ids, values)}
+        logger.debug("Reformatted %d rows for %s", len(rows), header)
+        return rows
+
+    def _bound(self, entries: Dict[str, Any]) -> None:
+        """Drop the oldest entries of a long-lived map past `performance.max_tracked_entries`."""
+        for key in list(itertools.islice(entries, max(len(entries) - self.max_tracked_entries, 0))):
+            del entries[key]
+
+    def _convert_values(self, values: List[Optional[str]]) -> List[Optional[Union[float, str]]]:
+        """
+        Convert a column of values to floats with one NumPy conversion. Only when the column holds a non-numeric
+        value does it fall back to converting (and warning about) each value separately. None values stay None.
+        """
+        try:
+            converted = np.array(values, dtype=np.float64).tolist()
+        except (TypeError, ValueError):
+            return [self._convert_value(value) if value is not None else None for value in values]
+        if None in values:
+            # NumPy reads None as NaN
+            for index, value in enumerate(values):
+                if value is None:
+                    converted[index] = None
+        return converted
+
+    def _convert_value(self, value: str) -> Union[float, str]:
+        try:
+            return float(value)
+        except (TypeError, ValueError) as e:
+            logger.warning("Failed to convert value (%s) to float: %s", value, e)
+            return value
+
 
 # Usage example remains the same
 
 # Usage example
 async def main():
+    from input_parser import InputParser
+    from url_generator import URLGenerator
+
     # Get the directory of the current script
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -130,15 +585,13 @@ async def main():
     input_parser = InputParser(json_path)
     statistics = input_parser.get_statistics()
 
-    # Generate URLs
+    # Generate batched URLs
     url_generator = URLGenerator(statistics)
-    urls = url_generator.generate_urls()
-
-    # url_generator.print_urls(urls)
+    batches = url_generator.generate_batched_urls()
 
     # Fetch data
     client = CensusAPIClient()
-    results = await client.fetch_data(urls)
+    results = await client.fetch_batched_data(batches)
 
     print(json.dumps(results, indent=2))
 if __name__ == "__main__":
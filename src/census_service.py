@@ -0,0 +1,192 @@
+import asyncio
+import argparse
+from typing import Dict, Any, List, Optional, NamedTuple, Tuple
+from aiohttp import web
+from utils.logging_config import get_logger
+from utils.config_loader import config
+from input_parser import InputParser
+from url_generator import URLGenerator
+from census_api_client import CensusAPIClient
+from markdown_formatter import MarkdownFormatter
+from variable_index import VariableIndex
+from variable_codes import LearnedCodes
+from derived_metrics import DerivedMetricsEngine
+
+logger = get_logger(__name__)
+
+OUTPUT_FORMATS = ('markdown', 'json')
+
+
+class _Job(NamedTuple):
+    input_parser: InputParser
+    batches: List[Dict[str, Any]]
+    engine: DerivedMetricsEngine
+    output_format: str
+    show_variable_key: bool
+    deadline: float
+    future: asyncio.Future
+
+
+class CensusService:
+    """
+    Long-running HTTP service that generates reports on request.
+
+    POST a statistics config (the same JSON as data/input/census_stats_config.json, with a `location`,
+    a `locations` list or a `geography` wildcard) to /reports and get the report back as Markdown or
+    JSON. The client session pool, response cache, circuit breakers and variable index stay open
+    across requests. Requests wait in a bounded queue served by `service.workers` workers: when the
+    queue is full the service answers 503, and requests that take longer than `service.request_timeout`
+    seconds (queue time included) are answered with 504.
+
+        POST /reports?format=markdown|json[&show_variable_key=true]
+        GET  /health
+        GET  /metrics    (Prometheus text format)
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue_size: Optional[int] = None, request_timeout: Optional[float] = None):
+        self.workers = workers or config.get('service.workers', 4)
+        self.max_queue_size = max_queue_size or config.get('service.max_queue_size', 100)
+        self.request_timeout = request_timeout or config.get('service.request_timeout', 120)
+        self.client: Optional[CensusAPIClient] = None
+        self.variable_index: Optional[VariableIndex] = None
+        # Learned variable codes, read once at startup instead of for every request
+        self.learned_codes: Dict[Tuple[str, int, str], str] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self.served = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/reports', self.handle_report)
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/metrics', self.handle_metrics)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    async def _start(self, app: web.Application) -> None:
+        self.client = await CensusAPIClient().__aenter__()
+        self.variable_index = VariableIndex.open_if_exists()
+        self.learned_codes = LearnedCodes.load_mappings() if config.get('variable_codes.learn', True) else {}
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker_tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Report service started with {self.workers} workers and a queue of {self.max_queue_size}")
+
+    async def _stop(self, app: web.Application) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        await self.client.close()
+        if self.variable_index is not None:
+            self.variable_index.close()
+        logger.info("Report service stopped")
+
+    async def handle_report(self, request: web.Request) -> web.Response:
+        output_format = request.query.get('format', 'markdown')
+        if output_format not in OUTPUT_FORMATS:
+            return web.json_response({'error': f"Unknown format '{output_format}', expected one of {OUTPUT_FORMATS}"}, status=400)
+        try:
+            input_parser = InputParser.from_dict(await request.json())
+            input_parser.validate_structure(self.variable_index)
+            # Rollups and peers need the whole fetched cube (see main.py); reject them rather than drop them
+            unsupported = [key for key, value in (('rollups', input_parser.get_rollups()), ('peers', input_parser.get_peers())) if value]
+            if unsupported:
+                raise ValueError(f"{' and '.join(unsupported)} are not supported by the report service, use main.py")
+            engine = DerivedMetricsEngine(input_parser.get_statistics())
+            batches = URLGenerator(input_parser.get_statistics(), input_parser.get_geography(),
+                                   self.learned_codes).generate_batched_urls()
+        except ValueError as e:
+            return web.json_response({'error': f"Invalid config: {e}"}, status=400)
+
+        loop = asyncio.get_running_loop()
+        job = _Job(input_parser, batches, engine, output_format, request.query.get('show_variable_key') == 'true',
+                   loop.time() + self.request_timeout, loop.create_future())
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Report queue is full ({self.max_queue_size}), rejecting request")
+            return web.json_response({'error': "Service is busy, retry later"}, status=503, headers={'Retry-After': '1'})
+
+        try:
+            reports = await asyncio.wait_for(job.future, timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return web.json_response({'error': f"Report not generated within {self.request_timeout} seconds"}, status=504)
+        except Exception as e:
+            logger.error(f"Report generation failed: {str(e)}")
+            return web.json_response({'error': str(e)}, status=500)
+
+        self.served += 1
+        if output_format == 'markdown' and len(reports) == 1:
+            return web.Response(text=reports[0]['markdown'], content_type='text/markdown')
+        return web.json_response({'reports': reports})
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'ok',
+            'queued': self.queue.qsize(),
+            'max_queue_size': self.max_queue_size,
+            'served': self.served,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.client.metrics.to_prometheus(), content_type='text/plain')
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                # Requests that timed out (or whose caller went away) while queued are skipped
+                if job.future.done():
+                    continue
+                remaining = job.deadline - loop.time()
+                result = await asyncio.wait_for(self._generate(job), timeout=max(remaining, 0))
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def _generate(self, job: _Job) -> List[Dict[str, Any]]:
+        """Fetch the data of a job and render one report per location."""
+        input_parser = job.input_parser
+        cube = await self.client.fetch_cube(job.batches)
+        if input_parser.get_geography():
+            # The client collects names across jobs, so only this job's places are taken from it
+            location_names = {geo_id: self.client.location_names[geo_id] for geo_id in cube.geographies if geo_id in self.client.location_names}
+            location_names.update({location['ucgid']: location['name'] for location in input_parser.get_locations()})
+        else:
+            location_names = {None: input_parser.get_location()}
+        derived = job.engine.compute(cube) if job.engine else {}
+
+        if job.output_format == 'json':
+            return [{'geography': geo_id, 'location': location_names.get(geo_id, geo_id), 'statistics': cube.location(geo_id).to_dict(),
+                     'derived': derived.get(geo_id, {})}
+                    for geo_id in cube.geographies]
+        return [{'geography': geo_id, 'location': location_names.get(geo_id, geo_id),
+                 'markdown': MarkdownFormatter.from_cube(cube, geo_id, derived.get(geo_id)).generate_markdown(job.show_variable_key)}
+                for geo_id in cube.geographies]
+
+
+# Usage example
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve census reports over HTTP")
+    parser.add_argument('--host', default=config.get('service.host', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=config.get('service.port', 8080))
+    parser.add_argument('--workers', type=int, help="Reports generated concurrently (default: service.workers)")
+    parser.add_argument('--max-queue-size', type=int, help="Queued reports before answering 503 (default: service.max_queue_size)")
+    parser.add_argument('--request-timeout', type=float, help="Seconds per report before answering 504 (default: service.request_timeout)")
+    args = parser.parse_args()
+
+    service = CensusService(args.workers, args.max_queue_size, args.request_timeout)
+    web.run_app(service.create_app(), host=args.host, port=args.port)
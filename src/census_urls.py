@@ -0,0 +1,27 @@
+import urllib.parse
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a request URL into a cache key: lowercase scheme and host, drop the API key
+    and sort the remaining query parameters.
+
+    Args:
+        url: The request URL.
+
+    Returns:
+        The normalized URL.
+    """
+    parts = urllib.parse.urlsplit(url)
+    params = sorted(param for param in parts.query.split('&') if param and not param.startswith('key='))
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, '&'.join(params), ''))
+
+
+def dataset_of(url: str) -> str:
+    """Return the dataset path of a Census API URL, e.g. 'acs/acs5/profile' for /data/2020/acs/acs5/profile."""
+    segments = [segment for segment in urllib.parse.urlsplit(url).path.split('/') if segment]
+    if segments and segments[0] == 'data':
+        segments = segments[1:]
+    if segments and segments[0].isdigit():
+        segments = segments[1:]
+    return '/'.join(segments)
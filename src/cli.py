@@ -0,0 +1,193 @@
+"""
+Command line entry point for the Census Data Retrieval Tool.
+
+    python src/cli.py validate [CONFIG]          Validate a stats config (and its variable codes, if indexed)
+    python src/cli.py plan [CONFIG]              Show the requests a config would issue
+    python src/cli.py fetch [CONFIG]             Fetch the data and write reports or exports
+    python src/cli.py render EXPORT              Render markdown reports from a long-layout CSV/JSONL export
+    python src/cli.py serve                      Serve reports over HTTP (see census_service.py)
+    python src/cli.py job CONFIG                 Run a large config as a sharded, resumable multi-process job
+
+Heavy modules (aiohttp, the client, the writers) are only imported by the subcommands that need them,
+so short commands like `validate` and `render` start quickly.
+"""
+import os
+import sys
+import argparse
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "input", "census_stats_config.json")
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "output")
+
+
+def validate_command(args: argparse.Namespace) -> int:
+    from utils.logging_config import defer_setup
+    from input_parser import InputParser
+    from variable_index import VariableIndex
+
+    defer_setup()
+    try:
+        input_parser = InputParser(args.config)
+        input_parser.validate_structure(None if args.no_index else VariableIndex.open_if_exists())
+    except (ValueError, IOError) as e:
+        print(f"Invalid config: {e}")
+        return 1
+    print(f"{args.config} is valid")
+    return 0
+
+
+def plan_command(args: argparse.Namespace) -> int:
+    from utils.logging_config import defer_setup
+    from input_parser import InputParser
+    from url_generator import URLGenerator
+    from request_plan import RequestPlan
+
+    defer_setup()
+    try:
+        input_parser = InputParser(args.config)
+        input_parser.validate_structure()
+    except (ValueError, IOError) as e:
+        print(f"Invalid config: {e}")
+        return 1
+    plan = RequestPlan.compile(URLGenerator(input_parser.get_statistics(), input_parser.get_geography()).generate_batched_urls())
+    print(f"{len(plan)} requests for {plan.cells()} statistic/year pairs "
+          f"({', '.join(f'{count} {strategy}' for strategy, count in plan.strategies().items())})")
+    if args.show_urls:
+        for request in plan:
+            print(f"  {request.year} [{request.strategy}] {', '.join(request.statistics)}: {request.url}")
+
+    if args.dry_run:
+        from utils.config_loader import config
+        from response_cache import ResponseCache
+
+        cache = ResponseCache() if config.get('cache.enabled', True) else None
+        estimate = plan.estimate(cache, args.concurrency, args.latency)
+        if cache is not None:
+            cache.close()
+        print(f"Cache: {estimate.cached} of {estimate.requests} requests cached ({estimate.cache_hit_ratio:.1%} hit ratio)")
+        print(f"Estimated wall time: {estimate.estimated_seconds:.1f}s for {estimate.network_requests} network requests "
+              f"(concurrency {estimate.concurrency}, {estimate.rate_limit} requests/s per host, {estimate.latency}s per request)")
+
+    if args.diff:
+        added, removed = plan.diff(RequestPlan.load(args.diff))
+        print(f"Compared to {args.diff}: {len(added)} added, {len(removed)} removed")
+        for sign, requests in (('+', added), ('-', removed)):
+            for request in requests:
+                print(f"  {sign} {request.year} [{request.strategy}] {', '.join(request.statistics)}: {request.url}")
+    if args.save:
+        plan.save(args.save)
+        print(f"Saved plan to {args.save}")
+    return 0
+
+
+def fetch_command(args: argparse.Namespace) -> int:
+    import asyncio
+    from main import main
+
+    if args.invalidate:
+        from results_store import ResultsStore
+        store = ResultsStore()
+        for stat_name in args.invalidate:
+            store.invalidate(statistic=stat_name)
+        store.close()
+    return asyncio.run(main(cache_mode=args.cache_mode, output_format=args.output_format, layout=args.layout,
+                            metrics_json=args.metrics_json, metrics_prom=args.metrics_prom,
+                            json_path=args.config, output_dir=args.output_dir, incremental=args.incremental))
+
+
+def render_command(args: argparse.Namespace) -> int:
+    from export_writers import read_export
+    from markdown_formatter import MarkdownFormatter
+
+    results = read_export(args.export)
+    for geography, location_results in results.items():
+        name = geography or args.name or os.path.splitext(os.path.basename(args.export))[0]
+        output_path = os.path.join(args.output_dir, f"{name} Census report.md")
+        MarkdownFormatter(location_results).save_markdown(output_path, show_variable_key=args.show_variable_key)
+        print(f"Rendered {output_path}")
+    return 0
+
+
+def serve_command(args: argparse.Namespace) -> int:
+    from aiohttp import web
+    from census_service import CensusService
+    from utils.config_loader import config
+
+    service = CensusService(args.workers, args.max_queue_size, args.request_timeout)
+    web.run_app(service.create_app(), host=args.host or config.get('service.host', '127.0.0.1'),
+                port=args.port or config.get('service.port', 8080))
+    return 0
+
+
+def job_command(args: argparse.Namespace) -> int:
+    from job_runner import run_job
+
+    try:
+        progress = run_job(args.config, args.job_id, args.workers, args.shard_size, args.output_dir)
+    except (ValueError, IOError) as e:
+        print(f"Invalid config: {e}")
+        return 1
+    for kind, statuses in progress.items():
+        print(f"{kind}: {', '.join(f'{count} {status}' for status, count in statuses.items())}")
+    return 1 if any(statuses.get('failed') or statuses.get('pending') for statuses in progress.values()) else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="census", description="Fetch census statistics and generate reports")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    validate_parser = subparsers.add_parser('validate', help="Validate a stats config without any network I/O")
+    validate_parser.add_argument('config', nargs='?', default=DEFAULT_CONFIG)
+    validate_parser.add_argument('--no-index', action='store_true', help="Skip checking variable codes against the metadata index")
+    validate_parser.set_defaults(handler=validate_command)
+
+    plan_parser = subparsers.add_parser('plan', help="Show the requests a config would issue")
+    plan_parser.add_argument('config', nargs='?', default=DEFAULT_CONFIG)
+    plan_parser.add_argument('--show-urls', action='store_true')
+    plan_parser.add_argument('--dry-run', action='store_true', help="Estimate the cache hit ratio and wall time of the plan")
+    plan_parser.add_argument('--concurrency', type=int, help="Default: performance.concurrent_requests")
+    plan_parser.add_argument('--latency', type=float, help="Seconds per request (default: performance.estimated_latency)")
+    plan_parser.add_argument('--save', metavar='PATH', help="Write the compiled plan as JSON")
+    plan_parser.add_argument('--diff', metavar='PATH', help="Compare with a plan saved by --save")
+    plan_parser.set_defaults(handler=plan_command)
+
+    fetch_parser = subparsers.add_parser('fetch', help="Fetch the data and write reports or exports")
+    fetch_parser.add_argument('config', nargs='?', default=DEFAULT_CONFIG)
+    fetch_parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    fetch_parser.add_argument('--cache-mode', choices=['use', 'refresh', 'offline'])
+    fetch_parser.add_argument('--format', dest='output_format', choices=['markdown', 'csv', 'jsonl', 'parquet'], default='markdown')
+    fetch_parser.add_argument('--layout', choices=['long', 'wide'], default='long')
+    fetch_parser.add_argument('--metrics-json')
+    fetch_parser.add_argument('--metrics-prom')
+    fetch_parser.add_argument('--incremental', action='store_true', help="Only fetch cells missing from the local results store")
+    fetch_parser.add_argument('--invalidate', action='append', metavar='STATISTIC',
+                              help="Drop a statistic's stored cells so --incremental fetches it again (repeatable)")
+    fetch_parser.set_defaults(handler=fetch_command)
+
+    render_parser = subparsers.add_parser('render', help="Render markdown reports from a long-layout CSV/JSONL export")
+    render_parser.add_argument('export')
+    render_parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    render_parser.add_argument('--name', help="Report name for single-location exports (default: the export's file name)")
+    render_parser.add_argument('--show-variable-key', action='store_true')
+    render_parser.set_defaults(handler=render_command)
+
+    serve_parser = subparsers.add_parser('serve', help="Serve reports over HTTP, keeping connections and caches warm")
+    serve_parser.add_argument('--host', help="Default: service.host in config.yaml")
+    serve_parser.add_argument('--port', type=int, help="Default: service.port in config.yaml")
+    serve_parser.add_argument('--workers', type=int)
+    serve_parser.add_argument('--max-queue-size', type=int)
+    serve_parser.add_argument('--request-timeout', type=float)
+    serve_parser.set_defaults(handler=serve_command)
+
+    job_parser = subparsers.add_parser('job', help="Run a large config as a sharded, resumable multi-process job")
+    job_parser.add_argument('config')
+    job_parser.add_argument('--job-id', help="Default: a hash of the config file, so re-running resumes the job")
+    job_parser.add_argument('--workers', type=int)
+    job_parser.add_argument('--shard-size', type=int)
+    job_parser.add_argument('--output-dir')
+    job_parser.set_defaults(handler=job_command)
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = build_parser().parse_args()
+    sys.exit(arguments.handler(arguments))
@@ -0,0 +1,184 @@
+import numpy as np
+from typing import Dict, Any, List, Optional, Union, NamedTuple
+from utils.logging_config import get_logger
+from result_cube import ResultCube
+
+logger = get_logger(__name__)
+
+# Column labels of the supported metrics, in the order they are rendered
+METRIC_LABELS = {
+    'yoy': 'YoY Change (%)',
+    'cagr': 'CAGR (%)',
+    'percent_of_total': '% of Total',
+    'rank_within_state': 'Rank in State',
+}
+
+
+class StatisticSeries(NamedTuple):
+    """The values of one statistic as a locations x years float64 array, NaN where a value is missing."""
+    locations: List[Optional[str]]
+    years: np.ndarray
+    values: np.ndarray
+
+
+def build_series(results: Union[ResultCube, Dict[Optional[str], Dict[str, Dict[int, Optional[List[Any]]]]]], statistic: str) -> StatisticSeries:
+    """
+    Collect a statistic from {geography: {statistic: {year: [value, header]}}} results (or a ResultCube, which
+    is sliced directly) into a StatisticSeries. Non-numeric values are treated as missing.
+    """
+    if isinstance(results, ResultCube):
+        years = sorted(results.years_of(statistic))
+        values = results.statistic(statistic)[:, [results.years.index(year) for year in years]]
+        return StatisticSeries(list(results.geographies), np.array(years, dtype=np.int64), values)
+    locations = list(results)
+    years = sorted({year for location_results in results.values() for year in location_results.get(statistic, {})})
+    year_index = {year: column for column, year in enumerate(years)}
+    values = np.full((len(locations), len(years)), np.nan)
+    for row, geography in enumerate(locations):
+        for year, data in results[geography].get(statistic, {}).items():
+            if data and isinstance(data[0], (int, float)):
+                values[row, year_index[year]] = data[0]
+    return StatisticSeries(locations, np.array(years, dtype=np.int64), values)
+
+
+def _finite(array: np.ndarray) -> np.ndarray:
+    # Divisions by zero give +-inf, which are reported as missing like any other undefined value
+    array[~np.isfinite(array)] = np.nan
+    return array
+
+
+def yoy(series: StatisticSeries) -> np.ndarray:
+    """Percent change from the previous available year; NaN for the first year."""
+    result = np.full(series.values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[:, 1:] = (series.values[:, 1:] - series.values[:, :-1]) / np.abs(series.values[:, :-1]) * 100
+    return _finite(result)
+
+
+def cagr(series: StatisticSeries) -> np.ndarray:
+    """Compound annual growth rate (%) from the first year to each year; NaN for the first year."""
+    result = np.full(series.values.shape, np.nan)
+    if len(series.years) < 2:
+        return result
+    periods = (series.years[1:] - series.years[0]).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[:, 1:] = (np.power(series.values[:, 1:] / series.values[:, :1], 1 / periods) - 1) * 100
+    return _finite(result)
+
+
+def percent_of_total(series: StatisticSeries, total: Optional[StatisticSeries] = None) -> np.ndarray:
+    """
+    Share (%) of each value in a total: the same location and year of another statistic when `total` is
+    given (e.g. households with a computer out of all households), otherwise the sum over all locations.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if total is None:
+            return _finite(series.values / np.nansum(series.values, axis=0) * 100)
+        return _finite(series.values / _align(total, series) * 100)
+
+
+def rank_within_state(series: StatisticSeries) -> np.ndarray:
+    """Rank (1 = largest) of each location among the locations of its state, per year. Missing values are not ranked."""
+    states = np.array([state_of(geography) or '' for geography in series.locations])
+    ranks = np.full(series.values.shape, np.nan)
+    for state in np.unique(states):
+        rows = np.flatnonzero(states == state)
+        block = series.values[rows]
+        # NaN sorts last, so missing values never take a rank ahead of real ones
+        order = np.argsort(-block, axis=0, kind='stable')
+        block_ranks = np.empty(block.shape)
+        np.put_along_axis(block_ranks, order, np.arange(1, len(rows) + 1, dtype=np.float64)[:, None], axis=0)
+        block_ranks[np.isnan(block)] = np.nan
+        ranks[rows] = block_ranks
+    return ranks
+
+
+def state_of(geography: Optional[str]) -> Optional[str]:
+    """Return the state FIPS code of a GEO_ID/ucgid such as 1600000US1743250, or None for national or unknown geographies."""
+    if not geography or 'US' not in geography:
+        return None
+    return geography.split('US', 1)[1][:2] or None
+
+
+def _align(source: StatisticSeries, target: StatisticSeries) -> np.ndarray:
+    """Reindex a series onto the locations and years of another, NaN where it has no value."""
+    aligned = np.full(target.values.shape, np.nan)
+    row_index = {geography: row for row, geography in enumerate(source.locations)}
+    column_index = {int(year): column for column, year in enumerate(source.years)}
+    rows = [row for row, geography in enumerate(target.locations) if geography in row_index]
+    columns = [column for column, year in enumerate(target.years) if int(year) in column_index]
+    if rows and columns:
+        source_rows = [row_index[target.locations[row]] for row in rows]
+        source_columns = [column_index[int(target.years[column])] for column in columns]
+        aligned[np.ix_(rows, columns)] = source.values[np.ix_(source_rows, source_columns)]
+    return aligned
+
+
+class DerivedMetricsEngine:
+    """
+    Computes the derived metrics declared in the stats config, one vectorized NumPy pass per statistic and metric.
+
+    A statistic declares its metrics in a `derived` list, either by name or as an object with options:
+
+        "derived": ["yoy", "cagr", "rank_within_state", {"metric": "percent_of_total", "of": "Total Households"}]
+
+    `percent_of_total` without `of` is the share of the sum over all locations of the report.
+    """
+
+    def __init__(self, statistics: List[Dict[str, Any]]):
+        self.specs: Dict[str, List[Dict[str, Any]]] = {}
+        names = {stat['name'] for stat in statistics}
+        for stat in statistics:
+            specs = [self._parse_spec(spec, stat['name']) for spec in stat.get('derived', [])]
+            for spec in specs:
+                if spec.get('of') and spec['of'] not in names:
+                    raise ValueError(f"Derived metric of '{stat['name']}' refers to unknown statistic '{spec['of']}'")
+            if specs:
+                self.specs[stat['name']] = specs
+
+    @staticmethod
+    def _parse_spec(spec: Union[str, Dict[str, Any]], stat_name: str) -> Dict[str, Any]:
+        spec = {'metric': spec} if isinstance(spec, str) else dict(spec)
+        if spec.get('metric') not in METRIC_LABELS:
+            raise ValueError(f"Unknown derived metric {spec.get('metric')!r} for '{stat_name}', expected one of {list(METRIC_LABELS)}")
+        return spec
+
+    def __bool__(self) -> bool:
+        return bool(self.specs)
+
+    def compute(self, results: Union[ResultCube, Dict[Optional[str], Dict[str, Dict[int, Optional[List[Any]]]]]]) -> Dict[Optional[str], Dict[str, Dict[str, Dict[int, Optional[float]]]]]:
+        """
+        Evaluate the declared metrics over a ResultCube or {geography: {statistic: {year: [value, header]}}} results.
+
+        Returns:
+            {geography: {statistic: {column label: {year: value}}}}, None where a metric is undefined.
+        """
+        geographies = results.geographies if isinstance(results, ResultCube) else results
+        derived: Dict[Optional[str], Dict[str, Dict[str, Dict[int, Optional[float]]]]] = {geography: {} for geography in geographies}
+        series_cache: Dict[str, StatisticSeries] = {}
+
+        def series_of(stat_name: str) -> StatisticSeries:
+            if stat_name not in series_cache:
+                series_cache[stat_name] = build_series(results, stat_name)
+            return series_cache[stat_name]
+
+        for stat_name, specs in self.specs.items():
+            series = series_of(stat_name)
+            for spec in specs:
+                metric = spec['metric']
+                if metric == 'percent_of_total':
+                    values = percent_of_total(series, series_of(spec['of']) if spec.get('of') else None)
+                elif metric == 'yoy':
+                    values = yoy(series)
+                elif metric == 'cagr':
+                    values = cagr(series)
+                else:
+                    values = rank_within_state(series)
+                label = spec.get('label', METRIC_LABELS[metric])
+                years = series.years.tolist()
+                # One bulk conversion to Python floats; NaN is the only value that differs from itself
+                for geography, row in zip(series.locations, values.tolist()):
+                    derived[geography].setdefault(stat_name, {})[label] = {
+                        year: (value if value == value else None) for year, value in zip(years, row)}
+        logger.debug(f"Computed derived metrics for {len(self.specs)} statistics over {len(derived)} locations")
+        return derived
@@ -0,0 +1,256 @@
+import os
+import csv
+import json
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Iterable, AsyncIterator, Tuple, TYPE_CHECKING
+from utils.logging_config import get_logger
+
+if TYPE_CHECKING:
+    # Only needed for annotations; importing the client pulls in aiohttp
+    from census_api_client import ResultRecord
+
+logger = get_logger(__name__)
+
+LAYOUTS = ('long', 'wide')
+LONG_FIELDS = ['statistic', 'year', 'geography', 'variable', 'value']
+
+
+class ResultWriter(ABC):
+    """
+    Base class for tabular exports of fetch results.
+
+    Records are written in batches as they arrive from CensusAPIClient.iter_results:
+    - 'long' layout writes one row per statistic, year and geography and is fully streaming.
+    - 'wide' layout writes one row per geography and year with a column per statistic; rows are
+      assembled in memory and written when the writer is closed.
+
+    Output goes to a temporary file next to `path`, unique to this export, that is renamed into place on
+    close. Subclasses implement `_write_rows` (opening `_create_temp()` on the first call) and `_close`.
+    """
+
+    extension = ''
+
+    def __init__(self, path: str, layout: str = 'long'):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Invalid layout '{layout}', expected one of {LAYOUTS}")
+        self.path = path
+        self.layout = layout
+        self.temp_path: Optional[str] = None
+        self.rows_written = 0
+        self._wide_rows: Dict[Tuple[Optional[str], int], Dict[str, Any]] = {}
+        self._statistics: Dict[str, None] = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_batch(self, records: Iterable['ResultRecord']) -> None:
+        """Write a batch of fetch results."""
+        if self.layout == 'long':
+            rows = [self._long_row(record) for record in records]
+            if rows:
+                self._write_rows(rows, LONG_FIELDS)
+                self.rows_written += len(rows)
+            return
+
+        for record in records:
+            self._statistics[record.statistic] = None
+            row = self._wide_rows.setdefault((record.geography, record.year), {'geography': record.geography, 'year': record.year})
+            row[record.statistic] = self._value_of(record)
+
+    def close(self) -> None:
+        """Flush any buffered rows and move the export into place."""
+        if self.layout == 'wide' and self._wide_rows:
+            fields = ['geography', 'year'] + list(self._statistics)
+            rows = [self._wide_rows[key] for key in sorted(self._wide_rows, key=lambda key: (key[0] or '', key[1]))]
+            self._write_rows(rows, fields)
+            self.rows_written += len(rows)
+        self._close()
+        if self.temp_path is not None:
+            # NamedTemporaryFile is created owner-only, give the export the usual file permissions
+            os.chmod(self.temp_path, 0o644)
+            os.replace(self.temp_path, self.path)
+        logger.info(f"Exported {self.rows_written} rows to {self.path}")
+
+    def abort(self) -> None:
+        """Discard the partially written export."""
+        self._close()
+        if self.temp_path is not None and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def _create_temp(self) -> str:
+        """Create the temporary file the export is written to and return its path."""
+        if self.temp_path is None:
+            directory, name = os.path.split(self.path)
+            with tempfile.NamedTemporaryFile(dir=directory or ".", prefix=f"{name}.", suffix='.tmp', delete=False) as file:
+                self.temp_path = file.name
+        return self.temp_path
+
+    @staticmethod
+    def _value_of(record: 'ResultRecord') -> Optional[Any]:
+        return record.value[0] if record.value else None
+
+    def _long_row(self, record: 'ResultRecord') -> Dict[str, Any]:
+        return {
+            'statistic': record.statistic,
+            'year': record.year,
+            'geography': record.geography,
+            'variable': record.value[1] if record.value else None,
+            'value': self._value_of(record),
+        }
+
+    @abstractmethod
+    def _write_rows(self, rows: List[Dict[str, Any]], fields: List[str]) -> None:
+        """Write rows with the given columns to the temporary file."""
+
+    @abstractmethod
+    def _close(self) -> None:
+        """Close the temporary file, if it was opened."""
+
+
+class CSVWriter(ResultWriter):
+    extension = 'csv'
+
+    def __init__(self, path: str, layout: str = 'long'):
+        super().__init__(path, layout)
+        self._file = None
+        self._writer = None
+
+    def _write_rows(self, rows: List[Dict[str, Any]], fields: List[str]) -> None:
+        if self._writer is None:
+            self._file = open(self._create_temp(), 'w', newline='', encoding='utf8')
+            self._writer = csv.DictWriter(self._file, fieldnames=fields)
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JSONLinesWriter(ResultWriter):
+    extension = 'jsonl'
+
+    def __init__(self, path: str, layout: str = 'long'):
+        super().__init__(path, layout)
+        self._file = None
+
+    def _write_rows(self, rows: List[Dict[str, Any]], fields: List[str]) -> None:
+        if self._file is None:
+            self._file = open(self._create_temp(), 'w', encoding='utf8')
+        self._file.write(''.join(json.dumps(row) + '\n' for row in rows))
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetWriter(ResultWriter):
+    """Parquet export through pyarrow, which is an optional dependency."""
+
+    extension = 'parquet'
+
+    def __init__(self, path: str, layout: str = 'long'):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow, install it with `pip install pyarrow`")
+        super().__init__(path, layout)
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._writer = None
+
+    def _schema(self, fields: List[str]):
+        pa = self._pa
+        types = {'statistic': pa.string(), 'year': pa.int32(), 'geography': pa.string(), 'variable': pa.string()}
+        return pa.schema([(field, types.get(field, pa.float64())) for field in fields])
+
+    def _write_rows(self, rows: List[Dict[str, Any]], fields: List[str]) -> None:
+        schema = self._schema(fields)
+        columns = {field: [row.get(field) for row in rows] for field in fields}
+        for field in fields:
+            if schema.field(field).type == self._pa.float64():
+                columns[field] = [value if isinstance(value, (int, float)) else None for value in columns[field]]
+        table = self._pa.Table.from_pydict(columns, schema=schema)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._create_temp(), schema)
+        self._writer.write_table(table)
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+WRITERS = {
+    'csv': CSVWriter,
+    'jsonl': JSONLinesWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def get_writer(export_format: str, path: str, layout: str = 'long') -> ResultWriter:
+    """Create the writer registered for an export format ('csv', 'jsonl' or 'parquet')."""
+    if export_format not in WRITERS:
+        raise ValueError(f"Unknown export format '{export_format}', expected one of {list(WRITERS)}")
+    return WRITERS[export_format](path, layout)
+
+
+async def export_results(records: AsyncIterator['ResultRecord'], writer: ResultWriter, batch_size: int = 1000) -> int:
+    """
+    Stream records (e.g. from CensusAPIClient.iter_results) into a writer in batches of `batch_size`.
+
+    Returns:
+        The number of records consumed.
+    """
+    batch: List['ResultRecord'] = []
+    count = 0
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            writer.write_batch(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        writer.write_batch(batch)
+        count += len(batch)
+    return count
+
+
+def read_export(path: str) -> Dict[Optional[str], Dict[str, Dict[int, Optional[List[Any]]]]]:
+    """
+    Read a long-layout CSV or JSON Lines export back into {geography: {statistic: {year: [value, variable]}}},
+    the shape MarkdownFormatter renders. Single-location exports are keyed by a None geography.
+    """
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf8') as f:
+            rows = list(csv.DictReader(f))
+    elif path.endswith('.jsonl'):
+        with open(path, encoding='utf8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        raise ValueError(f"Cannot read export '{path}', expected a .csv or .jsonl file")
+
+    results: Dict[Optional[str], Dict[str, Dict[int, Optional[List[Any]]]]] = {}
+    for row in rows:
+        if 'statistic' not in row:
+            raise ValueError(f"'{path}' is not a long-layout export")
+        value = row.get('value')
+        if isinstance(value, str):
+            try:
+                value = float(value) if value else None
+            except ValueError:
+                pass
+        cell = [value, row.get('variable')] if value is not None else None
+        results.setdefault(row.get('geography') or None, {}).setdefault(row['statistic'], {})[int(row['year'])] = cell
+    return results
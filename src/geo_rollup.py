@@ -0,0 +1,187 @@
+import os
+import re
+import csv
+import numpy as np
+from typing import Dict, Any, List, Optional, NamedTuple
+from utils.logging_config import get_logger
+from variable_index import parse_api_url
+from result_cube import ResultCube
+from url_generator import URLGenerator
+
+logger = get_logger(__name__)
+
+AGGREGATION_METHODS = ('sum', 'weighted_mean', 'ratio', 'direct')
+# Words in a statistic's name or description that mark it as not additive across geographies (matched as whole words)
+NON_ADDITIVE_WORDS = ('median', 'mean', 'average', 'percent', 'percentage', 'rate', 'ratio', 'per capita', 'index',
+                      'indices', 'coefficient', 'gini', 'margin of error', 'moe')
+NON_ADDITIVE_PATTERN = re.compile(r'\b(?:' + '|'.join(re.escape(word) + 's?' for word in NON_ADDITIVE_WORDS) + r')\b|%')
+# Percent estimates (*PE) and margins of error (*M, *PM, and their *MA annotations) cannot be summed
+NON_ADDITIVE_VARIABLE = re.compile(r'_\d+[A-Z]*(?:PE|M|MA)$')
+# Parent geographies per request when non-additive statistics are fetched directly
+DIRECT_FETCH_CHUNK = 50
+
+
+class Crosswalk(NamedTuple):
+    """Child geography -> parent geography mapping, with the display name of each parent."""
+    parent_of: Dict[str, str]
+    parent_names: Dict[str, str]
+
+
+def load_crosswalk(path: str) -> Crosswalk:
+    """
+    Read a geography crosswalk CSV with `geography`, `parent` and optional `parent_name` columns, e.g.
+
+        geography,parent,parent_name
+        1400000US17031010100,0500000US17031,"Cook County, Illinois"
+
+    Relative paths are resolved against the project root.
+    """
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    path = path if os.path.isabs(path) else os.path.join(project_root, path)
+    parent_of: Dict[str, str] = {}
+    parent_names: Dict[str, str] = {}
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        if not reader.fieldnames or 'geography' not in reader.fieldnames or 'parent' not in reader.fieldnames:
+            raise ValueError(f"Crosswalk {path} must have 'geography' and 'parent' columns")
+        for row in reader:
+            parent_of[row['geography']] = row['parent']
+            if row.get('parent_name'):
+                parent_names[row['parent']] = row['parent_name']
+    logger.info(f"Loaded crosswalk of {len(parent_of)} geographies into {len(set(parent_of.values()))} parents from {path}")
+    return Crosswalk(parent_of, parent_names)
+
+
+def aggregation_of(stat: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return how a statistic rolls up to parent geographies, as {'method': ..., options}.
+
+    A statistic declares it with `aggregation`, either a method name or an object with options:
+
+        "aggregation": "sum"
+        "aggregation": {"method": "weighted_mean", "weight": "Population"}
+        "aggregation": {"method": "ratio", "numerator": "Households With Computer", "denominator": "Total Households", "scale": 100}
+
+    Without it, percent estimates (`*PE` variables), margins of error (`*M` / `*MA`) and statistics whose name or
+    description mentions a median, mean, percentage, rate, ratio, index or margin of error (as whole words) are
+    flagged as non-additive ('direct': fetched for the parent geographies), and everything else is summed.
+    """
+    spec = stat.get('aggregation')
+    if spec is not None:
+        spec = {'method': spec} if isinstance(spec, str) else dict(spec)
+        if spec.get('method') not in AGGREGATION_METHODS:
+            raise ValueError(f"Unknown aggregation {spec.get('method')!r} for '{stat['name']}', expected one of {AGGREGATION_METHODS}")
+        return spec
+    _, variables = parse_api_url(stat['api_url'])
+    text = f"{stat['name']} {stat.get('description', '')}".lower()
+    if any(NON_ADDITIVE_VARIABLE.search(variable) for variable in variables) or NON_ADDITIVE_PATTERN.search(text):
+        return {'method': 'direct'}
+    return {'method': 'sum'}
+
+
+def _group_sum(array: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """Sum the rows of an array per group index in one vectorized pass (groups without rows sum to 0)."""
+    result = np.zeros((group_count,) + array.shape[1:])
+    if not len(groups):
+        return result
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    result[sorted_groups[starts]] = np.add.reduceat(array[order], starts, axis=0)
+    return result
+
+
+class GeographicRollup:
+    """
+    Computes parent geography results (tract -> county, place -> state, ...) from fetched child geographies,
+    so hierarchical reports need no extra API requests for additive statistics.
+
+    Configured with a `rollups` entry in the stats config:
+
+        "rollups": [{"crosswalk": "data/input/tract_county.csv", "weight": "Population"}]
+
+    Sums add up the children; weighted means are weighted by `weight` (a statistic of the config); ratios are
+    recomputed from their component counts. Non-additive statistics without such a rule are 'direct': they are
+    requested for the parent geographies (see `direct_statistics`).
+    """
+
+    def __init__(self, statistics: List[Dict[str, Any]], crosswalk: Crosswalk, weight: Optional[str] = None):
+        self.crosswalk = crosswalk
+        names = {stat['name'] for stat in statistics}
+        self.methods: Dict[str, Dict[str, Any]] = {}
+        for stat in statistics:
+            spec = aggregation_of(stat)
+            if spec['method'] == 'weighted_mean':
+                spec.setdefault('weight', weight)
+            referenced = {'weighted_mean': ('weight',), 'ratio': ('numerator', 'denominator')}.get(spec['method'], ())
+            for key in referenced:
+                if spec.get(key) not in names:
+                    raise ValueError(f"The {key} of the aggregation of '{stat['name']}' must be a statistic of the config, got {spec.get(key)!r}")
+            self.methods[stat['name']] = spec
+        self.statistics = statistics
+
+        direct = [name for name, spec in self.methods.items() if spec['method'] == 'direct']
+        if direct:
+            logger.warning(f"Statistics {direct} are not additive and will be fetched for the parent geographies; "
+                           f"declare an 'aggregation' to compute them from component counts instead")
+
+    @classmethod
+    def from_config(cls, rollup: Dict[str, Any], statistics: List[Dict[str, Any]]) -> 'GeographicRollup':
+        return cls(statistics, load_crosswalk(rollup['crosswalk']), rollup.get('weight'))
+
+    def direct_statistics(self) -> List[Dict[str, Any]]:
+        """Return the statistics that have to be requested for the parent geographies."""
+        return [stat for stat in self.statistics if self.methods[stat['name']]['method'] == 'direct']
+
+    def direct_batches(self, parents: ResultCube) -> List[Dict[str, Any]]:
+        """Plan the requests of the direct statistics for the parents of a rolled-up cube, DIRECT_FETCH_CHUNK parents per request."""
+        statistics = self.direct_statistics()
+        geographies = [geography for geography in parents.geographies if geography]
+        batches = []
+        for start in range(0, len(geographies) if statistics else 0, DIRECT_FETCH_CHUNK):
+            geography = {'ucgid': ','.join(geographies[start:start + DIRECT_FETCH_CHUNK])}
+            batches.extend(URLGenerator(statistics, geography).generate_batched_urls())
+        return batches
+
+    def compute(self, cube: ResultCube) -> ResultCube:
+        """
+        Aggregate the child geographies of a cube into a cube of their parents. Children missing from the
+        crosswalk are ignored, as are missing values; a parent without any value for a cell gets NaN.
+        Direct statistics are left empty, to be filled by fetching them.
+        """
+        children = [row for row, geography in enumerate(cube.geographies) if geography in self.crosswalk.parent_of]
+        parent_index: Dict[str, int] = {}
+        for row in children:
+            parent_index.setdefault(self.crosswalk.parent_of[cube.geographies[row]], len(parent_index))
+        groups = np.array([parent_index[self.crosswalk.parent_of[cube.geographies[row]]] for row in children], dtype=np.int64)
+        values = cube.values[children]
+        present = ~np.isnan(values)
+        sums = _group_sum(np.where(present, values, 0.0), groups, len(parent_index))
+        counts = _group_sum(present.astype(np.float64), groups, len(parent_index))
+
+        result = np.full(sums.shape, np.nan)
+        statistic_index = {name: column for column, name in enumerate(cube.statistics)}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name, spec in self.methods.items():
+                if name not in statistic_index:
+                    continue
+                column = statistic_index[name]
+                if spec['method'] == 'sum':
+                    result[:, column] = np.where(counts[:, column] > 0, sums[:, column], np.nan)
+                elif spec['method'] == 'weighted_mean':
+                    weights = values[:, statistic_index[spec['weight']]]
+                    both = present[:, column] & ~np.isnan(weights)
+                    weighted = _group_sum(np.where(both, values[:, column] * weights, 0.0), groups, len(parent_index))
+                    total_weight = _group_sum(np.where(both, weights, 0.0), groups, len(parent_index))
+                    result[:, column] = weighted / total_weight
+                elif spec['method'] == 'ratio':
+                    numerator, denominator = statistic_index[spec['numerator']], statistic_index[spec['denominator']]
+                    result[:, column] = sums[:, numerator] / sums[:, denominator] * spec.get('scale', 1)
+                    result[:, column][(counts[:, numerator] == 0) | (counts[:, denominator] == 0)] = np.nan
+        result[~np.isfinite(result)] = np.nan
+
+        logger.info(f"Rolled up {len(children)} of {len(cube.geographies)} geographies into {len(parent_index)} parents")
+        return cube.derive(list(parent_index), result)
+
+    def parent_names(self) -> Dict[str, str]:
+        return dict(self.crosswalk.parent_names)
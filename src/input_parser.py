@@ -1,5 +1,5 @@
 import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import os
 from utils.logging_config import get_logger
 
@@ -11,6 +11,14 @@ class InputParser:
         logger.info(f"Initializing InputParser with file: {file_path}")
         self.data = self._read_json_file()
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: str = "<request>") -> 'InputParser':
+        """Create a parser for a config that is already parsed, e.g. the body of a service request."""
+        input_parser = cls.__new__(cls)
+        input_parser.file_path = source
+        input_parser.data = data
+        return input_parser
+
     def _read_json_file(self) -> Dict[str, Any]:
         """Read and parse the JSON file."""
         logger.debug(f"Attempting to read JSON file: {self.file_path}")
@@ -26,8 +34,14 @@ class InputParser:
             logger.error(f"Error reading the input file: {e}")
             raise IOError(f"Error reading the input file: {e}")
 
-    def validate_structure(self) -> None:
-        """Validate the structure of the parsed JSON data."""
+    def validate_structure(self, variable_index=None) -> None:
+        """
+        Validate the structure of the parsed JSON data.
+
+        When a VariableIndex is given, every statistic's variable code (or its cell_number backup)
+        must also exist in each requested vintage of its dataset, after applying its `vintages` mapping.
+        Dataset vintages missing from the index are not checked.
+        """
         logger.info("Validating JSON structure")
         if not isinstance(self.data, dict):
             logger.error("Root element is not a dictionary")
@@ -55,9 +69,71 @@ class InputParser:
             if not all(isinstance(year, int) for year in stat['years']):
                 logger.error("Not all elements in 'years' are integers")
                 raise ValueError("All elements in 'years' must be integers")
+
+            for vintage in stat.get('vintages', []):
+                if not isinstance(vintage, dict) or not ('variable' in vintage or 'dataset' in vintage):
+                    logger.error(f"Vintage entry of '{stat['name']}' has no 'variable' or 'dataset'")
+                    raise ValueError(f"Each vintage of '{stat['name']}' must set a 'variable' and/or a 'dataset'")
+                if not all(isinstance(vintage.get(bound, 0), int) for bound in ('from', 'to')):
+                    logger.error(f"Vintage year range of '{stat['name']}' is not made of integers")
+                    raise ValueError(f"The 'from' and 'to' years of the vintages of '{stat['name']}' must be integers")
+
+        if 'locations' in self.data:
+            if not isinstance(self.data['locations'], list) or not self.data['locations']:
+                logger.error("'locations' is not a non-empty list")
+                raise ValueError("'locations' must be a non-empty list")
+            for location in self.data['locations']:
+                if not isinstance(location, dict) or 'name' not in location or 'ucgid' not in location:
+                    logger.error("Location entry is missing 'name' or 'ucgid'")
+                    raise ValueError("Each location must have a 'name' and a 'ucgid'")
+
+        if 'geography' in self.data:
+            if not isinstance(self.data['geography'], dict) or 'for' not in self.data['geography']:
+                logger.error("'geography' is not a dictionary with a 'for' clause")
+                raise ValueError("'geography' must be a dictionary with a 'for' clause, e.g. {\"for\": \"place:*\", \"in\": \"state:17\"}")
         
+        for rollup in self.get_rollups():
+            if not isinstance(rollup, dict) or 'crosswalk' not in rollup:
+                logger.error("Rollup entry is missing 'crosswalk'")
+                raise ValueError("Each rollup must be a dictionary with a 'crosswalk' file, e.g. {\"crosswalk\": \"data/input/tract_county.csv\"}")
+
+        peers = self.get_peers()
+        if peers is not None:
+            if not isinstance(peers, dict):
+                logger.error("'peers' is not a dictionary")
+                raise ValueError("'peers' must be a dictionary, e.g. {\"k\": 5, \"statistics\": [\"Population\", \"Median Income\"]}")
+            if not isinstance(peers.get('k', 5), int) or peers.get('k', 5) < 1:
+                raise ValueError("'k' of 'peers' must be a positive integer")
+            names = {stat['name'] for stat in self.data['statistics']}
+            unknown = [name for name in list(peers.get('statistics', [])) + list(peers.get('weights', {})) if name not in names]
+            if unknown:
+                raise ValueError(f"Unknown statistic(s) {', '.join(unknown)} in 'peers'")
+
+        if variable_index is not None:
+            self._validate_variables(variable_index)
+
         logger.info("JSON structure validation successful")
 
+    def _validate_variables(self, variable_index) -> None:
+        """Check every statistic's variable codes against the local variable metadata index."""
+        from variable_index import parse_api_url
+        from variable_codes import vintage_for
+        for stat in self.data['statistics']:
+            for year in stat['years']:
+                dataset, variables = parse_api_url(stat['api_url'])
+                vintage = vintage_for(stat, year)
+                dataset = vintage.get('dataset', dataset).strip('/')
+                variables = vintage['variable'].split(',') if vintage.get('variable') else variables
+                if not variable_index.has_dataset(dataset, year):
+                    logger.debug(f"No metadata indexed for {dataset} {year}, skipping variable validation")
+                    continue
+                unknown = [variable for variable in variables if not variable_index.has_variable(dataset, year, variable)]
+                if unknown and 'cell_number' in stat and variable_index.has_variable(dataset, year, stat['cell_number']):
+                    continue
+                if unknown:
+                    logger.error(f"Unknown variable(s) {unknown} for '{stat['name']}' in {dataset} {year}")
+                    raise ValueError(f"Unknown variable(s) {', '.join(unknown)} for '{stat['name']}' in {dataset} {year}")
+
     def get_statistics(self) -> List[Dict[str, Any]]:
         """Return the list of statistics."""
         logger.debug("Retrieving all statistics")
@@ -72,6 +148,36 @@ class InputParser:
             logger.warning("No location found in the input data")
         return ""
 
+    def get_locations(self) -> List[Dict[str, str]]:
+        """Return the list of {'name', 'ucgid'} locations for multi-location configs."""
+        logger.debug("Retrieving locations")
+        return self.data.get('locations', [])
+
+    def get_geography(self) -> Optional[Dict[str, str]]:
+        """
+        Return the geography override for multi-location configs, or None for single-location configs.
+
+        A 'locations' list becomes a single comma-separated ucgid predicate, while a 'geography'
+        wildcard (e.g. {"for": "place:*", "in": "state:17"}) is returned as-is.
+        """
+        logger.debug("Retrieving geography")
+        if self.get_locations():
+            return {'ucgid': ','.join(location['ucgid'] for location in self.get_locations())}
+        if 'geography' in self.data:
+            return dict(self.data['geography'])
+        return None
+
+    def get_rollups(self) -> List[Dict[str, Any]]:
+        """Return the geographic rollups of the config (a single rollup may be given as a dictionary)."""
+        logger.debug("Retrieving rollups")
+        rollups = self.data.get('rollups', [])
+        return [rollups] if isinstance(rollups, dict) else rollups
+
+    def get_peers(self) -> Optional[Dict[str, Any]]:
+        """Return the similar places settings of the config, or None when no peers are requested."""
+        logger.debug("Retrieving peers")
+        return self.data.get('peers')
+
     def get_statistic_by_name(self, name: str) -> Dict[str, Any]:
         """Return a specific statistic by its name."""
         logger.debug(f"Retrieving statistic with name: {name}")
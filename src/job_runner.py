@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import multiprocessing
+from typing import Dict, Any, List, Optional, Tuple
+from utils.logging_config import get_logger
+from utils.config_loader import config
+
+logger = get_logger(__name__)
+
+class JobQueue:
+    """
+    Durable SQLite queue of job shards shared by the job runner's worker processes.
+
+    A job is a stats config split into 'fetch' shards (groups of batches from URLGenerator.generate_batched_urls)
+    and, once every fetch shard is done, 'render' shards (groups of locations to write reports for). The derived
+    metrics of every location are computed once when rendering is queued and stored with the job. Shards are
+    claimed atomically, so any number of processes can work on the same queue. Shards left 'running' by a
+    process that died, and shards that failed `max_attempts` times, are handed out again when the job is resumed.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        path = path or config.get('job_runner.path', './data/jobs/jobs.sqlite')
+        self.path = path if os.path.isabs(path) else os.path.join(project_root, path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                config_path TEXT NOT NULL,
+                batches TEXT NOT NULL,
+                location_names TEXT NOT NULL,
+                fallback_name TEXT NOT NULL,
+                output_dir TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS shards (
+                job_id TEXT NOT NULL,
+                shard_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                error TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (job_id, kind, shard_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS derived (
+                job_id TEXT NOT NULL,
+                geography TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                PRIMARY KEY (job_id, geography)
+            ) WITHOUT ROWID;
+        """)
+
+    def create_job(self, job_id: str, config_path: str, batches: List[Dict[str, Any]], location_names: Dict[str, str],
+                   fallback_name: str, output_dir: str, shard_size: int) -> None:
+        """Register a job and split its batches into fetch shards of `shard_size` batches."""
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.connection.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (job_id, config_path, json.dumps(batches), json.dumps(location_names), fallback_name, output_dir, now))
+        self._add_shards(job_id, 'fetch', [batches[start:start + shard_size] for start in range(0, len(batches), shard_size)], now)
+        self.connection.execute("COMMIT")
+        logger.info(f"Created job {job_id} with {len(batches)} requests")
+
+    def resume_job(self, job_id: str) -> int:
+        """
+        Reset the shards an interrupted run left running, and the shards that ran out of attempts (with their
+        attempts zeroed), so they are claimed again. Returns the number reset.
+        """
+        reset = self.connection.execute(
+            "UPDATE shards SET status = 'pending', worker = NULL, updated = ?, "
+            "attempts = CASE WHEN status = 'failed' THEN 0 ELSE attempts END WHERE job_id = ? AND status IN ('running', 'failed')",
+            (time.time(), job_id)).rowcount
+        logger.info(f"Resuming job {job_id}, {reset} interrupted or failed shards reset")
+        return reset
+
+    def render_queued(self, job_id: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM shards WHERE job_id = ? AND kind = 'render' LIMIT 1", (job_id,)).fetchone() is not None
+
+    def add_render_shards(self, job_id: str, geographies: List[Optional[str]], shard_size: int,
+                          derived: Optional[Dict[Optional[str], Dict[str, Any]]] = None) -> int:
+        """
+        Queue the report rendering of a job with the derived metrics of its locations, unless it has been queued
+        already. Returns the number of shards added.
+        """
+        if self.render_queued(job_id):
+            return 0
+        chunks = [geographies[start:start + shard_size] for start in range(0, len(geographies), shard_size)]
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.connection.executemany("INSERT OR REPLACE INTO derived VALUES (?, ?, ?)",
+                                    [(job_id, geography or '', json.dumps(metrics)) for geography, metrics in (derived or {}).items()])
+        self._add_shards(job_id, 'render', chunks, time.time())
+        self.connection.execute("COMMIT")
+        return len(chunks)
+
+    def derived(self, job_id: str, geographies: List[Optional[str]]) -> Dict[Optional[str], Dict[str, Dict[str, Dict[int, Optional[float]]]]]:
+        """Return the stored derived metrics of some locations of a job as {geography: {statistic: {label: {year: value}}}}."""
+        keys = [geography or '' for geography in geographies]
+        rows = self.connection.execute(f"SELECT geography, metrics FROM derived WHERE job_id = ? AND geography IN ({','.join('?' * len(keys))})",
+                                       [job_id] + keys).fetchall()
+        # JSON object keys are strings; restore the integer years
+        return {geography or None: {stat_name: {label: {int(year): value for year, value in years.items()} for label, years in columns.items()}
+                                    for stat_name, columns in json.loads(metrics).items()}
+                for geography, metrics in rows}
+
+    def _add_shards(self, job_id: str, kind: str, payloads: List[Any], now: float) -> None:
+        self.connection.executemany("INSERT INTO shards (job_id, shard_id, kind, payload, updated) VALUES (?, ?, ?, ?, ?)",
+                                    [(job_id, shard_id, kind, json.dumps(payload), now) for shard_id, payload in enumerate(payloads)])
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(
+            "SELECT config_path, batches, location_names, fallback_name, output_dir FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {'config_path': row[0], 'batches': json.loads(row[1]), 'location_names': json.loads(row[2]),
+                'fallback_name': row[3], 'output_dir': row[4]}
+
+    def claim(self, job_id: str, kind: str, worker: str) -> Optional[Tuple[int, Any]]:
+        """Atomically take the next pending shard of a kind, returning (shard_id, payload) or None when there is none."""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute(
+                "SELECT shard_id, payload FROM shards WHERE job_id = ? AND kind = ? AND status = 'pending' ORDER BY shard_id LIMIT 1",
+                (job_id, kind)).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE shards SET status = 'running', worker = ?, attempts = attempts + 1, updated = ? WHERE job_id = ? AND kind = ? AND shard_id = ?",
+                    (worker, time.time(), job_id, kind, row[0]))
+        finally:
+            self.connection.execute("COMMIT")
+        return (row[0], json.loads(row[1])) if row is not None else None
+
+    def complete(self, job_id: str, kind: str, shard_id: int) -> None:
+        self.connection.execute("UPDATE shards SET status = 'done', error = NULL, updated = ? WHERE job_id = ? AND kind = ? AND shard_id = ?",
+                                (time.time(), job_id, kind, shard_id))
+
+    def fail(self, job_id: str, kind: str, shard_id: int, error: str, max_attempts: int) -> None:
+        """Put a failed shard back in the queue, or mark it failed once it has been attempted `max_attempts` times."""
+        self.connection.execute(
+            "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, updated = ? "
+            "WHERE job_id = ? AND kind = ? AND shard_id = ?",
+            (max_attempts, error, time.time(), job_id, kind, shard_id))
+
+    def progress(self, job_id: str) -> Dict[str, Dict[str, int]]:
+        """Return shard counts as {kind: {status: count}}."""
+        progress: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in self.connection.execute(
+                "SELECT kind, status, COUNT(*) FROM shards WHERE job_id = ? GROUP BY kind, status", (job_id,)):
+            progress.setdefault(kind, {})[status] = count
+        return progress
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+async def _fetch_shards(queue: JobQueue, job_id: str, worker: str, max_attempts: int, workers: int) -> None:
+    from census_api_client import CensusAPIClient
+    from request_scheduler import RequestScheduler
+    from results_store import ResultsStore
+
+    store = ResultsStore()
+    try:
+        # Every worker process has its own token buckets, so each gets an equal share of the per-host rate limit
+        async with CensusAPIClient(scheduler=RequestScheduler(rate_share=1 / workers)) as client:
+            while True:
+                shard = queue.claim(job_id, 'fetch', worker)
+                if shard is None:
+                    break
+                shard_id, batches = shard
+                try:
+                    # Cells stored by an earlier, interrupted attempt are not requested again
+                    pending = store.pending_batches(batches)
+                    records = []
+                    async for record in client.iter_results(pending):
+                        records.append(record)
+                        if len(records) >= 1000:
+                            store.save(pending, records)
+                            records = []
+                    store.save(pending, records)
+                    store.save_location_names(client.location_names)
+                    # Failed requests leave their cells missing; the shard is retried rather than rendered from partial data
+                    missing = store.pending_batches(batches)
+                    if missing:
+                        raise RuntimeError(f"{len(missing)} of {len(batches)} requests returned no data")
+                    queue.complete(job_id, 'fetch', shard_id)
+                    logger.info(f"Worker {worker} fetched shard {shard_id} ({len(pending)} of {len(batches)} requests)")
+                except Exception as e:
+                    logger.error(f"Worker {worker} failed on fetch shard {shard_id}: {str(e)}")
+                    queue.fail(job_id, 'fetch', shard_id, str(e), max_attempts)
+    finally:
+        store.close()
+
+
+def _render_shards(queue: JobQueue, job_id: str, worker: str, max_attempts: int) -> None:
+    from markdown_formatter import MarkdownFormatter
+    from results_store import ResultsStore
+
+    job = queue.job(job_id)
+    store = ResultsStore()
+    location_names = {**store.location_names(), **job['location_names']}
+    try:
+        while True:
+            shard = queue.claim(job_id, 'render', worker)
+            if shard is None:
+                break
+            shard_id, geographies = shard
+            try:
+                derived = queue.derived(job_id, geographies)
+                for geo_id, results in store.load(job['batches'], geographies).items():
+                    name = location_names.get(geo_id, geo_id) if geo_id else job['fallback_name']
+                    MarkdownFormatter(results, derived.get(geo_id)).save_markdown(os.path.join(job['output_dir'], f"{name} Census report.md"), show_variable_key=False)
+                queue.complete(job_id, 'render', shard_id)
+            except Exception as e:
+                logger.error(f"Worker {worker} failed on render shard {shard_id}: {str(e)}")
+                queue.fail(job_id, 'render', shard_id, str(e), max_attempts)
+    finally:
+        store.close()
+
+
+def worker_main(queue_path: str, job_id: str, kind: str, max_attempts: int, workers: int = 1) -> None:
+    """
+    Entry point of a worker process: drain the job's pending shards of one kind with its own event loop and client.
+    `workers` is the number of worker processes running alongside it, which share the rate limit.
+    """
+    worker = f"{os.getpid()}"
+    queue = JobQueue(queue_path)
+    try:
+        if kind == 'fetch':
+            import asyncio
+            asyncio.run(_fetch_shards(queue, job_id, worker, max_attempts, workers))
+        else:
+            _render_shards(queue, job_id, worker, max_attempts)
+    finally:
+        queue.close()
+
+
+def _run_workers(queue_path: str, job_id: str, kind: str, workers: int, max_attempts: int) -> None:
+    # 'spawn' gives every worker a fresh interpreter: no SQLite connections or event loop state inherited from the parent
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=worker_main, args=(queue_path, job_id, kind, max_attempts, workers)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def run_job(config_path: str, job_id: Optional[str] = None, workers: Optional[int] = None, shard_size: Optional[int] = None,
+            output_dir: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Run (or resume) a sharded job: fetch every batch of a stats config into the results store with `workers`
+    processes, then render one markdown report per location, also across `workers` processes.
+
+    The job id defaults to a hash of the config file, so running the same config again resumes it.
+
+    Returns:
+        The final shard counts as {kind: {status: count}}.
+
+    Raises:
+        ValueError: If the config is invalid, or uses `rollups` or `peers`, which only main.py supports.
+    """
+    from input_parser import InputParser
+    from url_generator import URLGenerator
+    from results_store import ResultsStore
+    from derived_metrics import DerivedMetricsEngine
+
+    workers = workers or config.get('job_runner.workers', 4)
+    shard_size = shard_size or config.get('job_runner.shard_size', 10)
+    max_attempts = config.get('job_runner.max_attempts', 3)
+    output_dir = os.path.abspath(output_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "output"))
+
+    with open(config_path, 'rb') as f:
+        job_id = job_id or hashlib.sha256(f.read()).hexdigest()[:16]
+    queue = JobQueue()
+    try:
+        if queue.job(job_id) is None:
+            input_parser = InputParser(config_path)
+            input_parser.validate_structure()
+            # Rollups and peers need the whole fetched cube (see main.py); reject them rather than drop them
+            unsupported = [key for key, value in (('rollups', input_parser.get_rollups()), ('peers', input_parser.get_peers())) if value]
+            if unsupported:
+                logger.error(f"Config {config_path} uses {' and '.join(unsupported)}, which sharded jobs do not support")
+                raise ValueError(f"{' and '.join(unsupported)} are not supported by sharded jobs, use main.py")
+            batches = URLGenerator(input_parser.get_statistics(), input_parser.get_geography()).generate_batched_urls()
+            location_names = {location['ucgid']: location['name'] for location in input_parser.get_locations()}
+            queue.create_job(job_id, os.path.abspath(config_path), batches, location_names, input_parser.get_location(), output_dir, shard_size)
+        else:
+            queue.resume_job(job_id)
+
+        _run_workers(queue.path, job_id, 'fetch', workers, max_attempts)
+        fetch_progress = queue.progress(job_id).get('fetch', {})
+        if fetch_progress.get('failed'):
+            logger.error(f"Job {job_id} stopped before rendering, {fetch_progress['failed']} fetch shards failed; "
+                         f"run it again to retry them")
+            return queue.progress(job_id)
+        if fetch_progress.get('pending'):
+            logger.warning(f"Job {job_id} stopped with fetch shards pending, run it again to resume")
+            return queue.progress(job_id)
+
+        job = queue.job(job_id)
+        store = ResultsStore()
+        try:
+            geographies = store.geographies(job['batches'])
+            derived = None
+            if not queue.render_queued(job_id):
+                engine = DerivedMetricsEngine(InputParser(job['config_path']).get_statistics())
+                # Metrics such as ranks compare locations across shards, so they are computed once over every location
+                derived = engine.compute(store.load(job['batches'])) if engine else {}
+        finally:
+            store.close()
+        queue.add_render_shards(job_id, geographies, shard_size, derived)
+        _run_workers(queue.path, job_id, 'render', workers, max_attempts)
+        progress = queue.progress(job_id)
+        logger.info(f"Job {job_id} finished: {progress}")
+        return progress
+    finally:
+        queue.close()
+
+
+# Usage example
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a large stats config as a sharded, resumable multi-process job")
+    parser.add_argument('config', help="Path to the stats config")
+    parser.add_argument('--job-id', help="Job id (default: a hash of the config file, so re-running resumes the job)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: job_runner.workers)")
+    parser.add_argument('--shard-size', type=int, help="Requests per fetch shard and reports per render shard (default: job_runner.shard_size)")
+    parser.add_argument('--output-dir')
+    args = parser.parse_args()
+
+    print(json.dumps(run_job(args.config, args.job_id, args.workers, args.shard_size, args.output_dir), indent=2))
@@ -1,37 +1,153 @@
 import os
+import sys
 import asyncio
+import itertools
+import argparse
+import cProfile
+import pstats
 from input_parser import InputParser
 from url_generator import URLGenerator
 from census_api_client import CensusAPIClient
 from markdown_formatter import MarkdownFormatter
+from export_writers import WRITERS, LAYOUTS, get_writer, export_results
+from variable_index import VariableIndex
+from results_store import ResultsStore
+from derived_metrics import DerivedMetricsEngine
+from result_cube import ResultCube
+from geo_rollup import GeographicRollup
+from similar_places import SimilarPlaces
 
-async def main():
+def export_path(output_dir, output_format, location_name, geography):
+    export_name = location_name if location_name and not geography else "census_data"
+    return os.path.join(output_dir, f"{export_name} Census data.{WRITERS[output_format].extension}")
+
+async def fetch_incremental(client, store, batches):
+    """Fetch only the batches with missing or invalidated cells into the store, then load every cell of the config."""
+    pending = store.pending_batches(batches)
+    records = []
+    async for record in client.iter_results(pending):
+        records.append(record)
+        if len(records) >= 1000:
+            store.save(pending, records)
+            records = []
+    store.save(pending, records)
+    store.save_location_names(client.location_names)
+    return store.load(batches)
+
+async def main(cache_mode=None, output_format='markdown', layout='long', metrics_json=None, metrics_prom=None,
+               json_path=None, output_dir=None, incremental=False):
+    """Fetch the statistics of a config and write its reports or export. Returns the exit status: 0 on success, 1 on failure."""
+    store = None
     try:
         # Get the directory of the current script
         current_dir = os.path.dirname(os.path.abspath(__file__))
 
         # Construct the path to the JSON file
-        json_path = os.path.join(current_dir, "..", "data", "input", "census_stats_config.json")
+        json_path = json_path or os.path.join(current_dir, "..", "data", "input", "census_stats_config.json")
 
         # Parse input
         input_parser = InputParser(json_path)
+        # Reject unknown variable codes up front when the metadata index has been built
+        input_parser.validate_structure(VariableIndex.open_if_exists())
         statistics = input_parser.get_statistics()
         location_name = input_parser.get_location()
+        geography = input_parser.get_geography()
+        engine = DerivedMetricsEngine(statistics)
+        rollups = [GeographicRollup.from_config(rollup, statistics) for rollup in input_parser.get_rollups()]
+        peers = input_parser.get_peers()
 
         # Generate URLs
-        url_generator = URLGenerator(statistics)
-        urls = url_generator.generate_urls()
+        url_generator = URLGenerator(statistics, geography)
+        batches = url_generator.generate_batched_urls()
 
         # Fetch data
-        client = CensusAPIClient()
-        results = await client.fetch_data(urls)
+        output_dir = output_dir or os.path.join(current_dir, "..", "data", "output")
+        store = ResultsStore() if incremental else None
+        async with CensusAPIClient(cache_mode=cache_mode) as client:
+            try:
+                if store:
+                    # Incremental mode: only request cells the results store does not have yet
+                    cube = ResultCube.from_dict(await fetch_incremental(client, store, batches))
+                elif output_format != 'markdown' and not rollups:
+                    # Columnar export: stream records straight from the client into the writer
+                    with get_writer(output_format, export_path(output_dir, output_format, location_name, geography), layout) as writer:
+                        await export_results(client.iter_results(batches), writer)
+                    return 0
+                else:
+                    # One array-backed cube for every location (a None geography for single-location configs)
+                    cube = await client.fetch_cube(batches)
+
+                # Parent geographies are summed up locally; only their non-additive statistics are requested
+                cubes = [cube]
+                for rollup in rollups:
+                    parents = rollup.compute(cube)
+                    await client.fetch_cube(rollup.direct_batches(parents), parents)
+                    cubes.append(parents)
+            finally:
+                if metrics_json:
+                    client.metrics.write_json(metrics_json)
+                if metrics_prom:
+                    client.metrics.write_prometheus(metrics_prom)
 
-        # Generate markdown
-        formatter = MarkdownFormatter(results)
-        output_path = os.path.join(current_dir, "..", "data", "output", f"{location_name} Census report.md")
-        formatter.save_markdown(output_path, show_variable_key=False) # Set to True to show variable keys
+        if output_format != 'markdown':
+            with get_writer(output_format, export_path(output_dir, output_format, location_name, geography), layout) as writer:
+                writer.write_batch(itertools.chain.from_iterable(level.records() for level in cubes))
+            return 0
+
+        # Generate markdown, one report per location
+        location_names = {**(store.location_names() if store else client.location_names), **{location['ucgid']: location['name'] for location in input_parser.get_locations()}}
+        for rollup in rollups:
+            location_names.update(rollup.parent_names())
+        for level in cubes:
+            # Derived metrics are computed over all locations of a level at once, e.g. ranks within a state
+            derived = engine.compute(level) if engine else {}
+            # Peers of the fetched locations are searched among them, or in a prebuilt index of places
+            index = SimilarPlaces.from_config(peers, level) if peers is not None and level is cube and cube.geographies != [None] else None
+            for geo_id in level.geographies:
+                report_name = location_names.get(geo_id, geo_id) if geo_id else location_name
+                output_path = os.path.join(output_dir, f"{report_name} Census report.md")
+                if store:
+                    content = {'results': level.location(geo_id).to_dict(), 'derived': derived.get(geo_id)}
+                    if not store.report_changed(report_name, content, output_path):
+                        continue
+                comparison = None
+                if index is not None and geo_id in index:
+                    comparison = index.comparison(geo_id, index.query(geo_id, peers.get('k', 5)), location_names)
+                formatter = MarkdownFormatter.from_cube(level, geo_id, derived.get(geo_id), comparison)
+                formatter.save_markdown(output_path, show_variable_key=False) # Set to True to show variable keys
+                if store:
+                    store.mark_report(report_name, content)
+        return 0
     except Exception as e:
         print(f"\nAn error occurred: {str(e)}")
+        return 1
+    finally:
+        if store:
+            store.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch census statistics and generate markdown reports")
+    parser.add_argument('--cache-mode', choices=['use', 'refresh', 'offline'], default=None,
+                        help="use: serve cached responses, refresh: re-download and update the cache, "
+                             "offline: only use cached responses (default: cache.mode in config.yaml)")
+    parser.add_argument('--format', dest='output_format', choices=['markdown'] + list(WRITERS), default='markdown',
+                        help="Output format: a markdown report per location, or a single csv/jsonl/parquet table")
+    parser.add_argument('--layout', choices=LAYOUTS, default='long',
+                        help="Table layout for csv/jsonl/parquet: one row per value (long) or one column per statistic (wide)")
+    parser.add_argument('--metrics-json', help="Write a JSON summary of request timings and counters to this path")
+    parser.add_argument('--metrics-prom', help="Write request metrics in Prometheus text format to this path")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fetch cells missing from the local results store and only rewrite reports whose data changed")
+    parser.add_argument('--profile', help="Profile the run with cProfile, save the stats to this path and print the top functions")
+    args = parser.parse_args()
+
+    run = main(cache_mode=args.cache_mode, output_format=args.output_format, layout=args.layout,
+               metrics_json=args.metrics_json, metrics_prom=args.metrics_prom, incremental=args.incremental)
+    if args.profile:
+        profiler = cProfile.Profile()
+        status = profiler.runcall(asyncio.run, run)
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+    else:
+        status = asyncio.run(run)
+    sys.exit(status)
@@ -1,25 +1,119 @@
+import io
 import json
-from typing import Dict, Any, List
+import shutil
+import tempfile
+from typing import Dict, Any, List, Optional, TextIO, Mapping, TYPE_CHECKING
 import os
 import asyncio
 from utils.logging_config import get_logger
-from input_parser import InputParser
-from url_generator import URLGenerator
-from census_api_client import CensusAPIClient
 
 
+if TYPE_CHECKING:
+    from result_cube import ResultCube
+    from similar_places import PeerComparison
+
 logger = get_logger(__name__)
 
+class StreamingMarkdownWriter:
+    """
+    Writes a census report to disk one statistic at a time.
+
+    List format entries are written to the output as each statistic arrives, while table format
+    rows are spooled to a temporary file and appended when the writer is closed, so rendering is
+    linear in the size of the report and memory stays bounded. The report is written to a temporary
+    file next to the destination and atomically renamed into place on close.
+
+    Usage:
+        with StreamingMarkdownWriter(path, show_variable_key=False) as writer:
+            for statistic, years_data in results.items():
+                writer.write_statistic(statistic, years_data)
+    """
+
+    def __init__(self, filename: str, show_variable_key: bool = True, peers: Optional['PeerComparison'] = None):
+        self.filename = filename
+        self.show_variable_key = show_variable_key
+        self.peers = peers
+        directory = os.path.dirname(filename) or "."
+        os.makedirs(directory, exist_ok=True)
+        self._output = tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False, encoding='utf8')
+        self._table_spool = tempfile.TemporaryFile('w+', encoding='utf8')
+        self._output.write("# Census Data Report\n\n")
+        self._output.write(MarkdownFormatter._generate_toc(peers is not None))
+        self._output.write("## List Format\n\n")
+
+    def __enter__(self) -> 'StreamingMarkdownWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_statistic(self, statistic: str, years_data: Mapping[int, Optional[List[Any]]],
+                        derived: Optional[Dict[str, Dict[int, Optional[float]]]] = None) -> None:
+        """
+        Write the list format section of a statistic and spool its table format section.
+
+        :param statistic: The name of the statistic.
+        :param years_data: The [value, identifier] pairs of the statistic keyed by year.
+        :param derived: Optional derived metric columns of the statistic, {column label: {year: value}}.
+        """
+        MarkdownFormatter._write_list_section(self._output, statistic, years_data, self.show_variable_key)
+        MarkdownFormatter._write_table_section(self._table_spool, statistic, years_data, self.show_variable_key, derived)
+
+    def close(self) -> None:
+        """Append the table format section and atomically move the report into place."""
+        self._output.write("## Table Format\n\n")
+        self._table_spool.seek(0)
+        shutil.copyfileobj(self._table_spool, self._output)
+        self._table_spool.close()
+        if self.peers is not None:
+            MarkdownFormatter._write_peers_section(self._output, self.peers)
+        self._output.close()
+        # NamedTemporaryFile is created owner-only, give the report the usual file permissions
+        os.chmod(self._output.name, 0o644)
+        os.replace(self._output.name, self.filename)
+
+    def abort(self) -> None:
+        """Discard the partially written report."""
+        self._table_spool.close()
+        self._output.close()
+        if os.path.exists(self._output.name):
+            os.remove(self._output.name)
+
+
 class MarkdownFormatter:
-    def __init__(self, data: Dict[str, Dict[int, List[Any]]]):
+    def __init__(self, data: Mapping[str, Mapping[int, Optional[List[Any]]]], derived: Optional[Dict[str, Dict[str, Dict[int, Optional[float]]]]] = None,
+                 peers: Optional['PeerComparison'] = None):
         """
         Initialize the MarkdownFormatter with census data.
         
-        :param data: A nested dictionary containing census data organized by statistic and year.
+        :param data: A nested mapping containing census data organized by statistic and year, e.g. a dictionary
+            or a ResultCube location view.
+        :param derived: Optional derived metrics (see DerivedMetricsEngine) organized by statistic, column label
+            and year, rendered as extra columns of the table format.
+        :param peers: Optional comparison with the most similar places (see SimilarPlaces.comparison), rendered
+            as a Similar Places section.
         """
         self.data = data
+        self.derived = derived or {}
+        self.peers = peers
         logger.info("MarkdownFormatter initialized with data")
 
+    @classmethod
+    def from_cube(cls, cube: 'ResultCube', geography: Optional[str], derived: Optional[Dict[str, Dict[str, Dict[int, Optional[float]]]]] = None,
+                  peers: Optional['PeerComparison'] = None) -> 'MarkdownFormatter':
+        """
+        Create a formatter that reads one geography of a ResultCube directly, without copying it into dictionaries.
+
+        :param cube: The fetched results.
+        :param geography: The geography to report on (None for single-location results).
+        :param derived: Optional derived metrics of that geography.
+        :param peers: Optional comparison with the most similar places.
+        """
+        return cls(cube.location(geography), derived, peers)
+
     def generate_markdown(self, show_variable_key) -> str:
         """
         Generate the complete markdown content including table of contents,
@@ -29,26 +123,43 @@ class MarkdownFormatter:
         """
         logger.info("Generating markdown content")
         try:
-            markdown = "# Census Data Report\n\n"
-            markdown += self._generate_toc()
-            markdown += self._generate_list_format(show_variable_key)
-            markdown += self._generate_table_format(show_variable_key)
+            buffer = io.StringIO()
+            self.write_markdown(buffer, show_variable_key)
             logger.info("Markdown content generated successfully")
-            return markdown
+            return buffer.getvalue()
         except Exception as e:
             logger.error(f"Error generating markdown content: {str(e)}")
             raise
 
-    def _generate_toc(self) -> str:
+    def write_markdown(self, stream: TextIO, show_variable_key) -> None:
+        """
+        Write the complete markdown content directly to a text stream, section by section.
+
+        :param stream: A writable text stream (file handle, StringIO, ...).
+        """
+        stream.write("# Census Data Report\n\n")
+        stream.write(self._generate_toc(self.peers is not None))
+        stream.write("## List Format\n\n")
+        for statistic, years_data in self.data.items():
+            self._write_list_section(stream, statistic, years_data, show_variable_key)
+        stream.write("## Table Format\n\n")
+        for statistic, years_data in self.data.items():
+            self._write_table_section(stream, statistic, years_data, show_variable_key, self.derived.get(statistic))
+        if self.peers is not None:
+            self._write_peers_section(stream, self.peers)
+
+    @staticmethod
+    def _generate_toc(peers: bool = False) -> str:
         """
         Generate the table of contents for the markdown report.
         
+        :param peers: Whether the report has a Similar Places section.
         :return: A string containing the formatted table of contents.
         """
         logger.debug("Generating table of contents")
-        toc = "## Table of Contents\n\n"
-        toc += "1. [List Format](#list-format)\n"
-        toc += "2. [Table Format](#table-format)\n"
+        toc = "## Table of Contents\n\n1. [List Format](#list-format)\n2. [Table Format](#table-format)\n"
+        if peers:
+            toc += "3. [Similar Places](#similar-places)\n"
         return toc + "\n"
 
     def _generate_list_format(self, show_variable_key) -> str:
@@ -57,18 +168,12 @@ class MarkdownFormatter:
         
         :return: A string containing the census data in list format.
         """
-
         logger.debug("Generating list format")
-        list_format = "## List Format\n\n"
+        buffer = io.StringIO()
+        buffer.write("## List Format\n\n")
         for statistic, years_data in self.data.items():
-            list_format += f"### {statistic}\n\n"
-            for year, data in years_data.items():
-                if show_variable_key:
-                    list_format += f"- {year}: {data[0]} ({data[1]})\n"
-                else:
-                    list_format += f"- {year}: {data[0]}\n"
-            list_format += "\n"
-        return list_format
+            self._write_list_section(buffer, statistic, years_data, show_variable_key)
+        return buffer.getvalue()
 
     def _generate_table_format(self, show_variable_key) -> str:
         """
@@ -77,39 +182,93 @@ class MarkdownFormatter:
         :return: A string containing the census data in table format.
         """
         logger.debug("Generating table format")
-        table_format = "## Table Format\n\n"
+        buffer = io.StringIO()
+        buffer.write("## Table Format\n\n")
         for statistic, years_data in self.data.items():
-            table_format += f"### {statistic}\n\n"
+            self._write_table_section(buffer, statistic, years_data, show_variable_key, self.derived.get(statistic))
+        return buffer.getvalue()
+
+    @staticmethod
+    def _write_list_section(stream: TextIO, statistic: str, years_data: Mapping[int, Optional[List[Any]]], show_variable_key) -> None:
+        """Write the list format section of one statistic. Missing values are shown as N/A."""
+        lines = [f"### {statistic}\n\n"]
+        for year, data in years_data.items():
+            value, identifier = data if data else ("N/A", "N/A")
             if show_variable_key:
-                table_format += "| Year | Value | Identifier |\n"
-                table_format += "|------|-------|------------|\n"
-                for year, data in sorted(years_data.items()):
-                    table_format += f"| {year} | {data[0]} | {data[1]} |\n"
+                lines.append(f"- {year}: {value} ({identifier})\n")
             else:
-                table_format += "| Year | Value |\n"
-                table_format += "|------|-------|\n"
-                for year, data in sorted(years_data.items()):
-                    table_format += f"| {year} | {data[0]} |\n"
-            table_format += "\n"
-        return table_format
+                lines.append(f"- {year}: {value}\n")
+        lines.append("\n")
+        stream.write("".join(lines))
+
+    @staticmethod
+    def _write_table_section(stream: TextIO, statistic: str, years_data: Mapping[int, Optional[List[Any]]], show_variable_key,
+                             derived: Optional[Dict[str, Dict[int, Optional[float]]]] = None) -> None:
+        """
+        Write the table format section of one statistic, sorted by year, with a column per derived metric.
+        Missing values are shown as N/A.
+        """
+        derived = derived or {}
+        extra_headers = "".join(f" {label} |" for label in derived)
+        extra_rule = "".join(f"{'-' * (len(label) + 2)}|" for label in derived)
+        lines = [f"### {statistic}\n\n"]
+        if show_variable_key:
+            lines.append(f"| Year | Value | Identifier |{extra_headers}\n")
+            lines.append(f"|------|-------|------------|{extra_rule}\n")
+        else:
+            lines.append(f"| Year | Value |{extra_headers}\n")
+            lines.append(f"|------|-------|{extra_rule}\n")
+        for year, data in sorted(years_data.items()):
+            value, identifier = data if data else ("N/A", "N/A")
+            extra_cells = "".join(f" {MarkdownFormatter._format_metric(column.get(year))} |" for column in derived.values())
+            if show_variable_key:
+                lines.append(f"| {year} | {value} | {identifier} |{extra_cells}\n")
+            else:
+                lines.append(f"| {year} | {value} |{extra_cells}\n")
+        lines.append("\n")
+        stream.write("".join(lines))
+
+    @staticmethod
+    def _write_peers_section(stream: TextIO, peers: 'PeerComparison') -> None:
+        """Write the Similar Places section: the target place (in bold) and its peers, nearest first."""
+        target = peers.rows[0]
+        headers = "".join(f" {statistic} ({year}) |" for statistic, year in zip(peers.statistics, peers.years))
+        rule = "".join(f"{'-' * (len(statistic) + len(str(year)) + 5)}|" for statistic, year in zip(peers.statistics, peers.years))
+        lines = ["## Similar Places\n\n",
+                 f"Places most similar to {target.name}, by distance between normalized statistics.\n\n",
+                 f"| Place | Distance |{headers}\n",
+                 f"|-------|----------|{rule}\n"]
+        for index, row in enumerate(peers.rows):
+            name = f"**{row.name}**" if index == 0 else row.name
+            distance = "-" if index == 0 else f"{row.distance:.2f}"
+            cells = "".join(f" {MarkdownFormatter._format_metric(value)} |" for value in row.values)
+            lines.append(f"| {name} | {distance} |{cells}\n")
+        lines.append("\n")
+        stream.write("".join(lines))
+
+    @staticmethod
+    def _format_metric(value: Optional[float]) -> str:
+        if value is None:
+            return "N/A"
+        return f"{value:.0f}" if float(value).is_integer() else f"{value:.2f}"
     
     def save_markdown(self, filename: str, show_variable_key = True):
         """
         Save the generated markdown content to a file.
+        The report is streamed to a temporary file and atomically renamed, so a failed run never leaves a partial report.
         
         :param filename: The path and name of the file to save the markdown content.
         """
         logger.info(f"Saving markdown to file: {filename}")
         try:
-            # Create the directory if it doesn't exist
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
             if show_variable_key:
                 logger.info("Variable keys will be shown in the markdown")
             else:
                 logger.info("Variable keys will not be shown in the markdown")
 
-            with open(filename, 'w') as f:
-                f.write(self.generate_markdown(show_variable_key=show_variable_key))
+            with StreamingMarkdownWriter(filename, show_variable_key=show_variable_key, peers=self.peers) as writer:
+                for statistic, years_data in self.data.items():
+                    writer.write_statistic(statistic, years_data, self.derived.get(statistic))
             logger.info(f"Markdown file saved successfully: {filename}")
         except IOError as e:
             logger.error(f"IOError while saving markdown file: {str(e)}")
@@ -120,6 +279,10 @@ class MarkdownFormatter:
 
 # Comprehensive example usage
 async def main():
+    from input_parser import InputParser
+    from url_generator import URLGenerator
+    from census_api_client import CensusAPIClient
+
     # Get the directory of the current script
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -132,11 +295,11 @@ async def main():
 
     # Generate URLs
     url_generator = URLGenerator(statistics)
-    urls = url_generator.generate_urls()
+    batches = url_generator.generate_batched_urls()
 
     # Fetch data
     client = CensusAPIClient()
-    results = await client.fetch_data(urls)
+    results = await client.fetch_batched_data(batches)
 
     # Generate markdown
     formatter = MarkdownFormatter(results)
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import bisect
+from typing import Dict, Any, List
+import aiohttp
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-request phases timed by CensusAPIClient
+PHASES = ('concurrency_wait', 'rate_limit_wait', 'connect', 'ttfb', 'body_read', 'parse', 'total')
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus-style cumulative export."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction: float) -> float:
+        """Estimate a percentile by linear interpolation inside the bucket that contains it."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= target and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (target - cumulative) / count)
+            cumulative += count
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.percentile(0.50), 6),
+            'p95': round(self.percentile(0.95), 6),
+            'p99': round(self.percentile(0.99), 6),
+            'max': round(self.max, 6),
+        }
+
+
+class MetricsCollector:
+    """
+    Aggregates per-request timings and counters for a run of CensusAPIClient and exports them
+    as a JSON run summary or in the Prometheus text exposition format.
+
+    Timed phases: time waiting for a concurrency slot and a rate limit token, connection setup,
+    time to first byte, body read and JSON parsing, plus the total time of each request.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms: Dict[str, Histogram] = {phase: Histogram() for phase in PHASES}
+        self.counters: Dict[str, int] = {
+            'requests': 0,
+            'bytes_received': 0,
+            'retries': 0,
+            'backup_requests': 0,
+            'hedged_requests': 0,
+            'coalesced_requests': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'errors': 0,
+        }
+        self.statuses: Dict[int, int] = {}
+
+    def observe(self, phase: str, seconds: float) -> None:
+        self.histograms[phase].observe(seconds)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def record_status(self, status: int) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Return an aiohttp TraceConfig that times new connection setup (DNS, TCP and TLS)."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_start(session, context, params):
+            context.connect_start = time.perf_counter()
+
+        async def on_connection_create_end(session, context, params):
+            self.observe('connect', time.perf_counter() - context.connect_start)
+
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the run summary as a JSON-serializable dictionary."""
+        elapsed = time.time() - self.started
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'requests_per_s': round(self.counters['requests'] / elapsed, 3) if elapsed else 0.0,
+            'counters': dict(self.counters),
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'timings_s': {phase: histogram.summary() for phase, histogram in self.histograms.items()},
+        }
+
+    def to_prometheus(self, prefix: str = 'census_client') -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for counter, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {value}")
+        lines.append(f"# TYPE {prefix}_responses_total counter")
+        for status, count in sorted(self.statuses.items()):
+            lines.append(f'{prefix}_responses_total{{status="{status}"}} {count}')
+        for phase, histogram in self.histograms.items():
+            name = f"{prefix}_{phase}_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum {histogram.sum}")
+            lines.append(f"{name}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        logger.info(f"Metrics summary written to {path}")
+
+    def write_prometheus(self, path: str) -> None:
+        # Write then rename so a node_exporter textfile collector never reads a partial file
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"Prometheus metrics written to {path}")
@@ -0,0 +1,132 @@
+import re
+import math
+import zlib
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+from aiohttp import web
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class MockCensusServer:
+    """
+    Local stand-in for api.census.gov that serves Census-shaped `[[headers], [values], ...]` responses.
+
+    Latency follows a log-normal distribution around `latency_median` seconds, a fraction of requests
+    fail with 500 (`error_rate`) or 429 (`throttle_rate`), and wildcard geographies (`for=place:*`)
+    return `wildcard_rows` rows. Values are derived deterministically from the variable, year and
+    geography so repeated runs return the same data. Point the client at it with `api.base_url`.
+    """
+
+    def __init__(self, latency_median: float = 0.05, latency_sigma: float = 0.5, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, wildcard_rows: int = 100, group_size: int = 20, seed: Optional[int] = None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.wildcard_rows = wildcard_rows
+        self.group_size = group_size
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.status_counts: Dict[int, int] = {}
+        self.runner: Optional[web.AppRunner] = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(r'/data/{year:\d+}/{dataset:.+}', self.handle)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start serving in the running event loop and return the base URL (port 0 picks a free port)."""
+        self.runner = web.AppRunner(self.create_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        bound_port = self.runner.addresses[0][1]
+        logger.info(f"Mock Census API listening on http://{host}:{bound_port}")
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def _respond(self, status: int, body=None) -> web.Response:
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if body is None:
+            return web.Response(status=status, text=f"error: mock status {status}")
+        return web.json_response(body, status=status)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        await asyncio.sleep(self.random.lognormvariate(math.log(self.latency_median), self.latency_sigma))
+
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            return self._respond(429)
+        if roll < self.throttle_rate + self.error_rate:
+            return self._respond(500)
+
+        year = request.match_info['year']
+        variables = self._expand_variables(request.query.get('get', ''))
+        if not variables:
+            return self._respond(400)
+        geographies, geography_columns = self._geographies(request.query)
+        headers = variables + [column for column, _ in geography_columns]
+
+        rows = [headers]
+        for geo_id, name in geographies:
+            row = []
+            for variable in variables:
+                if variable == 'GEO_ID':
+                    row.append(geo_id)
+                elif variable == 'NAME':
+                    row.append(name)
+                else:
+                    row.append(str(zlib.crc32(f"{variable}|{year}|{geo_id}".encode()) % 100000))
+            row.extend(value(geo_id) for _, value in geography_columns)
+            rows.append(row)
+        return self._respond(200, rows)
+
+    def _expand_variables(self, get_clause: str) -> List[str]:
+        variables = []
+        for variable in get_clause.split(','):
+            group = re.fullmatch(r'group\((\w+)\)', variable)
+            if group:
+                # Like the real API, a group response also carries the GEO_ID and NAME columns
+                variables.extend(f"{group.group(1)}_{index:03d}E" for index in range(1, self.group_size + 1))
+                variables.extend(column for column in ('GEO_ID', 'NAME') if column not in variables)
+            elif variable:
+                variables.append(variable)
+        return variables
+
+    def _geographies(self, query) -> tuple:
+        if 'ucgid' in query:
+            ucgids = query['ucgid'].split(',')
+            return [(ucgid, f"Mock place {ucgid}") for ucgid in ucgids], [('ucgid', lambda geo_id: geo_id)]
+
+        for_clause = query.get('for', 'us:1')
+        level, _, code = for_clause.partition(':')
+        state = query.get('in', 'state:17').partition(':')[2] or '17'
+        codes = [f"{index:05d}" for index in range(1, self.wildcard_rows + 1)] if code == '*' else [code]
+        geographies = [(f"1600000US{state}{place}", f"Mock {level} {place}, State {state}") for place in codes]
+        return geographies, [('state', lambda geo_id: geo_id[9:11]), (level, lambda geo_id: geo_id[11:])]
+
+
+# Usage example
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Census-shaped responses locally for benchmarking")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-median', type=float, default=0.05, help="Median response latency in seconds")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="Log-normal sigma of the latency distribution")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--wildcard-rows', type=int, default=100, help="Rows returned for wildcard geographies")
+    args = parser.parse_args()
+
+    server = MockCensusServer(args.latency_median, args.latency_sigma, args.error_rate, args.throttle_rate, args.wildcard_rows)
+    web.run_app(server.create_app(), host=args.host, port=args.port)
@@ -0,0 +1,188 @@
+import sys
+import json
+import urllib.parse
+from typing import Dict, Any, List, Optional, Iterator, Tuple, NamedTuple, TYPE_CHECKING
+from utils.logging_config import get_logger
+from utils.config_loader import config
+from url_generator import GEOGRAPHY_PARAMS
+from census_urls import normalize_url, dataset_of
+
+if TYPE_CHECKING:
+    # response_cache imports aiohttp; `cli.py plan` only needs it for --dry-run
+    from response_cache import ResponseCache
+
+logger = get_logger(__name__)
+
+PLAN_FORMAT_VERSION = 1
+
+
+class PlannedRequest(NamedTuple):
+    """One API request of a compiled plan. The URL is normalized (API key stripped, parameters sorted)."""
+    dataset: str
+    year: int
+    scope: str
+    strategy: str
+    variables: Tuple[str, ...]
+    statistics: Tuple[str, ...]
+    url: str
+
+
+class PlanEstimate(NamedTuple):
+    requests: int
+    cached: int
+    network_requests: int
+    cache_hit_ratio: float
+    estimated_seconds: float
+    concurrency: int
+    rate_limit: float
+    latency: float
+
+
+class RequestPlan:
+    """
+    Immutable, compact form of the batches planned by URLGenerator.generate_batched_urls: one PlannedRequest per
+    distinct request, deduplicated by normalized URL and sorted by dataset, year and geography. Plans can be
+    saved as JSON, loaded back and diffed, so the cost of a large config can be checked before it is run.
+
+    Usage:
+        plan = RequestPlan.compile(url_generator.generate_batched_urls())
+        print(plan.estimate(ResponseCache()))
+        added, removed = plan.diff(RequestPlan.load('data/plans/previous.json'))
+    """
+
+    __slots__ = ('requests',)
+
+    def __init__(self, requests: Tuple[PlannedRequest, ...]):
+        self.requests = requests
+
+    @classmethod
+    def compile(cls, batches: List[Dict[str, Any]]) -> 'RequestPlan':
+        """Compile planned batches into a RequestPlan."""
+        requests: Dict[str, PlannedRequest] = {}
+        for batch in batches:
+            url = normalize_url(batch['primary'])
+            if url in requests:
+                # Identical requests are issued once; the statistics they serve are merged
+                existing = requests[url]
+                statistics = existing.statistics + tuple(name for name in batch['statistics'] if name not in existing.statistics)
+                requests[url] = existing._replace(statistics=tuple(sys.intern(name) for name in statistics))
+                continue
+            params = urllib.parse.urlsplit(url).query.split('&')
+            get_clause = next((param[len('get='):] for param in params if param.startswith('get=')), '')
+            requests[url] = PlannedRequest(
+                dataset=sys.intern(dataset_of(url)),
+                year=batch['year'],
+                scope=sys.intern('&'.join(param for param in params if param.split('=', 1)[0] in GEOGRAPHY_PARAMS)),
+                strategy=sys.intern(batch['strategy']),
+                variables=tuple(sys.intern(variable) for variable in urllib.parse.unquote(get_clause).split(',') if variable),
+                statistics=tuple(sys.intern(name) for name in batch['statistics']),
+                url=url,
+            )
+        plan = cls(tuple(sorted(requests.values(), key=lambda request: (request.dataset, request.year, request.scope, request.url))))
+        if len(plan) < len(batches):
+            logger.info(f"Merged {len(batches) - len(plan)} duplicate requests")
+        return plan
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    def __iter__(self) -> Iterator[PlannedRequest]:
+        return iter(self.requests)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, RequestPlan) and self.requests == other.requests
+
+    def cells(self) -> int:
+        """Return the number of statistic/year pairs served by the plan."""
+        return sum(len(request.statistics) for request in self.requests)
+
+    def strategies(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for request in self.requests:
+            counts[request.strategy] = counts.get(request.strategy, 0) + 1
+        return counts
+
+    def to_json(self) -> str:
+        """Serialize the plan, one request per line so saved plans diff cleanly."""
+        lines = [json.dumps(list(request)) for request in self.requests]
+        return (f'{{"version": {PLAN_FORMAT_VERSION}, "fields": {json.dumps(list(PlannedRequest._fields))}, "requests": [\n'
+                + ',\n'.join(lines) + '\n]}\n')
+
+    @classmethod
+    def from_json(cls, text: str) -> 'RequestPlan':
+        data = json.loads(text)
+        if data.get('version') != PLAN_FORMAT_VERSION:
+            raise ValueError(f"Unsupported plan format version {data.get('version')!r}")
+        return cls(tuple(PlannedRequest(dataset, year, scope, strategy, tuple(variables), tuple(statistics), url)
+                         for dataset, year, scope, strategy, variables, statistics, url in data['requests']))
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(self.to_json())
+        logger.info(f"Saved plan of {len(self)} requests to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> 'RequestPlan':
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls.from_json(file.read())
+
+    def diff(self, previous: 'RequestPlan') -> Tuple[List[PlannedRequest], List[PlannedRequest]]:
+        """
+        Compare the plan with a previous one.
+
+        Returns:
+            The requests only in this plan and the requests only in the previous plan, in plan order.
+        """
+        current, before = set(self.requests), set(previous.requests)
+        return ([request for request in self.requests if request not in before],
+                [request for request in previous.requests if request not in current])
+
+    def estimate(self, cache: Optional['ResponseCache'] = None, concurrency: Optional[int] = None,
+                 latency: Optional[float] = None) -> PlanEstimate:
+        """
+        Estimate the cost of running the plan. Requests with a fresh cached response cost nothing; the others
+        are limited both by the concurrency (each takes `latency` seconds) and by the per-host rate limit.
+
+        Args:
+            cache: The response cache to check, or None to assume nothing is cached.
+            concurrency: Concurrent requests. Defaults to `performance.concurrent_requests`.
+            latency: Seconds per request. Defaults to `performance.estimated_latency`.
+        """
+        concurrency = concurrency or config.get('performance.concurrent_requests', 5)
+        latency = latency if latency is not None else config.get('performance.estimated_latency', 0.5)
+        rate_limit = config.get('performance.rate_limit_per_second', 10)
+
+        per_host: Dict[str, int] = {}
+        cached = 0
+        for request in self.requests:
+            if cache is not None and cache.contains(request.url):
+                cached += 1
+                continue
+            host = urllib.parse.urlsplit(request.url).netloc
+            per_host[host] = per_host.get(host, 0) + 1
+        network_requests = len(self.requests) - cached
+        seconds = max([network_requests * latency / concurrency] + [count / rate_limit for count in per_host.values()])
+        return PlanEstimate(
+            requests=len(self.requests),
+            cached=cached,
+            network_requests=network_requests,
+            cache_hit_ratio=cached / len(self.requests) if self.requests else 0.0,
+            estimated_seconds=seconds,
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            latency=latency,
+        )
+
+
+# Usage example
+if __name__ == "__main__":
+    import os
+    from input_parser import InputParser
+    from url_generator import URLGenerator
+    from response_cache import ResponseCache
+
+    json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "input", "census_stats_config.json")
+    input_parser = InputParser(json_path)
+    plan = RequestPlan.compile(URLGenerator(input_parser.get_statistics(), input_parser.get_geography()).generate_batched_urls())
+    print(plan.to_json())
+    print(plan.estimate())
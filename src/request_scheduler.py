@@ -0,0 +1,151 @@
+import time
+import asyncio
+import urllib.parse
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, AsyncIterator
+import aiohttp
+from utils.logging_config import get_logger
+from utils.config_loader import config
+
+logger = get_logger(__name__)
+
+# Status codes the Census API uses to signal that we are sending requests too fast
+THROTTLE_STATUSES = (429, 503)
+
+
+class TokenBucket:
+    """Token bucket rate limiter: allows `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limiter. The limit grows by one after a full window of healthy responses
+    (latency under `target_latency`) and is halved when the API throttles us, so the number of
+    in-flight requests tracks what the API is currently willing to serve.
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, target_latency: float):
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, status: Optional[int], latency: float) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            if status in THROTTLE_STATUSES:
+                self._decrease()
+            elif status is not None and status < 400 and latency <= self.target_latency:
+                self._increase()
+            self.condition.notify_all()
+
+    def _increase(self) -> None:
+        self.successes += 1
+        if self.successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self.successes = 0
+            logger.debug("Raised concurrency limit to %d", self.limit)
+
+    def _decrease(self) -> None:
+        # A burst of throttled responses belongs to the same congestion event, so only back off once per latency window
+        now = time.monotonic()
+        if now - self.last_decrease < self.target_latency:
+            return
+        self.last_decrease = now
+        self.successes = 0
+        self.limit = max(self.min_limit, self.limit // 2)
+        logger.warning(f"API throttled requests, lowered concurrency limit to {self.limit}")
+
+
+class RequestSlot:
+    """Handle yielded by RequestScheduler.slot; the caller records the response status on it."""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.concurrency_wait = 0.0
+        self.rate_limit_wait = 0.0
+
+
+class RequestScheduler:
+    """
+    Schedules Census API requests: a pooled session with keep-alive, a token bucket per host
+    and an adaptive concurrency limit shared by every request issued through it.
+
+    `rate_share` is the fraction of the configured per-host rate limit this scheduler may use, e.g. 1/N for
+    each of N processes requesting the same host, so that together they stay within the limit.
+    """
+
+    def __init__(self, rate_share: float = 1.0):
+        self.connection_limit = config.get('performance.connection_limit', 100)
+        self.connection_limit_per_host = config.get('performance.connection_limit_per_host', 20)
+        self.keepalive_timeout = config.get('performance.keepalive_timeout', 30)
+        self.rate_limit = config.get('performance.rate_limit_per_second', 10) * rate_share
+        self.rate_limit_burst = max(1.0, config.get('performance.rate_limit_burst', 10) * rate_share)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=config.get('performance.concurrent_requests', 5),
+            min_limit=config.get('performance.min_concurrent_requests', 1),
+            max_limit=config.get('performance.max_concurrent_requests', 20),
+            target_latency=config.get('performance.target_latency', 2.0),
+        )
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def create_session(self, trace_configs: Optional[List[aiohttp.TraceConfig]] = None) -> aiohttp.ClientSession:
+        """Create a pooled client session using the configured connector limits."""
+        connector = aiohttp.TCPConnector(limit=self.connection_limit,
+                                         limit_per_host=self.connection_limit_per_host,
+                                         keepalive_timeout=self.keepalive_timeout,
+                                         ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector, trace_configs=trace_configs)
+
+    def _bucket_for(self, url: str) -> TokenBucket:
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate_limit, self.rate_limit_burst)
+        return self.buckets[host]
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[RequestSlot]:
+        """
+        Wait for a concurrency slot and a rate limit token for the URL's host, then hold the slot
+        for the duration of the request. Set `status` on the yielded slot so the limiter can adapt.
+        """
+        request_slot = RequestSlot()
+        start = time.monotonic()
+        await self.limiter.acquire()
+        request_slot.concurrency_wait = time.monotonic() - start
+        try:
+            start = time.monotonic()
+            await self._bucket_for(url).acquire()
+            request_slot.rate_limit_wait = time.monotonic() - start
+            start = time.monotonic()
+            yield request_slot
+        finally:
+            await self.limiter.release(request_slot.status, time.monotonic() - start)
@@ -0,0 +1,223 @@
+import os
+import time
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+from typing import Dict, Any, Optional, Union, IO
+from utils.logging_config import get_logger
+from utils.config_loader import config
+from census_urls import normalize_url, dataset_of
+
+logger = get_logger(__name__)
+
+CACHE_MODES = ('use', 'refresh', 'offline')
+# Bytes copied at a time when a spooled response body is written into the cache
+BLOB_CHUNK_SIZE = 1024 * 1024
+# Eviction trims the cache to this fraction of its cap, so it does not run again on the very next write
+EVICTION_TARGET = 0.9
+
+
+class CacheMissError(aiohttp.ClientError):
+    """Raised in offline mode when a response is not in the cache."""
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of raw Census API responses.
+
+    Entries are keyed by the normalized request URL (API key stripped, query parameters sorted),
+    expire after a per-dataset TTL and are evicted least-recently-used once the cache grows past
+    its size cap. Published Census vintages do not change, so most entries can live for a long time.
+
+    The total size is kept in memory, so a write only evicts once the cap is crossed. Writes and recency
+    updates are committed every `cache.commit_every` operations and on `flush()`/`close()`. The async
+    methods run on the cache's own worker thread, keeping SQLite off the event loop.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size_mb: Optional[float] = None,
+                 default_ttl: Optional[int] = None, dataset_ttls: Optional[Dict[str, int]] = None):
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        path = path or config.get('cache.path', './data/cache/census_responses.sqlite')
+        self.path = path if os.path.isabs(path) else os.path.join(project_root, path)
+        self.max_size_bytes = int((max_size_mb or config.get('cache.max_size_mb', 512)) * 1024 * 1024)
+        self.default_ttl = default_ttl if default_ttl is not None else config.get('cache.default_ttl', 2592000)
+        self.dataset_ttls = dataset_ttls if dataset_ttls is not None else config.get('cache.dataset_ttls', {})
+        self.commit_every = config.get('cache.commit_every', 100)
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._accessed: Dict[str, float] = {}
+        # A single worker thread serializes every access to the connection made through the async methods
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='response-cache')
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                dataset TEXT,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.commit()
+        self.total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        logger.info(f"Initialized response cache at {self.path}")
+
+    # Kept on the class for callers that already import it; defined in census_urls, which does not import aiohttp
+    normalize_url = staticmethod(normalize_url)
+    dataset_of = staticmethod(dataset_of)
+
+    def ttl_for(self, dataset: str) -> int:
+        """Return the TTL in seconds for a dataset (0 means never expires), using the longest matching prefix."""
+        matches = [prefix for prefix in self.dataset_ttls if dataset == prefix or dataset.startswith(prefix + '/')]
+        if not matches:
+            return self.default_ttl
+        return self.dataset_ttls[max(matches, key=len)] or 0
+
+    def get(self, url: str) -> Optional[Union[str, bytes]]:
+        """
+        Return the cached response body for a URL, or None if it is missing or expired. Bodies written with
+        `set_file` are returned as UTF-8 bytes.
+
+        Args:
+            url: The request URL.
+        """
+        key = self.normalize_url(url)
+        row = self.connection.execute("SELECT body, dataset, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None:
+            body, dataset, created = row
+            ttl = self.ttl_for(dataset)
+            if not ttl or now - created < ttl:
+                self._accessed[key] = now
+                self._count_pending()
+                self.hits += 1
+                logger.debug("Cache hit for %s", key)
+                return body
+            logger.debug("Cache entry expired for %s", key)
+        self.misses += 1
+        return None
+
+    def contains(self, url: str) -> bool:
+        """Return whether a fresh response for a URL is cached, without counting a hit or touching its recency."""
+        row = self.connection.execute("SELECT dataset, created FROM responses WHERE key = ?", (self.normalize_url(url),)).fetchone()
+        if row is None:
+            return False
+        ttl = self.ttl_for(row[0])
+        return not ttl or time.time() - row[1] < ttl
+
+    def set(self, url: str, body: Union[str, bytes]) -> None:
+        """
+        Store a response body for a URL and evict least-recently-used entries past the size cap.
+
+        Args:
+            url: The request URL.
+            body: The raw response body, as text or UTF-8 bytes.
+        """
+        if isinstance(body, bytes):
+            size, body = len(body), body.decode('utf8')
+        else:
+            size = len(body.encode('utf8'))
+        self._insert(url, size, body)
+        self._stored(size)
+
+    def set_file(self, url: str, file: IO[bytes], size: int) -> None:
+        """
+        Store a response body spooled to a file of `size` bytes, copying it into the database in chunks of
+        BLOB_CHUNK_SIZE, so a large body is never held in memory as a whole.
+        """
+        rowid = self._insert(url, size)
+        file.seek(0)
+        with self.connection.blobopen('responses', 'body', rowid) as blob:
+            while True:
+                chunk = file.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                blob.write(chunk)
+        self._stored(size)
+
+    def _insert(self, url: str, size: int, body: Optional[str] = None) -> int:
+        """Insert or replace the entry of a URL, with an empty (zero-filled) body of `size` bytes if none is given. Returns its rowid."""
+        key = self.normalize_url(url)
+        now = time.time()
+        replaced = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        cursor = self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, dataset, body, size, created, accessed) VALUES (?, ?, COALESCE(?, zeroblob(?)), ?, ?, ?)",
+            (key, self.dataset_of(url), body, size, size, now, now))
+        self._accessed.pop(key, None)
+        self.total_size -= replaced[0] if replaced else 0
+        return cursor.lastrowid
+
+    def _stored(self, size: int) -> None:
+        self.total_size += size
+        if self.total_size > self.max_size_bytes:
+            self._evict()
+        self._count_pending()
+
+    def _count_pending(self) -> None:
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.flush()
+
+    def _write_accessed(self) -> None:
+        if self._accessed:
+            self.connection.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                        [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+    def flush(self) -> None:
+        """Write pending recency updates and commit pending writes."""
+        self._write_accessed()
+        self.connection.commit()
+        self._pending = 0
+
+    def _evict(self) -> None:
+        self._write_accessed()
+        target = self.max_size_bytes * EVICTION_TARGET
+        evicted = 0
+        while self.total_size > target:
+            victims = self.connection.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 256").fetchall()
+            if not victims:
+                break
+            for key, size in victims:
+                if self.total_size <= target:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_size -= size
+                evicted += 1
+        self.connection.commit()
+        self._pending = 0
+        logger.info(f"Evicted {evicted} least recently used cache entries")
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def get_async(self, url: str) -> Optional[Union[str, bytes]]:
+        """`get`, run on the cache's worker thread."""
+        return await self._run(self.get, url)
+
+    async def set_async(self, url: str, body: Union[str, bytes]) -> None:
+        """`set`, run on the cache's worker thread."""
+        await self._run(self.set, url, body)
+
+    async def set_file_async(self, url: str, file: IO[bytes], size: int) -> None:
+        """`set_file`, run on the cache's worker thread."""
+        await self._run(self.set_file, url, file, size)
+
+    async def flush_async(self) -> None:
+        await self._run(self.flush)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size of the cache."""
+        entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'size_bytes': self.total_size}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.flush()
+        self.connection.close()
@@ -0,0 +1,97 @@
+import json
+from typing import List, Iterator, Optional, Union
+
+try:
+    # orjson is an optional dependency; it parses Census responses several times faster than the json module
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Candidate row boundaries tried per chunk before waiting for more data
+_MAX_CUT_ATTEMPTS = 4
+
+
+def parse_rows(body: Union[str, bytes]) -> List[List[str]]:
+    """Parse a complete Census API response body into its rows, checking that it is a list of lists."""
+    data = _loads(body)
+    if not isinstance(data, list) or not all(isinstance(row, list) for row in data):
+        raise ValueError("Unexpected response format from API")
+    return data
+
+
+class RowStreamParser:
+    """
+    Incremental parser for Census API responses, which are a JSON array of rows (`[[headers], [values], ...]`).
+
+    Feed it the body in chunks as they arrive: the complete rows of each chunk are decoded in one `loads`
+    call as soon as they have been received, so a large response is never held as one buffer and one string.
+    A chunk is cut after its last `]` that ends a row; a cut that falls inside a string or a row leaves an
+    unbalanced segment that fails to decode, in which case an earlier `]` is tried.
+
+    Usage:
+        parser = RowStreamParser()
+        async for chunk in response.content.iter_chunked(65536):
+            rows.extend(parser.feed(chunk))
+        parser.close()
+    """
+
+    def __init__(self):
+        self._buffer = b''
+        self._opened = False
+        self._expect_comma = False
+        self.rows_parsed = 0
+        self.bytes_parsed = 0
+
+    def feed(self, chunk: bytes) -> Iterator[List[str]]:
+        """Add a chunk of the body and yield every row it completes."""
+        self.bytes_parsed += len(chunk)
+        self._buffer += chunk
+        if not self._opened:
+            self._buffer = self._buffer.lstrip()
+            if not self._buffer:
+                return
+            if not self._buffer.startswith(b'['):
+                raise ValueError("Unexpected response format from API")
+            self._buffer = self._buffer[1:]
+            self._opened = True
+
+        end = len(self._buffer)
+        for _ in range(_MAX_CUT_ATTEMPTS):
+            end = self._buffer.rfind(b']', 0, end)
+            if end < 0:
+                return
+            rows = self._decode(self._buffer[:end + 1])
+            if rows is not None:
+                self._buffer = self._buffer[end + 1:]
+                self._expect_comma = True
+                self.rows_parsed += len(rows)
+                yield from rows
+                return
+
+    def _decode(self, segment: bytes) -> Optional[List[List[str]]]:
+        """Decode a run of rows, or return None when the segment does not end on a row boundary."""
+        segment = segment.lstrip()
+        if self._expect_comma:
+            if not segment.startswith(b','):
+                return None
+            segment = segment[1:]
+        try:
+            rows = _loads(b'[' + segment + b']')
+        except ValueError:
+            return None
+        if not all(isinstance(row, list) for row in rows):
+            raise ValueError("Unexpected response format from API")
+        return rows
+
+    def close(self) -> None:
+        """Check that the body ended with the closing bracket of the outer array."""
+        rest = self._buffer.strip()
+        if self._opened and rest.startswith(b']') and rest != b']':
+            raise ValueError("Unexpected response format from API: data after the closing bracket")
+        if not self._opened or rest != b']':
+            raise ValueError("Unexpected response format from API: truncated response")
@@ -0,0 +1,237 @@
+import sys
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple, TYPE_CHECKING
+from utils.logging_config import get_logger
+
+if TYPE_CHECKING:
+    from census_api_client import ResultRecord
+
+logger = get_logger(__name__)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ResultCube:
+    """
+    Array-backed results of a run: a geographies x statistics x years float64 array, NaN where a value is missing.
+
+    The statistic, year and geography axes are interned and indexed by dict, so a cell lookup is O(1) and a
+    statistic, year or geography is sliced as an array view. Variable codes (the response header of each
+    statistic and year) live in a small side table, and the rare non-numeric values in a sparse dict. Single-
+    location results use a None geography. 10k locations x 30 statistics x 10 years take about 24 MB.
+
+    `location(geography)` returns a read-only {statistic: {year: [value, header]}} view, the shape that
+    MarkdownFormatter, the exporters and the derived metrics engine read.
+
+    Usage:
+        cube = ResultCube.from_batches(batches)
+        for record in records:
+            cube.add(record)
+        cube.statistic('Median Income')     # geographies x years array
+        cube.get(geo_id, 'Median Income', 2022)
+    """
+
+    def __init__(self, statistics: List[str], years: List[int], geographies: Iterable[Optional[str]] = ()):
+        self.statistics: List[str] = [sys.intern(name) for name in statistics]
+        self.years: List[int] = list(years)
+        self.geographies: List[Optional[str]] = []
+        self._statistic_index = {name: index for index, name in enumerate(self.statistics)}
+        self._year_index = {year: index for index, year in enumerate(self.years)}
+        self._geography_index: Dict[Optional[str], int] = {}
+        self._values = np.full((0, len(self.statistics), len(self.years)), np.nan)
+        # Which years each statistic requests; cells outside it are not part of the results
+        self.requested = np.zeros((len(self.statistics), len(self.years)), dtype=bool)
+        self.headers: List[str] = []
+        self._header_index: Dict[str, int] = {}
+        self._header_ids = np.full((len(self.statistics), len(self.years)), -1, dtype=np.int32)
+        self._text: Dict[Tuple[int, int, int], str] = {}
+        for geography in geographies:
+            self._row(geography)
+
+    @classmethod
+    def from_batches(cls, batches: List[Dict[str, Any]]) -> 'ResultCube':
+        """Create an empty cube for the statistics (in config order) and years (ascending) of planned batches."""
+        positions: Dict[str, int] = {}
+        years: Dict[int, None] = {}
+        for batch in batches:
+            years[batch['year']] = None
+            for stat_name in batch['statistics']:
+                positions.setdefault(stat_name, batch.get('positions', {}).get(stat_name, len(positions)))
+        cube = cls(sorted(positions, key=positions.get), sorted(years))
+        for batch in batches:
+            for stat_name in batch['statistics']:
+                cube.requested[cube._statistic_index[stat_name], cube._year_index[batch['year']]] = True
+        return cube
+
+    @classmethod
+    def from_dict(cls, results: Dict[Optional[str], Dict[str, Dict[int, Optional[List[Any]]]]]) -> 'ResultCube':
+        """Create a cube from {geography: {statistic: {year: [value, header]}}} results."""
+        statistics: Dict[str, None] = {}
+        years: Dict[int, None] = {}
+        for location_results in results.values():
+            for stat_name, years_data in location_results.items():
+                statistics[stat_name] = None
+                years.update(dict.fromkeys(years_data))
+        cube = cls(list(statistics), sorted(years), results)
+        for geography, location_results in results.items():
+            for stat_name, years_data in location_results.items():
+                for year, data in years_data.items():
+                    cube.requested[cube._statistic_index[stat_name], cube._year_index[year]] = True
+                    if data is not None:
+                        cube.set(geography, stat_name, year, data[0], data[1])
+        return cube
+
+    def derive(self, geographies: List[Optional[str]], values: np.ndarray) -> 'ResultCube':
+        """
+        Create a cube over other geographies that shares this cube's statistics, years, requested years and
+        variable codes, e.g. the parent geographies of a rollup. `values` is its geographies x statistics x years array.
+        """
+        cube = ResultCube(self.statistics, self.years, geographies)
+        cube.values[:] = values
+        cube.requested = self.requested.copy()
+        cube.headers = list(self.headers)
+        cube._header_index = dict(self._header_index)
+        cube._header_ids = self._header_ids.copy()
+        return cube
+
+    def _row(self, geography: Optional[str]) -> int:
+        row = self._geography_index.get(geography)
+        if row is None:
+            row = len(self.geographies)
+            if row == len(self._values):
+                # Grow the geography axis by doubling, so filling a cube row by row stays amortized O(1)
+                grown = np.full((max(2 * row, 16),) + self._values.shape[1:], np.nan)
+                grown[:row] = self._values
+                self._values = grown
+            self.geographies.append(_intern(geography))
+            self._geography_index[self.geographies[row]] = row
+        return row
+
+    @property
+    def values(self) -> np.ndarray:
+        """The geographies x statistics x years array (a view, without the spare capacity)."""
+        return self._values[:len(self.geographies)]
+
+    @property
+    def nbytes(self) -> int:
+        return self._values.nbytes + self._header_ids.nbytes + self.requested.nbytes
+
+    def set(self, geography: Optional[str], statistic: str, year: int, value: Any, header: Optional[str]) -> None:
+        """Store one cell. Values that are not numbers are kept as text."""
+        row, column, depth = self._row(geography), self._statistic_index[statistic], self._year_index[year]
+        if isinstance(value, (int, float)):
+            self._values[row, column, depth] = value
+            self._text.pop((row, column, depth), None)
+        else:
+            self._values[row, column, depth] = np.nan
+            self._text[(row, column, depth)] = str(value)
+        if header is not None:
+            header_id = self._header_index.get(header)
+            if header_id is None:
+                header_id = self._header_index[header] = len(self.headers)
+                self.headers.append(sys.intern(header))
+            self._header_ids[column, depth] = header_id
+
+    def add(self, record: 'ResultRecord') -> None:
+        """Store a fetched record; failed cells (None values) only register their geography."""
+        if record.value is None:
+            self._row(record.geography)
+            return
+        self.set(record.geography, record.statistic, record.year, record.value[0], record.value[1])
+
+    def _cell(self, row: int, column: int, depth: int) -> Optional[List[Any]]:
+        value = self._values[row, column, depth]
+        if value != value:
+            text = self._text.get((row, column, depth))
+            if text is None:
+                return None
+            value = text
+        else:
+            value = float(value)
+        header_id = self._header_ids[column, depth]
+        return [value, self.headers[header_id] if header_id >= 0 else None]
+
+    def get(self, geography: Optional[str], statistic: str, year: int) -> Optional[List[Any]]:
+        """Return the [value, header] of a cell, or None when it is missing."""
+        row = self._geography_index.get(geography)
+        if row is None:
+            return None
+        return self._cell(row, self._statistic_index[statistic], self._year_index[year])
+
+    def statistic(self, statistic: str) -> np.ndarray:
+        """Return the geographies x years values of a statistic (a view)."""
+        return self.values[:, self._statistic_index[statistic], :]
+
+    def year(self, year: int) -> np.ndarray:
+        """Return the geographies x statistics values of a year (a view)."""
+        return self.values[:, :, self._year_index[year]]
+
+    def geography(self, geography: Optional[str]) -> np.ndarray:
+        """Return the statistics x years values of a geography (a view)."""
+        return self.values[self._geography_index[geography]]
+
+    def years_of(self, statistic: str) -> List[int]:
+        """Return the years requested for a statistic, in axis order."""
+        mask = self.requested[self._statistic_index[statistic]]
+        return [year for year, wanted in zip(self.years, mask) if wanted]
+
+    def location(self, geography: Optional[str]) -> 'LocationView':
+        """Return a {statistic: {year: [value, header]}} view of a geography."""
+        return LocationView(self, self._geography_index[geography])
+
+    def records(self) -> Iterator['ResultRecord']:
+        """Yield one ResultRecord per requested cell, None for missing values."""
+        from census_api_client import ResultRecord
+        for geography in self.geographies:
+            for stat_name, years_data in self.location(geography).items():
+                for year, value in years_data.items():
+                    yield ResultRecord(stat_name, year, geography, value)
+
+    def to_dict(self) -> Dict[Optional[str], Dict[str, Dict[int, Optional[List[Any]]]]]:
+        return {geography: self.location(geography).to_dict() for geography in self.geographies}
+
+
+class LocationView(Mapping):
+    """Read-only {statistic: {year: [value, header]}} view of one geography of a ResultCube."""
+    __slots__ = ('_cube', '_row')
+
+    def __init__(self, cube: ResultCube, row: int):
+        self._cube = cube
+        self._row = row
+
+    def __getitem__(self, statistic: str) -> 'SeriesView':
+        return SeriesView(self._cube, self._row, self._cube._statistic_index[statistic])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._cube.statistics)
+
+    def __len__(self) -> int:
+        return len(self._cube.statistics)
+
+    def to_dict(self) -> Dict[str, Dict[int, Optional[List[Any]]]]:
+        return {stat_name: dict(years_data) for stat_name, years_data in self.items()}
+
+
+class SeriesView(Mapping):
+    """Read-only {year: [value, header]} view of one statistic of one geography, over its requested years."""
+    __slots__ = ('_cube', '_row', '_column')
+
+    def __init__(self, cube: ResultCube, row: int, column: int):
+        self._cube = cube
+        self._row = row
+        self._column = column
+
+    def __getitem__(self, year: int) -> Optional[List[Any]]:
+        depth = self._cube._year_index[year]
+        if not self._cube.requested[self._column, depth]:
+            raise KeyError(year)
+        return self._cube._cell(self._row, self._column, depth)
+
+    def __iter__(self) -> Iterator[int]:
+        return (year for year, wanted in zip(self._cube.years, self._cube.requested[self._column]) if wanted)
+
+    def __len__(self) -> int:
+        return int(self._cube.requested[self._column].sum())
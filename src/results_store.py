@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import urllib.parse
+from typing import Dict, Any, List, Optional, Iterable, Tuple, TYPE_CHECKING
+from utils.logging_config import get_logger
+from utils.config_loader import config
+from variable_index import parse_api_url
+
+if TYPE_CHECKING:
+    from census_api_client import ResultRecord
+
+logger = get_logger(__name__)
+
+# Query parameters that define which geographies a request covers
+SCOPE_PARAMS = ('ucgid', 'for', 'in')
+# Geographies per `geography IN (...)` query, within SQLite's limit on bound parameters
+GEOGRAPHY_CHUNK = 500
+
+
+class ResultsStore:
+    """
+    Local SQLite store of successfully fetched cells, keyed by statistic, dataset, variable, year and geography.
+
+    A run computes the delta between the config and the store (`pending_batches`) and only requests the
+    batches with missing or invalidated cells. Reports are regenerated only when the content hash of their
+    inputs changes (`report_changed` / `mark_report`).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        path = path or config.get('results_store.path', './data/store/results.sqlite')
+        self.path = path if os.path.isabs(path) else os.path.join(project_root, path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Several job runner processes may write at once; WAL lets readers proceed while one of them writes
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS cells (
+                statistic TEXT NOT NULL,
+                dataset TEXT NOT NULL,
+                variable TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                scope TEXT NOT NULL,
+                geography TEXT NOT NULL,
+                value_real REAL,
+                value_text TEXT,
+                header TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (statistic, dataset, variable, year, scope, geography)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS reports (
+                name TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                generated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS locations (
+                geography TEXT PRIMARY KEY,
+                name TEXT NOT NULL
+            );
+        """)
+        self.connection.commit()
+
+    @staticmethod
+    def cell_keys(batch: Dict[str, Any]) -> Dict[str, Tuple[str, str, int, str]]:
+        """
+        Return the (dataset, variable, year, scope) key of each statistic in a batch. The scope is the
+        geography clause of the request (a ucgid list or for/in wildcard), shared by every row it returns.
+        """
+        dataset, _ = parse_api_url(batch['primary'])
+        query = urllib.parse.urlsplit(batch['primary']).query
+        scope = '&'.join(sorted(param for param in query.split('&') if param.split('=', 1)[0] in SCOPE_PARAMS))
+        return {stat_name: (dataset, variable or '', batch['year'], scope) for stat_name, variable in batch['statistics'].items()}
+
+    def _has_cell(self, stat_name: str, key: Tuple[str, str, int, str]) -> bool:
+        return self.connection.execute(
+            "SELECT 1 FROM cells WHERE statistic = ? AND dataset = ? AND variable = ? AND year = ? AND scope = ? LIMIT 1",
+            (stat_name,) + key).fetchone() is not None
+
+    def pending_batches(self, batches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the batches that contain at least one statistic without stored cells."""
+        pending = [batch for batch in batches
+                   if not all(self._has_cell(stat_name, key) for stat_name, key in self.cell_keys(batch).items())]
+        logger.info(f"{len(pending)} of {len(batches)} requests have missing or invalidated cells")
+        return pending
+
+    def save(self, batches: List[Dict[str, Any]], records: Iterable['ResultRecord']) -> int:
+        """
+        Store fetched records. Failed cells (None values) are not stored, so they are requested again next run.
+
+        Returns:
+            The number of cells stored.
+        """
+        keys = {(stat_name, key[2]): key for batch in batches for stat_name, key in self.cell_keys(batch).items()}
+        now = time.time()
+        rows = []
+        for record in records:
+            if record.value is None or (record.statistic, record.year) not in keys:
+                continue
+            dataset, variable, year, scope = keys[(record.statistic, record.year)]
+            value, header = record.value
+            rows.append((record.statistic, dataset, variable, year, scope, record.geography or '',
+                         value if isinstance(value, float) else None, None if isinstance(value, float) else str(value), header, now))
+        self.connection.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.connection.commit()
+        return len(rows)
+
+    def save_location_names(self, location_names: Dict[str, str]) -> None:
+        """Store the NAME of each fetched geography so reports keep their names when nothing is re-fetched."""
+        self.connection.executemany("INSERT OR REPLACE INTO locations VALUES (?, ?)", location_names.items())
+        self.connection.commit()
+
+    def geographies(self, batches: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Return every geography with stored cells for the batches (None for single-location cells)."""
+        found: Dict[Optional[str], None] = {}
+        for batch in batches:
+            for stat_name, key in self.cell_keys(batch).items():
+                for (geography,) in self.connection.execute(
+                        "SELECT DISTINCT geography FROM cells WHERE statistic = ? AND dataset = ? AND variable = ? AND year = ? AND scope = ?",
+                        (stat_name,) + key):
+                    found[geography or None] = None
+        return list(found)
+
+    def location_names(self) -> Dict[str, str]:
+        return dict(self.connection.execute("SELECT geography, name FROM locations").fetchall())
+
+    def load(self, batches: List[Dict[str, Any]], geographies: Optional[List[Optional[str]]] = None) -> Dict[Optional[str], Dict[str, Dict[int, Optional[List[Any]]]]]:
+        """
+        Load the stored cells of the batches as {geography: {statistic: {year: [value, header]}}}, in config order.
+        Single-location cells are keyed by a None geography; cells that were never fetched successfully are None.
+        `geographies` limits the result to those geographies, which are selected in SQL.
+        """
+        if geographies is None:
+            chunks: List[Optional[List[str]]] = [None]
+        else:
+            wanted = list(dict.fromkeys(geography or '' for geography in geographies))
+            chunks = [wanted[start:start + GEOGRAPHY_CHUNK] for start in range(0, len(wanted), GEOGRAPHY_CHUNK)]
+        cells: Dict[Tuple[Optional[str], str, int], List[Any]] = {}
+        order: Dict[str, List[int]] = {}
+        positions: Dict[str, int] = {}
+        found: Dict[Optional[str], None] = {}
+        for batch in batches:
+            for stat_name, key in self.cell_keys(batch).items():
+                order.setdefault(stat_name, []).append(key[2])
+                positions.setdefault(stat_name, batch.get('positions', {}).get(stat_name, len(positions)))
+                for chunk in chunks:
+                    query = ("SELECT geography, value_real, value_text, header FROM cells "
+                             "WHERE statistic = ? AND dataset = ? AND variable = ? AND year = ? AND scope = ?")
+                    if chunk is not None:
+                        query += f" AND geography IN ({','.join('?' * len(chunk))})"
+                    rows = self.connection.execute(query, (stat_name,) + key + tuple(chunk or ())).fetchall()
+                    for geography, value_real, value_text, header in rows:
+                        found[geography or None] = None
+                        cells[(geography or None, stat_name, key[2])] = [value_real if value_real is not None else value_text, header]
+
+        if geographies is not None:
+            found = dict.fromkeys(geographies)
+        elif not found and not any(batch.get('geography') for batch in batches):
+            found[None] = None
+        return {geography: {stat_name: {year: cells.get((geography, stat_name, year)) for year in dict.fromkeys(years)}
+                            for stat_name, years in sorted(order.items(), key=lambda item: positions[item[0]])}
+                for geography in found}
+
+    def invalidate(self, statistic: Optional[str] = None, year: Optional[int] = None) -> int:
+        """
+        Drop stored cells so they are fetched again, optionally limited to one statistic and/or year.
+
+        Returns:
+            The number of cells dropped.
+        """
+        clauses, params = [], []
+        if statistic is not None:
+            clauses.append("statistic = ?")
+            params.append(statistic)
+        if year is not None:
+            clauses.append("year = ?")
+            params.append(year)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        deleted = self.connection.execute(f"DELETE FROM cells{where}", params).rowcount
+        self.connection.commit()
+        logger.info(f"Invalidated {deleted} stored cells")
+        return deleted
+
+    @staticmethod
+    def content_hash(results: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(results, default=str).encode('utf8')).hexdigest()
+
+    def report_changed(self, name: str, results: Dict[str, Any], output_path: Optional[str] = None) -> bool:
+        """Return whether a report's inputs differ from the last generated version (or its file is missing)."""
+        if output_path is not None and not os.path.exists(output_path):
+            return True
+        row = self.connection.execute("SELECT content_hash FROM reports WHERE name = ?", (name,)).fetchone()
+        return row is None or row[0] != self.content_hash(results)
+
+    def mark_report(self, name: str, results: Dict[str, Any]) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?)", (name, self.content_hash(results), time.time()))
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
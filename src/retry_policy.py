@@ -0,0 +1,110 @@
+import time
+import random
+import asyncio
+from typing import Optional
+import aiohttp
+from utils.logging_config import get_logger
+from utils.config_loader import config
+from response_cache import CacheMissError
+
+logger = get_logger(__name__)
+
+# Client errors that may succeed when retried (timeouts and throttling); other 4xx responses are deterministic
+RETRYABLE_CLIENT_STATUSES = (408, 429)
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Raised when a request is refused because its endpoint's circuit breaker is open."""
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed request is retried and how long to wait before the next attempt,
+    using exponential backoff with full jitter.
+    """
+
+    def __init__(self):
+        self.max_retries = config.get('error_handling.max_retries', 3)
+        self.base_delay = config.get('error_handling.retry_delay', 0.5)
+        self.max_delay = config.get('error_handling.max_retry_delay', 10)
+        # Seconds to wait for the primary URL before also issuing the backup URL; None disables hedging
+        self.hedge_delay = config.get('error_handling.hedge_delay')
+
+    def delay(self, attempt: int) -> float:
+        """Return the backoff delay in seconds after the given (zero-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Return whether an error is transient. Deterministic 4xx responses and malformed payloads are not retried."""
+        if isinstance(error, (CacheMissError, CircuitOpenError, ValueError)):
+            return False
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status >= 500 or error.status in RETRYABLE_CLIENT_STATUSES
+        return True
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one dataset endpoint. After `failure_threshold` consecutive transient failures
+    the circuit opens and requests fail fast; after `reset_timeout` seconds a single trial request is
+    let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.get('error_handling.circuit_breaker_threshold', 5)
+        self.reset_timeout = reset_timeout or config.get('error_handling.circuit_breaker_reset', 30)
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Return whether a request may be issued to this endpoint now."""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"Circuit breaker for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """End a half-open trial without an outcome, so the next request can be let through as the trial."""
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            logger.warning(f"Circuit breaker for {self.name} opened after {self.failures} consecutive failures")
+
+
+async def first_successful(*tasks: "asyncio.Task") -> Optional[object]:
+    """Wait for the first task to return a non-None result and cancel the rest."""
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result() is not None:
+                    return task.result()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,212 @@
+import os
+import hashlib
+import numpy as np
+from typing import Dict, Any, List, Optional, Iterator, Tuple, NamedTuple
+from utils.logging_config import get_logger
+from result_cube import ResultCube
+
+logger = get_logger(__name__)
+
+# Query rows per block when searching the neighbors of every place, bounding the distance matrix held in memory
+BLOCK_SIZE = 512
+
+
+class PeerRow(NamedTuple):
+    geography: str
+    name: str
+    distance: float
+    values: List[Optional[float]]
+
+
+class PeerComparison(NamedTuple):
+    """A target place and its most similar places, with the compared statistics of each (target first)."""
+    statistics: List[str]
+    years: List[int]
+    rows: List[PeerRow]
+
+
+class SimilarPlaces:
+    """
+    Nearest-neighbor search of places over fetched statistics.
+
+    Each statistic (at its latest requested year, or `year`) becomes a feature; features are z-score normalized
+    so that statistics on different scales weigh the same, optionally scaled by `weights`. Missing values are
+    imputed with the feature mean. The normalized matrix and its row norms are the index: a query is one
+    matrix-vector product (|a - b|^2 = |a|^2 + |b|^2 - 2 a.b) and an argpartition, a few milliseconds for 30k places.
+
+    Usage:
+        index = SimilarPlaces(cube, ['Population', 'Median Income'])
+        index.query('1600000US1743250', k=5)        # [(geography, distance), ...]
+        index.save('data/metadata/places.npz')      # reuse with SimilarPlaces.load(...)
+    """
+
+    def __init__(self, cube: ResultCube, statistics: Optional[List[str]] = None, year: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.statistics = list(statistics or cube.statistics)
+        self.years = self._years_of(cube, self.statistics, year)
+        if None in self.years:
+            raise ValueError(f"Statistic '{self.statistics[self.years.index(None)]}' has no fetched years to compare places on")
+        self.geographies, self.raw = self._raw_of(cube, self.statistics, self.years)
+        self._build(self._weights_of(self.statistics, weights))
+
+    @staticmethod
+    def _raw_of(cube: ResultCube, statistics: List[str], years: List[int]) -> Tuple[List[str], np.ndarray]:
+        """Return the cube's places and their (places x statistics) values at the given years."""
+        rows = [row for row, geography in enumerate(cube.geographies) if geography]
+        columns = [cube.statistic(stat_name)[rows, cube.years.index(stat_year)] for stat_name, stat_year in zip(statistics, years)]
+        return [cube.geographies[row] for row in rows], np.column_stack(columns) if columns else np.empty((len(rows), 0))
+
+    @staticmethod
+    def _digest_of(geographies: List[str], raw: np.ndarray) -> str:
+        """Content hash of the indexed places and values, independent of the order of the places."""
+        order = sorted(range(len(geographies)), key=geographies.__getitem__)
+        digest = hashlib.sha256('\n'.join(geographies[row] for row in order).encode())
+        digest.update(np.ascontiguousarray(raw[order], dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _years_of(cube: ResultCube, statistics: List[str], year: Optional[int]) -> List[Optional[int]]:
+        """Return the year each statistic is compared at: `year` if it was fetched, else its latest (None if it has none)."""
+        resolved = []
+        for stat_name in statistics:
+            years = cube.years_of(stat_name) if stat_name in cube.statistics else []
+            resolved.append(year if year in years else max(years, default=None))
+        return resolved
+
+    @staticmethod
+    def _weights_of(statistics: List[str], weights: Optional[Dict[str, float]]) -> np.ndarray:
+        return np.array([(weights or {}).get(stat_name, 1.0) for stat_name in statistics], dtype=np.float64)
+
+    @classmethod
+    def from_config(cls, peers: Dict[str, Any], cube: ResultCube) -> 'SimilarPlaces':
+        """
+        Create the index for a `peers` entry of the stats config:
+
+            "peers": {"k": 5, "statistics": ["Population", "Median Income"], "index": "data/metadata/places.npz"}
+
+        When `index` names an existing file, that prebuilt index is loaded (e.g. one over every US place, so the
+        fetched locations are compared against all of them), as long as it is still current (see `matches`).
+        Otherwise the index is built from the cube and, if `index` is set, saved there for the next run.
+        """
+        path = peers.get('index')
+        if path and not os.path.isabs(path):
+            path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')), path)
+        if path and os.path.exists(path):
+            index = cls.load(path)
+            if index.matches(cube, peers.get('statistics'), peers.get('year'), peers.get('weights')):
+                return index
+            logger.info(f"Similar places index {path} is out of date, rebuilding it")
+        index = cls(cube, peers.get('statistics'), peers.get('year'), peers.get('weights'))
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            index.save(path)
+        return index
+
+    def _build(self, weights: np.ndarray) -> None:
+        self.weights = weights
+        self.geography_count = len(self.geographies)
+        self.digest = self._digest_of(self.geographies, self.raw)
+        with np.errstate(invalid='ignore'):
+            mean = np.nanmean(self.raw, axis=0) if len(self.raw) else np.zeros(self.raw.shape[1])
+            std = np.nanstd(self.raw, axis=0) if len(self.raw) else np.ones(self.raw.shape[1])
+        std[~(std > 0)] = 1.0
+        mean[np.isnan(mean)] = 0.0
+        features = (self.raw - mean) / std * weights
+        features[np.isnan(features)] = 0.0
+        self.features = features
+        self.norms = np.einsum('ij,ij->i', features, features)
+        self._index = {geography: row for row, geography in enumerate(self.geographies)}
+        logger.info(f"Indexed {len(self.geographies)} places over {len(self.statistics)} statistics")
+
+    def __contains__(self, geography: str) -> bool:
+        return geography in self._index
+
+    def matches(self, cube: ResultCube, statistics: Optional[List[str]] = None, year: Optional[int] = None,
+                weights: Optional[Dict[str, float]] = None) -> bool:
+        """
+        Return whether a (saved) index is current for a cube and peers settings: built over the same statistics,
+        at the years they would be compared at now, with the same weights, and holding every place of the cube
+        with the values the cube holds now. An index over as many places as the cube is checked by its content
+        hash; a prebuilt index over more places by comparing the values of the cube's places.
+        """
+        statistics = list(statistics or cube.statistics)
+        years = self._years_of(cube, statistics, year)
+        if not (self.statistics == statistics
+                and self.years == years
+                and self.weights.shape == (len(statistics),)
+                and np.allclose(self.weights, self._weights_of(statistics, weights))):
+            return False
+        geographies, raw = self._raw_of(cube, statistics, years)
+        if not all(geography in self._index for geography in geographies):
+            return False
+        if len(geographies) == self.geography_count:
+            return self._digest_of(geographies, raw) == self.digest
+        return np.array_equal(self.raw[[self._index[geography] for geography in geographies]], raw, equal_nan=True)
+
+    def _nearest(self, rows: np.ndarray, k: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield the (neighbor rows, distances) of each query row, nearest first and without the row itself."""
+        k = min(k, len(self.geographies) - 1)
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block = rows[start:start + BLOCK_SIZE]
+            squared = self.norms[block, None] + self.norms[None, :] - 2 * self.features[block] @ self.features.T
+            squared[np.arange(len(block)), block] = np.inf
+            if k <= 0:
+                for _ in block:
+                    yield np.empty(0, dtype=np.int64), np.empty(0)
+                continue
+            candidates = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            candidate_distances = np.take_along_axis(squared, candidates, axis=1)
+            order = np.argsort(candidate_distances, axis=1, kind='stable')
+            neighbors = np.take_along_axis(candidates, order, axis=1)
+            distances = np.sqrt(np.maximum(np.take_along_axis(candidate_distances, order, axis=1), 0.0))
+            yield from zip(neighbors, distances)
+
+    def query(self, geography: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Return the k places most similar to a place as (geography, distance) pairs, nearest first."""
+        if geography not in self._index:
+            raise KeyError(f"Place {geography} is not in the index")
+        neighbors, distances = next(self._nearest(np.array([self._index[geography]]), k))
+        return [(self.geographies[row], float(distance)) for row, distance in zip(neighbors, distances)]
+
+    def query_all(self, k: int = 5) -> Dict[str, List[Tuple[str, float]]]:
+        """Return the k most similar places of every indexed place, computed in blocks of BLOCK_SIZE queries."""
+        results = {}
+        for geography, (neighbors, distances) in zip(self.geographies, self._nearest(np.arange(len(self.geographies)), k)):
+            results[geography] = [(self.geographies[row], float(distance)) for row, distance in zip(neighbors, distances)]
+        return results
+
+    def comparison(self, geography: str, peers: List[Tuple[str, float]], names: Optional[Dict[str, str]] = None) -> PeerComparison:
+        """Collect the compared statistics of a place and its peers for rendering (see MarkdownFormatter)."""
+        names = names or {}
+
+        def row_of(place: str, distance: float) -> PeerRow:
+            values = [None if value != value else float(value) for value in self.raw[self._index[place]]]
+            return PeerRow(place, names.get(place, place), distance, values)
+        rows = [row_of(geography, 0.0)] + [row_of(peer, distance) for peer, distance in peers]
+        return PeerComparison(self.statistics, self.years, rows)
+
+    def save(self, path: str) -> None:
+        """Save the index so repeated queries can skip fetching and normalizing."""
+        with open(path, 'wb') as file:
+            np.savez_compressed(file, raw=self.raw, features=self.features, geographies=np.array(self.geographies),
+                                statistics=np.array(self.statistics), years=np.array(self.years, dtype=np.int64),
+                                weights=self.weights, geography_count=self.geography_count, digest=self.digest)
+        logger.info(f"Saved similar places index of {len(self.geographies)} places to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> 'SimilarPlaces':
+        with np.load(path) as data:
+            index = cls.__new__(cls)
+            index.raw = data['raw']
+            index.features = data['features']
+            index.geographies = data['geographies'].tolist()
+            index.statistics = data['statistics'].tolist()
+            index.years = data['years'].tolist()
+            # Indexes saved without their weights never match the current settings, so they are rebuilt
+            index.weights = data['weights'] if 'weights' in data.files else np.empty(0)
+            index.geography_count = int(data['geography_count']) if 'geography_count' in data.files else -1
+            index.digest = str(data['digest']) if 'digest' in data.files else ''
+        index.norms = np.einsum('ij,ij->i', index.features, index.features)
+        index._index = {geography: row for row, geography in enumerate(index.geographies)}
+        logger.info(f"Loaded similar places index of {len(index.geographies)} places from {path}")
+        return index
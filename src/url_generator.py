@@ -1,15 +1,46 @@
 import re
 import json
 import urllib.parse
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple, Optional
 from utils.logging_config import get_logger
 from utils.config_loader import config
+from variable_codes import LearnedCodes, vintage_for, codes_of
 
 logger = get_logger(__name__)
 
+# Query parameters that select the geography of a request
+GEOGRAPHY_PARAMS = ('ucgid', 'for', 'in')
+# Columns added to wildcard requests so rows can be matched and labelled per location
+GEOGRAPHY_COLUMNS = ('NAME', 'GEO_ID')
+
+
+def table_of(variable: str) -> Optional[str]:
+    """Return the table a variable code belongs to, e.g. 'S1901' for S1901_C01_012E or 'DP04' for DP04_0002PE."""
+    match = re.match(r'([A-Z]+\d+[A-Z]*)_', variable)
+    return match.group(1) if match else None
+
+
 class URLGenerator:
-    def __init__(self, parsed_data: List[Dict[str, Any]]):
+    def __init__(self, parsed_data: List[Dict[str, Any]], geography: Optional[Dict[str, str]] = None,
+                 learned_codes: Optional[Dict[Tuple[str, int, str], str]] = None):
+        """
+        Args:
+            parsed_data: The list of statistics from the input data.
+            geography: Optional geography override (see InputParser.get_geography), e.g.
+                {"ucgid": "1600000US1743250,1600000US1738570"} or {"for": "place:*", "in": "state:17"}.
+                When given, it replaces the geography baked into each statistic's api_url.
+            learned_codes: Learned variable codes (see LearnedCodes.load_mappings), e.g. loaded once by a
+                long-running service. Read from `variable_codes.path` when omitted.
+        """
         self.parsed_data = parsed_data
+        self.geography = geography
+        self.base_url = config.get('api.base_url')
+        self.max_variables_per_request = config.get('performance.max_variables_per_request', 50)
+        self.group_fetch_threshold = config.get('performance.group_fetch_threshold', 5)
+        if not config.get('variable_codes.learn', True):
+            learned_codes = {}
+        self.learned_codes = LearnedCodes.load_mappings() if learned_codes is None else learned_codes
+        self.missing_key_reported = False
         logger.info("Initializing URLGenerator")
 
     def generate_urls(self) -> Dict[str, Dict[str, Dict[int, str]]]:
@@ -19,6 +50,9 @@ class URLGenerator:
         Returns:
             A dictionary with statistic names as keys, containing nested dictionaries
             with 'primary' and 'backup' keys, each containing a dictionary of years and URLs.
+
+        Raises:
+            ValueError: If a URL cannot be generated for a statistic and year.
         """
         urls = {}
         logger.info("Generating URLs for all statistics and years")
@@ -28,18 +62,18 @@ class URLGenerator:
             for year in stat['years']:
                 urls[stat_name][year] = {}
                 try:
-                    primary_url = self._generate_single_url(stat['api_url'], year)
+                    api_url = self._resolve_api_url(stat, year)
+                    primary_url = self._generate_single_url(api_url, year)
                     urls[stat_name][year]['primary'] = primary_url
                     logger.debug(f"Generated primary URL for {stat_name}, year {year}: {primary_url}")
 
-                    if 'cell_number' in stat:
-                        backup_url = self._generate_backup_url(stat['api_url'], year, stat['cell_number'])
+                    if 'cell_number' in stat and stat['cell_number'] != codes_of(api_url)[1]:
+                        backup_url = self._generate_backup_url(api_url, year, stat['cell_number'])
                         urls[stat_name][year]['backup'] = backup_url
                         logger.debug(f"Generated backup URL for {stat_name}, year {year}: {backup_url}")
                 except Exception as e:
                     logger.error(f"Error generating URL for {stat_name}, year {year}: {str(e)}")
-                    urls[stat_name][year]['primary'] = None
-                    ValueError(f"Error generating URL for {stat_name}, year {year}: {str(e)}")
+                    raise ValueError(f"Error generating URL for {stat_name}, year {year}: {str(e)}") from e
         
         """
         A backup url is not guaranteed structure of urls:
@@ -65,6 +99,181 @@ class URLGenerator:
         
         return urls
 
+    def generate_batched_urls(self) -> List[Dict[str, Any]]:
+        """
+        Plan the requests for all statistics: statistics that hit the same dataset, year and geography
+        are grouped so that one call replaces one call per statistic. For each group the planner picks:
+
+        - 'group': when at least `performance.group_fetch_threshold` variables come from the same table
+          (e.g. S1901_*), the whole table is fetched once with `get=group(S1901)` and the variables are
+          extracted from that row locally.
+        - 'batched': the remaining variables are fetched with `get=A,B,C` requests of at most
+          `performance.max_variables_per_request` variables.
+        - 'single': statistics alone in their group, and statistics whose `get=` clause holds more
+          than one variable, use their own URL.
+
+        Each batch keeps the per-statistic primary/backup URLs from `generate_urls` so the client
+        can fall back to single requests if the batched call fails.
+
+        Returns:
+            A list of batches, each shaped like:
+            {
+                "year": 2020,
+                "geography": None,
+                "strategy": "batched",
+                "primary": "https://api.census.gov/data/2020/acs/acs5/profile?get=DP04_0002PE,DP04_0003PE&ucgid=...",
+                "statistics": {"Occupied Housing Units Percentage": "DP04_0002PE", ...},
+                "fallback": {"Occupied Housing Units Percentage": {"primary": "...", "backup": "..."}, ...},
+                "positions": {"Occupied Housing Units Percentage": 3, ...}
+            }
+            `positions` is the index of each statistic in the config, so results can be put back in config order.
+        """
+        urls = self.generate_urls()
+        groups: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        planned: List[Dict[str, Any]] = []
+        logger.info("Planning batched requests")
+        for position, stat in enumerate(self.parsed_data):
+            stat_name = stat['name']
+            for year in stat['years']:
+                base_url, variables, params = self._split_api_url(self._apply_geography(self._resolve_api_url(stat, year)))
+                variables = [v for v in variables if v not in GEOGRAPHY_COLUMNS]
+                url_types = urls[stat_name][year]
+                if len(variables) != 1:
+                    planned.append({'year': year, 'primary': url_types['primary'], 'geography': self.geography, 'strategy': 'single',
+                                    'statistics': {stat_name: variables[0] if variables else None},
+                                    'fallback': {stat_name: url_types}, 'positions': {stat_name: position}})
+                    continue
+
+                group_key = (base_url + '?' + '&'.join(params), year)
+                if group_key not in groups:
+                    groups[group_key] = {'year': year, 'base_url': base_url, 'params': params, 'entries': []}
+                    planned.append(groups[group_key])
+                groups[group_key]['entries'].append((stat_name, variables[0], url_types, position))
+
+        batches = []
+        for item in planned:
+            batches.extend(self._plan_group(item) if 'entries' in item else [item])
+
+        strategies = {}
+        for batch in batches:
+            strategies[batch['strategy']] = strategies.get(batch['strategy'], 0) + 1
+        logger.info(f"Grouped {sum(len(b['statistics']) for b in batches)} statistic/year pairs into {len(batches)} requests {strategies}")
+        return batches
+
+    def _plan_group(self, group: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Split the statistics of one dataset, year and geography into group(TABLE), batched and single requests.
+
+        A table is fetched whole when at least `group_fetch_threshold` of its variables are requested and doing
+        so does not add requests. Ties go to group(TABLE): its full row is cached and serves any other
+        variable of the table later.
+        """
+        table_variables: Dict[str, set] = {}
+        for _, variable, _, _ in group['entries']:
+            table = table_of(variable)
+            if table:
+                table_variables.setdefault(table, set()).add(variable)
+
+        def requests_for(entries: int) -> int:
+            return -(-entries // self.max_variables_per_request)
+
+        group_tables = set()
+        remaining_count = len(group['entries'])
+        for table, variables in sorted(table_variables.items(), key=lambda item: -len(item[1])):
+            if not self.group_fetch_threshold or len(variables) < self.group_fetch_threshold:
+                break
+            table_count = sum(1 for entry in group['entries'] if table_of(entry[1]) == table)
+            if 1 + requests_for(remaining_count - table_count) <= requests_for(remaining_count):
+                group_tables.add(table)
+                remaining_count -= table_count
+
+        chunks: Dict[str, List[Tuple[str, str, Dict[str, str], int]]] = {}
+        remaining = []
+        for entry in group['entries']:
+            table = table_of(entry[1])
+            if table in group_tables:
+                chunks.setdefault(table, []).append(entry)
+            else:
+                remaining.append(entry)
+
+        batches = []
+        for table, entries in chunks.items():
+            batches.append(self._make_batch(group, entries, 'group', f"group({table})"))
+        for start in range(0, len(remaining), self.max_variables_per_request):
+            entries = remaining[start:start + self.max_variables_per_request]
+            if len(entries) == 1:
+                batches.append(self._make_batch(group, entries, 'single'))
+            else:
+                batches.append(self._make_batch(group, entries, 'batched', ','.join(dict.fromkeys(entry[1] for entry in entries))))
+        return batches
+
+    def _make_batch(self, group: Dict[str, Any], entries: List[Tuple[str, str, Dict[str, str], int]], strategy: str,
+                    get_clause: Optional[str] = None) -> Dict[str, Any]:
+        batch = {
+            'year': group['year'],
+            'geography': self.geography,
+            'strategy': strategy,
+            'statistics': {stat_name: variable for stat_name, variable, _, _ in entries},
+            'fallback': {stat_name: url_types for stat_name, _, url_types, _ in entries},
+            'positions': {stat_name: position for stat_name, _, _, position in entries},
+        }
+        if get_clause is None:
+            batch['primary'] = entries[0][2]['primary']
+        else:
+            query = '&'.join([f"get={get_clause}"] + group['params'])
+            batch['primary'] = self._generate_single_url(f"{group['base_url']}?{query}", group['year'])
+        logger.debug(f"Planned {strategy} request for {len(entries)} statistic(s), year {group['year']}: {batch['primary']}")
+        return batch
+
+    def _resolve_api_url(self, stat: Dict[str, Any], year: int) -> str:
+        """
+        Return the API URL template of a statistic for one year. The `vintages` entry covering the year replaces
+        the dataset path and/or variable code (see variable_codes.vintage_for); otherwise a code learned from an
+        earlier backup fallback is used, so each vintage is requested with the right code up front.
+
+        Args:
+            stat: The statistic from the input data.
+            year: The year being requested.
+
+        Returns:
+            The API URL template for that year.
+        """
+        api_url = stat['api_url']
+        vintage = vintage_for(stat, year)
+        if vintage.get('dataset'):
+            api_url = re.sub(r"(/data/[^/]+/)[^?]+", lambda match: match.group(1) + vintage['dataset'].strip('/'), api_url)
+        if vintage.get('variable'):
+            return re.sub(r"(?<=get=)[^&]+", vintage['variable'], api_url)
+        dataset, variable = codes_of(api_url)
+        learned = self.learned_codes.get((dataset, year, variable))
+        if learned:
+            logger.debug(f"Using learned variable code {learned} for {stat['name']}, year {year}")
+            return re.sub(r"(?<=get=)[^&]+", learned, api_url)
+        return api_url
+
+    def _split_api_url(self, api_url: str) -> Tuple[str, List[str], List[str]]:
+        """
+        Split an API URL template into its base URL, the variables of its `get=` clause,
+        and the remaining raw query parameters (kept unencoded and in their original order).
+
+        Args:
+            api_url: The API URL template from the input data.
+
+        Returns:
+            A tuple of (base_url, variables, params).
+        """
+        base_url, _, query = api_url.partition('?')
+        variables: List[str] = []
+        params: List[str] = []
+        for param in query.split('&'):
+            if not param:
+                continue
+            if param.startswith('get='):
+                variables = [v for v in param[len('get='):].split(',') if v]
+            else:
+                params.append(param)
+        return base_url, variables, params
+
     def _generate_single_url(self, api_url: str, year: int) -> str:
         """
         Generate a single URL by replacing the [year] placeholder and adding the API key.
@@ -76,10 +285,10 @@ class URLGenerator:
         Returns:
             The generated URL as a string.
         """
-        url = api_url.replace('[year]', str(year))
+        url = self._apply_base_url(self._apply_geography(api_url)).replace('[year]', str(year))
         api_key = config.get('api.key')
         if not api_key:
-            logger.warning("API key not found in configuration. URL will not contain an API key.")
+            self._report_missing_key("URL")
             return url
         
         url += f"&key={urllib.parse.quote(api_key)}"
@@ -101,15 +310,59 @@ class URLGenerator:
         url = api_url.replace('[year]', str(year))
         
         url = re.sub(r"(?<=get=)[^&]+", cell_number, url)
+        url = self._apply_base_url(self._apply_geography(url))
         
         api_key = config.get('api.key')
         if not api_key:
-            logger.warning("API key not found in configuration. Backup URL will not contain an API key.")
+            self._report_missing_key("Backup URL")
             return url
         
         url += f"&key={urllib.parse.quote(api_key)}"
         return url
 
+    def _report_missing_key(self, kind: str):
+        """Warn once per generator, not once per URL, that no API key is configured."""
+        if not self.missing_key_reported:
+            logger.warning(f"API key not found in configuration. {kind}s will not contain an API key.")
+            self.missing_key_reported = True
+
+    def _apply_base_url(self, api_url: str) -> str:
+        """
+        Point an API URL at the configured `api.base_url` (e.g. a local mock server) instead of api.census.gov.
+
+        Args:
+            api_url: The API URL template from the input data.
+
+        Returns:
+            The API URL template using the configured base URL.
+        """
+        if not self.base_url:
+            return api_url
+        return re.sub(r"^https?://[^/]+", self.base_url.rstrip('/'), api_url)
+
+    def _apply_geography(self, api_url: str) -> str:
+        """
+        Replace the geography clauses (ucgid/for/in) of an API URL template with the configured
+        geography override. Wildcard (for/in) geographies also request the NAME and GEO_ID columns
+        so that rows can be demultiplexed per location. Applying it twice is a no-op.
+
+        Args:
+            api_url: The API URL template from the input data.
+
+        Returns:
+            The API URL template targeting the configured geography.
+        """
+        if not self.geography:
+            return api_url
+
+        base_url, variables, params = self._split_api_url(api_url)
+        params = [param for param in params if param.split('=', 1)[0] not in GEOGRAPHY_PARAMS]
+        if 'ucgid' not in self.geography:
+            variables += [column for column in GEOGRAPHY_COLUMNS if column not in variables]
+        geography_params = [f"{key}={urllib.parse.quote(str(value), safe=':*,$')}" for key, value in self.geography.items()]
+        get_param = f"get={','.join(variables)}"
+        return f"{base_url}?{'&'.join([get_param] + params + geography_params)}"
+
     def encode_url(self, url: str) -> str:
         """
         Encode the URL to ensure all characters are properly escaped.
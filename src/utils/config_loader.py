@@ -1,7 +1,51 @@
 import os
-import yaml
-from dotenv import load_dotenv
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+def load_yaml(path: str) -> Any:
+    """
+    Parse a YAML file, reusing a JSON copy of the result cached in the __pycache__ directory next to it for as long
+    as the file is unchanged. Importing and running the YAML parser is most of the startup time of short commands.
+    """
+    import json
+    stat = os.stat(path)
+    directory, name = os.path.split(path)
+    cache_path = os.path.join(directory, '__pycache__', f"{name}.json")
+    key = [stat.st_mtime_ns, stat.st_size]
+    try:
+        with open(cache_path, 'r', encoding='utf8') as cache_file:
+            cached = json.load(cache_file)
+        if cached.get('key') == key:
+            return cached['data']
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    import yaml
+    with open(path, 'r') as yaml_file:
+        data = yaml.load(yaml_file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    try:
+        # Only cache documents JSON holds exactly (no integer keys, dates, ...)
+        if json.loads(json.dumps(data)) == data:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf8') as cache_file:
+                json.dump({'key': key, 'data': data}, cache_file)
+            os.replace(temp_path, cache_path)
+    except (OSError, TypeError, ValueError):
+        # A read-only install: parse the file every time
+        pass
+    return data
+
+def _find_env_file() -> Optional[str]:
+    """Return the .env file load_dotenv would read (the nearest one above this module), if there is one."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
 
 class Configuration:
     def __init__(self):
@@ -11,11 +55,14 @@ class Configuration:
 
     def load_config(self):
         config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'config.yaml')
-        with open(config_path, 'r') as config_file:
-            self.config = yaml.safe_load(config_file)
+        self.config = load_yaml(config_path)
 
     def load_env_variables(self):
-        load_dotenv()
+        # dotenv is only imported when there is a .env file to read, so short commands do not pay for it otherwise
+        env_path = _find_env_file()
+        if env_path:
+            from dotenv import load_dotenv
+            load_dotenv(env_path)
         self.config['api']['key'] = os.getenv('CENSUS_API_KEY')
 
     def get(self, key: str, default: Any = None) -> Any:
@@ -30,8 +77,28 @@ class Configuration:
 def load_configuration() -> Configuration:
     return Configuration()
 
-# Global configuration instance
-config = load_configuration()
+class LazyConfiguration:
+    """
+    Stand-in for the global Configuration that only reads config.yaml and .env on first use,
+    so importing a module has no side effects and short commands start quickly.
+    """
+
+    def __init__(self):
+        self._configuration: Optional[Configuration] = None
+
+    def _load(self) -> Configuration:
+        if self._configuration is None:
+            self._configuration = load_configuration()
+        return self._configuration
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._load().get(key, default)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+# Global configuration instance, loaded on first access
+config = LazyConfiguration()
 
 # Usage example:
 # from utils.config_loader import config
@@ -1,29 +1,175 @@
 import logging
-import logging.config
-import yaml
 import os
+import time
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
 
 def setup_logging():
     """Set up logging configuration"""
+    # Imported here: configuring logging is deferred to the first record, so importing this module stays cheap
+    import logging.config
+    from utils.config_loader import load_yaml
     # Get the path to the project root directory
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
     
     config_path = os.path.join(project_root, 'config', 'logging.yaml')
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f.read())
+    config = load_yaml(config_path)
     
-    # Set the log file path
-    log_file_path = os.path.join(project_root, 'data', 'census_data_tool.log')
+    # Set the log file path; CENSUS_LOG_FILE points it elsewhere, e.g. for the test suite
+    log_file_path = os.getenv('CENSUS_LOG_FILE') or os.path.join(project_root, 'data', 'census_data_tool.log')
     config['handlers']['file']['filename'] = log_file_path
     
     # Ensure the data directory exists
     os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
     
+    queue_config = config.pop('queue', {})
     logging.config.dictConfig(config)
+    if queue_config.get('enabled', True):
+        _start_queue_listeners(config, set(queue_config.get('handlers', config['handlers'])))
+
+def _start_queue_listeners(config, queued):
+    """
+    Move the queued handlers of each configured logger behind a QueueHandler. The calling thread only enqueues
+    the record; a QueueListener thread formats it and writes it out, so disk and console writes never block
+    the event loop. The listeners are stopped (and the queues drained) at exit.
+    """
+    import atexit
+    import logging.handlers
+    import queue
+    queue_handlers = {}
+    for name in config.get('loggers', {}):
+        logger = logging.getLogger(name or None)
+        targets = tuple(handler for handler in logger.handlers if handler.name in queued)
+        if not targets:
+            continue
+        if targets not in queue_handlers:
+            record_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(record_queue, *targets, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+            queue_handlers[targets] = LazyQueueHandler(record_queue)
+        logger.handlers = [handler for handler in logger.handlers if handler not in targets] + [queue_handlers[targets]]
+
+class LazyQueueHandler(logging.Handler):
+    """
+    Handler that enqueues records as they are for a QueueListener. The stock QueueHandler formats each record in
+    the calling thread (to make it picklable); records here stay in the process, so the message and its arguments
+    are only merged by the listener thread.
+    """
+
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Exception:
+            self.handleError(record)
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line: time, level, logger, message, source location, the exception
+    if any, and every field passed with `extra=`, e.g. logger.info("Fetched %s", url, extra={'year': 2022}).
+    """
+
+    def format(self, record):
+        import json
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limits a logger: up to `rate` records per second pass, and of the records over that rate only one in
+    `sample_every` is kept. The next record that passes reports how many were dropped. Records at `exempt_level`
+    or above always pass. Attached to the per-request loggers (see logging.yaml) so request logs stay bounded
+    under high request volume.
+    """
+
+    def __init__(self, rate=20, sample_every=100, exempt_level='ERROR'):
+        super().__init__()
+        self.rate = rate
+        self.sample_every = max(1, sample_every)
+        self.exempt_level = logging.getLevelName(exempt_level) if isinstance(exempt_level, str) else exempt_level
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno >= self.exempt_level:
+            return True
+        now = time.monotonic()
+        if now - self.window_start >= 1.0:
+            self.window_start = now
+            self.window_count = 0
+        self.window_count += 1
+        if self.window_count > self.rate and (self.window_count - self.rate) % self.sample_every:
+            self.dropped += 1
+            return False
+        if self.dropped and isinstance(record.msg, str):
+            record.msg = f"{record.msg} ({self.dropped} similar records dropped)"
+            record.sampled_out = self.dropped
+            self.dropped = 0
+        return True
+
+class LazySetupHandler(logging.Handler):
+    """
+    Placeholder root handler that runs setup_logging on the first emitted record and then
+    re-dispatches it, so importing a module never parses logging.yaml or opens the log file.
+
+    After `defer_setup`, records below `setup_level` are held (up to `capacity`) instead, and only written
+    out once a record at that level arrives and logging is configured.
+    """
+
+    def __init__(self, setup_level=logging.NOTSET, capacity=1000):
+        super().__init__()
+        self.setup_level = setup_level
+        self.capacity = capacity
+        self.held = []
+
+    def emit(self, record):
+        root = logging.getLogger()
+        if self in root.handlers:
+            if record.levelno < self.setup_level:
+                if len(self.held) < self.capacity:
+                    self.held.append(record)
+                return
+            # Rebind instead of mutating: the logging module is iterating over the current handler list
+            root.handlers = [handler for handler in root.handlers if handler is not self]
+            setup_logging()
+        records, self.held = self.held + [record], []
+        for pending in records:
+            logger = logging.getLogger(pending.name)
+            if logger.isEnabledFor(pending.levelno):
+                logger.handle(pending)
+
+def defer_setup(level=logging.WARNING):
+    """
+    Only configure logging once a record at `level` or above is emitted. Short commands (`cli.py validate` and
+    `plan`) call it so their INFO records do not pay for reading logging.yaml and starting the log listeners;
+    those records are written out with the first warning, or dropped if there is none.
+    """
+    get_logger(__name__)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, LazySetupHandler):
+            handler.setup_level = level
 
 def get_logger(name):
     """
     Get a logger with the specified name.
+    Logging is configured from logging.yaml the first time a record is emitted.
     
     Args:
         name (str): The name of the logger, typically __name__ of the calling module.
@@ -31,8 +177,10 @@ def get_logger(name):
     Returns:
         logging.Logger: A configured logger instance.
     """
-    if not logging.getLogger().handlers:
-        setup_logging()
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(LazySetupHandler())
+        root.setLevel(logging.DEBUG)
     return logging.getLogger(name)
 # Usage example:
 # from utils.logging_config import get_logger
@@ -0,0 +1,99 @@
+import os
+import time
+import sqlite3
+from typing import Dict, Any, Iterable, Optional, Tuple
+from utils.logging_config import get_logger
+from utils.config_loader import config
+from variable_index import parse_api_url, GEOGRAPHY_VARIABLES
+
+logger = get_logger(__name__)
+
+
+def vintage_for(stat: Dict[str, Any], year: int) -> Dict[str, Any]:
+    """
+    Return the entry of a statistic's `vintages` list that covers a year, or {} when none does.
+
+    Each entry maps an inclusive year range (`from` and/or `to`, open-ended when omitted) to the variable
+    code and/or dataset path used in those years, e.g.
+
+        "vintages": [{"to": 2019, "variable": "P001001", "dataset": "dec/sf1"}, {"from": 2020, "variable": "P1_001N"}]
+    """
+    for vintage in stat.get('vintages', []):
+        if vintage.get('from', year) <= year <= vintage.get('to', year):
+            return vintage
+    return {}
+
+
+def codes_of(api_url: str) -> Tuple[str, str]:
+    """Return the dataset and the get= clause of a URL, without the geography columns added to wildcard requests."""
+    dataset, variables = parse_api_url(api_url)
+    return dataset, ','.join(variable for variable in variables if variable not in GEOGRAPHY_VARIABLES)
+
+
+class LearnedCodes:
+    """
+    SQLite record of variable codes learned from the reactive cell_number fallback.
+
+    When a primary URL is rejected and its backup URL succeeds, the backup code is recorded for that dataset and
+    vintage. URLGenerator then requests it directly, so later runs no longer spend a failed round-trip on it.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = self._resolve_path(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Job runner processes may learn codes at the same time
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS learned_codes (
+                dataset TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                variable TEXT NOT NULL,
+                replacement TEXT NOT NULL,
+                learned_at REAL NOT NULL,
+                PRIMARY KEY (dataset, year, variable)
+            ) WITHOUT ROWID;
+        """)
+        self.connection.commit()
+
+    @staticmethod
+    def _resolve_path(path: Optional[str]) -> str:
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        path = path or config.get('variable_codes.path', './data/metadata/learned_codes.sqlite')
+        return path if os.path.isabs(path) else os.path.join(project_root, path)
+
+    @classmethod
+    def load_mappings(cls, path: Optional[str] = None) -> Dict[Tuple[str, int, str], str]:
+        """Return every learned {(dataset, year, variable): replacement}, or {} if nothing has been learned yet."""
+        if not os.path.exists(cls._resolve_path(path)):
+            return {}
+        codes = cls(path)
+        try:
+            return codes.mappings()
+        finally:
+            codes.close()
+
+    def mappings(self) -> Dict[Tuple[str, int, str], str]:
+        return {(dataset, year, variable): replacement for dataset, year, variable, replacement in
+                self.connection.execute("SELECT dataset, year, variable, replacement FROM learned_codes")}
+
+    def record(self, year: int, primary_url: str, backup_url: str) -> None:
+        """Record that the backup URL's code works for the vintage where the primary URL's code was rejected."""
+        self.record_many([(year, primary_url, backup_url)])
+
+    def record_many(self, learned: Iterable[Tuple[int, str, str]]) -> None:
+        """`record` for several (year, primary_url, backup_url) entries, written in one transaction."""
+        rows = []
+        for year, primary_url, backup_url in learned:
+            dataset, variable = codes_of(primary_url)
+            _, replacement = codes_of(backup_url)
+            if not variable or not replacement or variable == replacement:
+                continue
+            rows.append((dataset, year, variable, replacement, time.time()))
+            logger.info(f"Learned variable code {replacement} for {variable} in {dataset} {year}")
+        if rows:
+            self.connection.executemany("INSERT OR REPLACE INTO learned_codes VALUES (?, ?, ?, ?, ?)", rows)
+            self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,222 @@
+import os
+import re
+import json
+import sqlite3
+import argparse
+import urllib.parse
+from typing import Dict, Any, List, Optional, Tuple
+from utils.logging_config import get_logger
+from utils.config_loader import config
+
+logger = get_logger(__name__)
+
+# Geography predicates and identifier columns that are valid in any get= clause
+GEOGRAPHY_VARIABLES = {'NAME', 'GEO_ID', 'ucgid', 'for', 'in'}
+
+
+def parse_api_url(api_url: str) -> Tuple[str, List[str]]:
+    """
+    Return the dataset path and the get= variables of an API URL template,
+    e.g. ('acs/acs5/profile', ['DP04_0002PE']) for .../data/[year]/acs/acs5/profile?get=DP04_0002PE&...
+    """
+    parts = urllib.parse.urlsplit(api_url)
+    segments = [segment for segment in parts.path.split('/') if segment]
+    if segments and segments[0] == 'data':
+        segments = segments[1:]
+    if segments and (segments[0] == '[year]' or segments[0].isdigit()):
+        segments = segments[1:]
+    variables = []
+    for param in parts.query.split('&'):
+        if param.startswith('get='):
+            variables = [variable for variable in param[len('get='):].split(',') if variable]
+    return '/'.join(segments), variables
+
+
+class VariableIndex:
+    """
+    Local SQLite index of Census dataset metadata (variables.json and groups.json per dataset and vintage).
+
+    Built once from downloaded metadata files, it lets configs be validated without any network I/O
+    and supports full-text search of variable labels (SQLite FTS5, falling back to LIKE when the
+    SQLite build has no FTS5).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        path = path or config.get('variable_index.path', './data/metadata/variables.sqlite')
+        self.path = path if os.path.isabs(path) else os.path.join(project_root, path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS variables (
+                dataset TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                label TEXT,
+                concept TEXT,
+                group_name TEXT,
+                PRIMARY KEY (dataset, year, name)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS groups (
+                dataset TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                description TEXT,
+                PRIMARY KEY (dataset, year, name)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS datasets (
+                dataset TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                PRIMARY KEY (dataset, year)
+            ) WITHOUT ROWID;
+        """)
+        try:
+            self.connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS variables_fts USING fts5(dataset UNINDEXED, year UNINDEXED, name, label, concept)")
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite FTS5 is not available, variable search will use LIKE queries")
+            self.has_fts = False
+        self.connection.commit()
+
+    @classmethod
+    def open_if_exists(cls, path: Optional[str] = None) -> Optional['VariableIndex']:
+        """Open the index if it has been built, otherwise return None."""
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        path = path or config.get('variable_index.path', './data/metadata/variables.sqlite')
+        full_path = path if os.path.isabs(path) else os.path.join(project_root, path)
+        return cls(full_path) if os.path.exists(full_path) else None
+
+    def add_metadata(self, dataset: str, year: int, variables: Dict[str, Any], groups: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Index the parsed contents of a dataset's variables.json (and optionally groups.json), replacing any previous entries.
+
+        Returns:
+            The number of variables indexed.
+        """
+        rows = [(dataset, year, name, info.get('label'), info.get('concept'), info.get('group'))
+                for name, info in variables.get('variables', {}).items()]
+        self.connection.execute("DELETE FROM variables WHERE dataset = ? AND year = ?", (dataset, year))
+        self.connection.execute("DELETE FROM groups WHERE dataset = ? AND year = ?", (dataset, year))
+        self.connection.executemany("INSERT INTO variables VALUES (?, ?, ?, ?, ?, ?)", rows)
+        if groups:
+            self.connection.executemany("INSERT OR REPLACE INTO groups VALUES (?, ?, ?, ?)",
+                                        [(dataset, year, group['name'], group.get('description')) for group in groups.get('groups', [])])
+        self.connection.execute("INSERT OR REPLACE INTO datasets VALUES (?, ?)", (dataset, year))
+        if self.has_fts:
+            self.connection.execute("DELETE FROM variables_fts WHERE dataset = ? AND year = ?", (dataset, year))
+            self.connection.executemany("INSERT INTO variables_fts VALUES (?, ?, ?, ?, ?)",
+                                        [(row[0], row[1], row[2], row[3], row[4]) for row in rows])
+        self.connection.commit()
+        logger.info(f"Indexed {len(rows)} variables for {dataset} {year}")
+        return len(rows)
+
+    def build_from_directory(self, directory: str) -> int:
+        """
+        Index every metadata file under a directory laid out like the API: {directory}/{year}/{dataset}/variables.json,
+        with an optional groups.json next to each variables.json.
+
+        Returns:
+            The number of datasets indexed.
+        """
+        indexed = 0
+        for root, _, files in os.walk(directory):
+            if 'variables.json' not in files:
+                continue
+            relative = os.path.relpath(root, directory).replace(os.sep, '/')
+            year, _, dataset = relative.partition('/')
+            if not year.isdigit() or not dataset:
+                logger.warning(f"Skipping metadata outside the {{year}}/{{dataset}} layout: {root}")
+                continue
+            with open(os.path.join(root, 'variables.json')) as f:
+                variables = json.load(f)
+            groups = None
+            if 'groups.json' in files:
+                with open(os.path.join(root, 'groups.json')) as f:
+                    groups = json.load(f)
+            self.add_metadata(dataset, int(year), variables, groups)
+            indexed += 1
+        return indexed
+
+    def has_dataset(self, dataset: str, year: int) -> bool:
+        return self.connection.execute("SELECT 1 FROM datasets WHERE dataset = ? AND year = ?", (dataset, year)).fetchone() is not None
+
+    def has_variable(self, dataset: str, year: int, name: str) -> bool:
+        """Return whether a variable (or a group(TABLE) clause) exists in a dataset vintage."""
+        if name in GEOGRAPHY_VARIABLES:
+            return True
+        group = re.fullmatch(r'group\((\w+)\)', name)
+        if group:
+            return self.connection.execute("SELECT 1 FROM groups WHERE dataset = ? AND year = ? AND name = ?",
+                                           (dataset, year, group.group(1))).fetchone() is not None
+        return self.connection.execute("SELECT 1 FROM variables WHERE dataset = ? AND year = ? AND name = ?",
+                                       (dataset, year, name)).fetchone() is not None
+
+    def search(self, text: str, dataset: Optional[str] = None, year: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Find variables whose name, label or concept matches the search text."""
+        filters, params = [], []
+        if dataset:
+            filters.append("dataset = ?")
+            params.append(dataset)
+        if year:
+            filters.append("year = ?")
+            params.append(year)
+        if self.has_fts:
+            terms = ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+            query = "SELECT dataset, year, name, label, concept FROM variables_fts WHERE variables_fts MATCH ?"
+            params.insert(0, terms)
+            order = "ORDER BY rank"
+        else:
+            query = "SELECT dataset, year, name, label, concept FROM variables WHERE (label LIKE ? OR concept LIKE ? OR name LIKE ?)"
+            params[:0] = [f"%{text}%"] * 3
+            order = ""
+        if filters:
+            query += " AND " + " AND ".join(filters)
+        rows = self.connection.execute(f"{query} {order} LIMIT ?", params + [limit]).fetchall()
+        return [dict(zip(('dataset', 'year', 'name', 'label', 'concept'), row)) for row in rows]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+async def download_metadata(directory: str, dataset: str, years: List[int]) -> None:
+    """Download variables.json and groups.json for a dataset and years into the {year}/{dataset} layout."""
+    import aiohttp
+    async with aiohttp.ClientSession() as session:
+        for year in years:
+            target = os.path.join(directory, str(year), *dataset.split('/'))
+            os.makedirs(target, exist_ok=True)
+            for name in ('variables.json', 'groups.json'):
+                url = f"https://api.census.gov/data/{year}/{dataset}/{name}"
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    with open(os.path.join(target, name), 'wb') as f:
+                        f.write(await response.read())
+                logger.info(f"Downloaded {url}")
+
+
+# Usage example
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the local Census variable metadata index")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    download_parser = subparsers.add_parser('download', help="Download variables.json/groups.json for a dataset")
+    download_parser.add_argument('directory')
+    download_parser.add_argument('--dataset', required=True, help="Dataset path, e.g. acs/acs5/profile")
+    download_parser.add_argument('--years', type=int, nargs='+', required=True)
+    build_parser = subparsers.add_parser('build', help="Index downloaded metadata laid out as {year}/{dataset}/variables.json")
+    build_parser.add_argument('directory')
+    search_parser = subparsers.add_parser('search', help="Search variables by label text")
+    search_parser.add_argument('text')
+    search_parser.add_argument('--dataset')
+    search_parser.add_argument('--year', type=int)
+    search_parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'download':
+        import asyncio
+        asyncio.run(download_metadata(args.directory, args.dataset, args.years))
+    elif args.command == 'build':
+        print(f"Indexed {VariableIndex().build_from_directory(args.directory)} datasets")
+    else:
+        for match in VariableIndex().search(args.text, args.dataset, args.year, args.limit):
+            print(f"{match['year']} {match['dataset']} {match['name']}: {match['label']} ({match['concept']})")
@@ -0,0 +1,29 @@
+import os
+import sys
+import copy
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.config_loader import config  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def log_file(tmp_path_factory):
+    """Keep test runs (and the CLI subprocesses they start) out of the project log."""
+    os.environ['CENSUS_LOG_FILE'] = str(tmp_path_factory.mktemp('logs') / 'census_data_tool.log')
+    yield
+    os.environ.pop('CENSUS_LOG_FILE', None)
+
+
+@pytest.fixture
+def settings(tmp_path):
+    """Isolate config.yaml settings per test: no persistent cache, and stores under a temporary directory."""
+    saved = copy.deepcopy(config.config)
+    config.config['cache']['enabled'] = False
+    config.config['cache']['path'] = str(tmp_path / 'cache.sqlite')
+    config.config.setdefault('results_store', {})['path'] = str(tmp_path / 'results.sqlite')
+    config.config.setdefault('variable_codes', {})['path'] = str(tmp_path / 'learned_codes.sqlite')
+    yield config.config
+    config.config.clear()
+    config.config.update(saved)
@@ -0,0 +1,103 @@
+import zlib
+import sqlite3
+import asyncio
+import pytest
+from census_api_client import CensusAPIClient
+from mock_census_server import MockCensusServer
+from url_generator import URLGenerator
+
+
+def stat(name, variable, dataset='acs/acs5', years=(2022,)):
+    return {'name': name, 'api_url': f'https://api.census.gov/data/[year]/{dataset}?get={variable}&ucgid=1600000US1743250', 'years': list(years)}
+
+
+def mock_value(variable, year, geography):
+    return float(zlib.crc32(f"{variable}|{year}|{geography}".encode()) % 100000)
+
+
+def fetch(settings, statistics, geography=None, **server_options):
+    async def run():
+        server = MockCensusServer(latency_median=0.001, seed=1, **server_options)
+        settings['api']['base_url'] = await server.start()
+        try:
+            async with CensusAPIClient() as client:
+                cube = await client.fetch_cube(URLGenerator(statistics, geography).generate_batched_urls())
+            return cube, server.request_count
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+
+def test_group_responses_are_split_into_the_requested_variables(settings):
+    settings['performance']['group_fetch_threshold'] = 3
+    statistics = [stat(f'Income {index}', f'B19001_0{index:02d}E') for index in range(10, 14)]
+    cube, requests = fetch(settings, statistics, group_size=20)
+    assert requests == 1
+    for index in range(10, 14):
+        assert cube.get(None, f'Income {index}', 2022) == [mock_value(f'B19001_0{index:02d}E', '2022', '1600000US1743250'), f'B19001_0{index:02d}E']
+
+
+def test_iter_results_streams_records_with_bounded_lookahead(settings):
+    settings['performance']['max_pending_batches'] = 2
+    statistics = [stat('Population', 'B01003_001E', years=range(2010, 2020))]
+
+    async def run():
+        server = MockCensusServer(latency_median=0.001, seed=1)
+        settings['api']['base_url'] = await server.start()
+        try:
+            async with CensusAPIClient() as client:
+                records = []
+                async for record in client.iter_results(iter(URLGenerator(statistics).generate_batched_urls())):
+                    records.append((record, server.request_count))
+                    if len(records) == 3:
+                        break
+            return records, server.request_count
+        finally:
+            await server.stop()
+
+    records, requests = asyncio.run(run())
+    # Stopping early cancels the scheduled batches instead of fetching all ten years
+    assert [record.value for record, _ in records] == [[mock_value('B01003_001E', str(record.year), '1600000US1743250'), 'B01003_001E']
+                                                        for record, _ in records]
+    assert all(seen <= index + 2 for index, (_, seen) in enumerate(records)) and requests <= 5
+
+
+def test_concurrent_requests_for_one_url_are_coalesced(settings):
+    calls = []
+
+    async def send(session, url):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return [['B01003_001E'], ['100']]
+
+    async def run():
+        client = CensusAPIClient()
+        client._send_request = send
+        url = 'http://api.example/data/2022/acs/acs5?get=B01003_001E&ucgid=1600000US1743250'
+        same = 'http://api.example/data/2022/acs/acs5?ucgid=1600000US1743250&get=B01003_001E&key=secret'
+        results = await asyncio.gather(client._make_request(None, url), client._make_request(None, same), client._make_request(None, url))
+        # Cancelling one of two callers leaves the shared request running for the other
+        first = asyncio.ensure_future(client._make_request(None, url))
+        second = asyncio.ensure_future(client._make_request(None, url))
+        await asyncio.sleep(0)
+        first.cancel()
+        return results, await second, client.metrics.counters['coalesced_requests'], client._in_flight
+
+    results, second, coalesced, in_flight = asyncio.run(run())
+    assert len(calls) == 2 and results == [[['B01003_001E'], ['100']]] * 3 and second == [['B01003_001E'], ['100']]
+    assert coalesced == 3 and in_flight == {}
+
+
+def test_cache_follows_the_config_and_is_closed_with_the_client(settings):
+    assert CensusAPIClient(cache_mode='use').cache is None and CensusAPIClient(cache_mode='refresh').cache is None
+    settings['cache']['enabled'] = True
+
+    async def run():
+        async with CensusAPIClient(cache_mode='use') as client:
+            cache = client.cache
+            assert cache is not None
+        return cache
+    cache = asyncio.run(run())
+    assert cache._executor._shutdown
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.connection.execute("SELECT 1")
@@ -0,0 +1,57 @@
+import asyncio
+from aiohttp.test_utils import TestClient, TestServer
+from census_service import CensusService
+from mock_census_server import MockCensusServer
+
+
+def stats_config(state):
+    return {'statistics': [{'name': 'Population', 'description': 'Total population',
+                            'api_url': 'https://api.census.gov/data/[year]/acs/acs5?get=B01003_001E&ucgid=1600000US1743250',
+                            'years': [2022]}],
+            'geography': {'for': 'place:*', 'in': f'state:{state}'}}
+
+
+def test_reports_only_name_their_own_places_and_client_maps_stay_bounded(settings):
+    settings['performance']['max_tracked_entries'] = 8
+
+    async def run():
+        server = MockCensusServer(latency_median=0.001, seed=1, wildcard_rows=5)
+        settings['api']['base_url'] = await server.start()
+        service = CensusService(workers=1)
+        client = TestClient(TestServer(service.create_app()))
+        await client.start_server()
+        try:
+            reports = []
+            for state in ('17', '06'):
+                response = await client.post('/reports?format=json', json=stats_config(state))
+                assert response.status == 200
+                reports.append((await response.json())['reports'])
+            names = dict(service.client.location_names)
+        finally:
+            await client.close()
+            await server.stop()
+        return reports, names
+
+    (illinois, california), names = asyncio.run(run())
+    assert [report['location'] for report in illinois] == [f"Mock place {index:05d}, State 17" for index in range(1, 6)]
+    assert [report['location'] for report in california] == [f"Mock place {index:05d}, State 06" for index in range(1, 6)]
+    # Only the most recent names are kept by the long-lived client
+    assert len(names) == 8 and all(report['geography'] in names for report in california)
+
+
+def test_configs_with_rollups_or_peers_are_rejected(settings):
+    async def run():
+        client = TestClient(TestServer(CensusService(workers=1).create_app()))
+        await client.start_server()
+        try:
+            statuses = []
+            for extra in ({'rollups': [{'crosswalk': 'data/input/tract_county.csv'}]}, {'peers': {'k': 3}}):
+                response = await client.post('/reports?format=json', json={**stats_config('17'), **extra})
+                statuses.append((response.status, (await response.json())['error']))
+        finally:
+            await client.close()
+        return statuses
+
+    (rollups_status, rollups_error), (peers_status, peers_error) = asyncio.run(run())
+    assert rollups_status == peers_status == 400
+    assert 'rollups are not supported' in rollups_error and 'peers are not supported' in peers_error
@@ -0,0 +1,58 @@
+import asyncio
+import compileall
+import json
+import os
+import subprocess
+import sys
+import time
+import main
+from mock_census_server import MockCensusServer
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'cli.py')
+CONFIG = os.path.join(os.path.dirname(CLI), '..', 'data', 'input', 'census_stats_config.json')
+
+
+def cli(*args, env=None):
+    return subprocess.run([sys.executable, CLI] + list(args), capture_output=True, text=True, env=env)
+
+
+def test_invalid_configs_exit_with_an_error(tmp_path):
+    config_path = tmp_path / 'bad.json'
+    config_path.write_text(json.dumps({'statistics': 3}))
+    for command in ('validate', 'plan', 'fetch'):
+        result = cli(command, str(config_path))
+        assert result.returncode == 1, command
+        assert 'Traceback' not in result.stderr
+
+
+def test_plan_of_the_sample_config_succeeds():
+    result = cli('plan', CONFIG)
+    assert result.returncode == 0 and 'requests for' in result.stdout
+
+
+def test_short_commands_start_within_100ms():
+    # Measured as installed: bytecode compiled and an API key configured (a missing key is a warning, which
+    # configures logging)
+    compileall.compile_dir(os.path.dirname(CLI), quiet=1)
+    env = dict(os.environ, CENSUS_API_KEY='test-key')
+    for args in (('validate', '--no-index', CONFIG), ('validate', CONFIG), ('plan', CONFIG)):
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            assert cli(*args, env=env).returncode == 0, args
+            timings.append(time.perf_counter() - start)
+        assert min(timings) < 0.1, (args, timings)
+
+
+def test_fetch_returns_zero_on_success_and_one_on_failure(settings, tmp_path):
+    async def run():
+        server = MockCensusServer(latency_median=0.001, seed=1)
+        settings['api']['base_url'] = await server.start()
+        try:
+            succeeded = await main.main(json_path=CONFIG, output_dir=str(tmp_path))
+            failed = await main.main(json_path=str(tmp_path / 'missing.json'), output_dir=str(tmp_path))
+        finally:
+            await server.stop()
+        return succeeded, failed
+    assert asyncio.run(run()) == (0, 1)
+    assert any(name.endswith('Census report.md') for name in os.listdir(tmp_path))
@@ -0,0 +1,35 @@
+import pytest
+from result_cube import ResultCube
+from derived_metrics import DerivedMetricsEngine
+
+RESULTS = {
+    '1600000US1700001': {'Population': {2020: [100.0, 'P'], 2021: [110.0, 'P'], 2022: [121.0, 'P']}, 'Households': {2022: [242.0, 'H']}},
+    '1600000US1700002': {'Population': {2020: [300.0, 'P'], 2021: None, 2022: [150.0, 'P']}, 'Households': {2022: [300.0, 'H']}},
+    '1600000US0600001': {'Population': {2020: [50.0, 'P'], 2021: [0.0, 'P'], 2022: [10.0, 'P']}, 'Households': {2022: None}},
+}
+STATISTICS = [{'name': 'Population', 'derived': ['yoy', 'cagr', 'rank_within_state', {'metric': 'percent_of_total', 'of': 'Households'}]},
+              {'name': 'Households', 'derived': ['percent_of_total']}]
+
+
+def test_metrics_over_dictionaries_and_cubes_agree():
+    engine = DerivedMetricsEngine(STATISTICS)
+    derived = engine.compute(RESULTS)
+    assert derived == engine.compute(ResultCube.from_dict(RESULTS))
+    first, second, california = (derived[geography]['Population'] for geography in RESULTS)
+    assert first['YoY Change (%)'] == {2020: None, 2021: pytest.approx(10.0), 2022: pytest.approx(10.0)}
+    assert first['CAGR (%)'][2022] == pytest.approx(10.0)
+    # Missing values and divisions by zero are undefined rather than infinite
+    assert second['YoY Change (%)'][2021] is None
+    assert california['YoY Change (%)'][2022] is None
+    assert (first['Rank in State'][2020], second['Rank in State'][2020], california['Rank in State'][2020]) == (2.0, 1.0, 1.0)
+    assert second['Rank in State'][2021] is None
+    assert first['% of Total'] == {2020: None, 2021: None, 2022: pytest.approx(50.0)}
+    assert derived['1600000US1700002']['Households']['% of Total'][2022] == pytest.approx(300 / 542 * 100)
+
+
+def test_invalid_specs_are_rejected():
+    with pytest.raises(ValueError):
+        DerivedMetricsEngine([{'name': 'Population', 'derived': ['median']}])
+    with pytest.raises(ValueError):
+        DerivedMetricsEngine([{'name': 'Population', 'derived': [{'metric': 'percent_of_total', 'of': 'Missing'}]}])
+    assert not DerivedMetricsEngine([{'name': 'Population'}])
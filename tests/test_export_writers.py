@@ -0,0 +1,41 @@
+import os
+import asyncio
+import pytest
+from census_api_client import ResultRecord
+from export_writers import ResultWriter, CSVWriter, get_writer, export_results, read_export
+
+RECORDS = [ResultRecord('Population', 2022, 'geo1', [100.0, 'P']), ResultRecord('Income', 2022, 'geo1', [5.0, 'I']),
+           ResultRecord('Population', 2021, 'geo2', None)]
+
+
+async def stream(records):
+    for record in records:
+        yield record
+
+
+def test_result_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        ResultWriter(str(tmp_path / 'out.csv'))
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'jsonl'])
+def test_long_export_round_trips(tmp_path, export_format):
+    path = str(tmp_path / f'out.{export_format}')
+    with get_writer(export_format, path) as writer:
+        assert asyncio.run(export_results(stream(RECORDS), writer, batch_size=2)) == 3
+    assert read_export(path) == {'geo1': {'Population': {2022: [100.0, 'P']}, 'Income': {2022: [5.0, 'I']}},
+                                 'geo2': {'Population': {2021: None}}}
+    assert os.listdir(tmp_path) == [f'out.{export_format}']
+
+
+def test_concurrent_exports_to_one_path_use_separate_temp_files(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    first, second = CSVWriter(path), CSVWriter(path, layout='wide')
+    first.write_batch(RECORDS)
+    second.write_batch(RECORDS)
+    second.close()
+    assert first.temp_path != second.temp_path and os.path.exists(first.temp_path)
+    first.abort()
+    assert os.listdir(tmp_path) == ['out.csv']
+    with open(path, encoding='utf8') as file:
+        assert file.readline().strip() == 'geography,year,Population,Income'
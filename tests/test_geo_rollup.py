@@ -0,0 +1,61 @@
+import pytest
+from result_cube import ResultCube
+from geo_rollup import Crosswalk, GeographicRollup, load_crosswalk, aggregation_of
+
+URL = 'https://api.census.gov/data/[year]/acs/acs5?get={}&ucgid=1400000US17031010100'
+STATISTICS = [
+    {'name': 'Population', 'api_url': URL.format('B01003_001E'), 'years': [2022]},
+    {'name': 'Households', 'api_url': URL.format('B11001_001E'), 'years': [2022]},
+    {'name': 'With Computer', 'api_url': URL.format('B28003_002E'), 'years': [2022]},
+    {'name': 'Median Age', 'api_url': URL.format('B01002_001E'), 'years': [2022], 'aggregation': 'weighted_mean'},
+    {'name': 'Computer Share', 'api_url': URL.format('DP02_0153PE'), 'years': [2022],
+     'aggregation': {'method': 'ratio', 'numerator': 'With Computer', 'denominator': 'Households', 'scale': 100}},
+    {'name': 'Median Income', 'api_url': URL.format('B19013_001E'), 'years': [2022]},
+]
+CHILDREN = {'t1': (100, 40, 30, 30.0), 't2': (300, 60, 30, 40.0), 't3': (50, None, None, 50.0), 'orphan': (999, 1, 1, 1.0)}
+
+
+@pytest.fixture
+def crosswalk(tmp_path):
+    path = tmp_path / 'crosswalk.csv'
+    path.write_text('geography,parent,parent_name\nt1,c1,"County One"\nt2,c1,"County One"\nt3,c2,\n')
+    return load_crosswalk(str(path))
+
+
+def test_aggregations_are_inferred_or_declared():
+    assert [aggregation_of(stat)['method'] for stat in STATISTICS] == ['sum', 'sum', 'sum', 'weighted_mean', 'ratio', 'direct']
+    with pytest.raises(ValueError):
+        GeographicRollup([dict(STATISTICS[3], aggregation={'method': 'weighted_mean', 'weight': 'Missing'})], Crosswalk({}, {}))
+
+
+def test_children_roll_up_into_their_parents(crosswalk, settings):
+    cube = ResultCube([stat['name'] for stat in STATISTICS], [2022])
+    cube.requested[:] = True
+    for child, values in CHILDREN.items():
+        for name, value in zip(['Population', 'Households', 'With Computer', 'Median Age'], values):
+            if value is not None:
+                cube.set(child, name, 2022, float(value), 'V')
+    rollup = GeographicRollup(STATISTICS, crosswalk, weight='Population')
+    parents = rollup.compute(cube)
+    assert parents.geographies == ['c1', 'c2']
+    assert parents.get('c1', 'Population', 2022)[0] == 400
+    assert parents.get('c1', 'Median Age', 2022)[0] == pytest.approx((100 * 30 + 300 * 40) / 400)
+    assert parents.get('c1', 'Computer Share', 2022)[0] == pytest.approx(60 / 100 * 100)
+    assert parents.get('c2', 'Households', 2022) is None and parents.get('c2', 'Computer Share', 2022) is None
+    assert parents.get('c1', 'Median Income', 2022) is None
+    assert rollup.parent_names() == {'c1': 'County One'}
+    batches = rollup.direct_batches(parents)
+    assert [list(batch['statistics']) for batch in batches] == [['Median Income']]
+    assert 'ucgid=c1,c2' in batches[0]['primary']
+
+
+def test_non_additive_statistics_are_matched_by_whole_word_and_variable_suffix():
+    def method(name, variable, description=''):
+        return aggregation_of({'name': name, 'description': description, 'api_url': URL.format(variable)})['method']
+    assert method('Gini Index', 'B19083_001E') == 'direct'
+    assert method('Population', 'B01003_001M', 'Total population margin of error') == 'direct'
+    assert method('Population', 'B01003_001MA') == 'direct'
+    assert method('Poverty Rates', 'S1701_C03_001E') == 'direct'
+    assert method('Share of renters (%)', 'B25003_003E') == 'direct'
+    for name in ('Separated', 'Generated income', 'Operated units', 'Meaningful jobs'):
+        assert method(name, 'B12001_007E') == 'sum', name
@@ -0,0 +1,97 @@
+import os
+import json
+import asyncio
+import threading
+import pytest
+import job_runner
+from census_api_client import ResultRecord
+from job_runner import JobQueue
+from mock_census_server import MockCensusServer
+from request_scheduler import RequestScheduler
+from results_store import ResultsStore
+
+BATCHES = [{'year': 2022, 'primary': 'https://api.census.gov/data/2022/acs/acs5?get=B01003_001E,GEO_ID&for=place:*&in=state:17',
+            'statistics': {'Population': 'B01003_001E'}, 'geography': {'for': 'place:*', 'in': 'state:17'}, 'fallback': {}}]
+
+
+def test_claims_are_exclusive_and_failures_are_retried(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'))
+    queue.create_job('job', 'config.json', BATCHES * 3, {}, 'Illinois', str(tmp_path), shard_size=2)
+    first, second = queue.claim('job', 'fetch', 'a'), queue.claim('job', 'fetch', 'b')
+    assert (first[0], second[0]) == (0, 1) and queue.claim('job', 'fetch', 'c') is None
+    queue.complete('job', 'fetch', 0)
+    queue.fail('job', 'fetch', 1, 'boom', max_attempts=2)
+    assert queue.progress('job') == {'fetch': {'done': 1, 'pending': 1}}
+    assert queue.claim('job', 'fetch', 'b')[0] == 1
+    queue.fail('job', 'fetch', 1, 'boom', max_attempts=2)
+    assert queue.progress('job')['fetch'] == {'done': 1, 'failed': 1}
+    queue.close()
+
+
+def test_derived_metrics_are_stored_once_with_the_render_shards(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'))
+    queue.create_job('job', 'config.json', BATCHES, {}, 'Illinois', str(tmp_path), shard_size=10)
+    derived = {'a': {'Population': {'Rank': {2022: 1.0, 2021: None}}}, 'b': {'Population': {'Rank': {2022: 2.0}}}}
+    assert queue.add_render_shards('job', ['a', 'b', 'c'], 2, derived) == 2
+    assert queue.render_queued('job')
+    assert queue.add_render_shards('job', ['a', 'b', 'c'], 2, {}) == 0
+    assert queue.derived('job', ['a', 'c']) == {'a': {'Population': {'Rank': {2022: 1.0, 2021: None}}}}
+    queue.close()
+
+
+def test_load_selects_the_requested_geographies(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    store.save(BATCHES, [ResultRecord('Population', 2022, f'geo{index}', [float(index), 'B01003_001E']) for index in range(1200)])
+    assert sorted(store.geographies(BATCHES)) == sorted(f'geo{index}' for index in range(1200))
+    loaded = store.load(BATCHES, ['geo3', 'geo1100', 'missing'])
+    assert loaded == {'geo3': {'Population': {2022: [3.0, 'B01003_001E']}},
+                      'geo1100': {'Population': {2022: [1100.0, 'B01003_001E']}},
+                      'missing': {'Population': {2022: None}}}
+    assert len(store.load(BATCHES, [f'geo{index}' for index in range(1200)])) == 1200
+    assert store.pending_batches(BATCHES) == []
+    store.close()
+
+
+def test_worker_schedulers_share_the_rate_limit(settings):
+    settings['performance']['rate_limit_per_second'] = 12
+    settings['performance']['rate_limit_burst'] = 8
+    scheduler = RequestScheduler(rate_share=1 / 4)
+    assert (scheduler.rate_limit, scheduler.rate_limit_burst) == (3, 2)
+    assert RequestScheduler().rate_limit == 12
+
+
+def test_failed_fetch_shards_stop_rendering_until_resumed(settings, tmp_path, monkeypatch):
+    settings['job_runner'].update({'path': str(tmp_path / 'jobs.sqlite'), 'max_attempts': 1})
+    settings['error_handling'].update({'max_retries': 1, 'retry_delay': 0})
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps({'location': 'Illinois', 'geography': {'for': 'place:*', 'in': 'state:17'}, 'statistics': [
+        {'name': 'Population', 'description': 'Total population', 'years': [2022],
+         'api_url': 'https://api.census.gov/data/[year]/acs/acs5?get=B01003_001E&ucgid=1600000US1743250'}]}))
+    server = MockCensusServer(latency_median=0.001, error_rate=1.0, wildcard_rows=3, seed=1)
+    loop = asyncio.new_event_loop()
+    settings['api']['base_url'] = loop.run_until_complete(server.start())
+    # Run the workers in this process, with the mock server's loop running alongside them in a thread
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    monkeypatch.setattr(job_runner, '_run_workers', lambda queue_path, job_id, kind, workers, max_attempts:
+                        job_runner.worker_main(queue_path, job_id, kind, max_attempts, workers))
+    output_dir = tmp_path / 'reports'
+    try:
+        assert job_runner.run_job(str(config_path), workers=1, output_dir=str(output_dir)) == {'fetch': {'failed': 1}}
+        assert not output_dir.exists() or not os.listdir(output_dir)
+        server.error_rate = 0.0
+        assert job_runner.run_job(str(config_path), workers=1, output_dir=str(output_dir)) == {'fetch': {'done': 1}, 'render': {'done': 1}}
+        assert len(os.listdir(output_dir)) == 3
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def test_configs_with_rollups_or_peers_are_rejected(settings, tmp_path):
+    settings['job_runner']['path'] = str(tmp_path / 'jobs.sqlite')
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps({'location': 'Illinois', 'geography': {'for': 'place:*', 'in': 'state:17'}, 'peers': {'k': 3},
+                                       'statistics': [{'name': 'Population', 'description': 'Total population', 'years': [2022],
+                                                       'api_url': 'https://api.census.gov/data/[year]/acs/acs5?get=B01003_001E'}]}))
+    with pytest.raises(ValueError, match='peers are not supported'):
+        job_runner.run_job(str(config_path), job_id='peers', workers=1)
+    assert JobQueue().job('peers') is None
@@ -0,0 +1,49 @@
+import json
+import queue
+import threading
+import logging
+import logging.handlers
+from utils.logging_config import JsonFormatter, SamplingFilter, LazyQueueHandler
+
+
+def record(message='Fetched %s', args=('url',), level=logging.INFO, **extra):
+    log_record = logging.LogRecord('census_api_client.requests', level, __file__, 1, message, args, None)
+    log_record.__dict__.update(extra)
+    return log_record
+
+
+def test_sampling_filter_rate_limits_and_reports_drops():
+    sampling = SamplingFilter(rate=3, sample_every=5)
+    records = [record() for _ in range(13)]
+    assert [sampling.filter(log_record) for log_record in records] == [True] * 3 + [False] * 4 + [True] + [False] * 4 + [True]
+    assert records[7].getMessage() == 'Fetched url (4 similar records dropped)' and records[7].sampled_out == 4
+    # A new one-second window lets records through again
+    sampling.window_start -= 1.0
+    assert sampling.filter(record())
+    assert sampling.filter(record(level=logging.ERROR))
+
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(JsonFormatter().format(record(year=2022)))
+    assert (entry['message'], entry['level'], entry['year']) == ('Fetched url', 'INFO', 2022)
+
+
+def test_queued_records_are_formatted_by_the_listener():
+    class Lazy:
+        formatted_in = None
+
+        def __str__(self):
+            Lazy.formatted_in = threading.current_thread()
+            return 'value'
+
+    record_queue = queue.SimpleQueue()
+    collected = []
+    target = logging.Handler()
+    target.emit = lambda log_record: collected.append(log_record.getMessage())
+    listener = logging.handlers.QueueListener(record_queue, target)
+    listener.start()
+    logger = logging.getLogger('test_logging_config.queued')
+    logger.handlers, logger.propagate = [LazyQueueHandler(record_queue)], False
+    logger.warning("Lazy %s", Lazy())
+    listener.stop()
+    assert collected == ['Lazy value'] and Lazy.formatted_in is not threading.current_thread()
@@ -0,0 +1,26 @@
+import os
+import stat
+import pytest
+from markdown_formatter import MarkdownFormatter, StreamingMarkdownWriter
+
+DATA = {'Population': {2020: [2700000.0, 'P1_001N'], 2010: None}, 'Median Income': {2022: [65000.0, 'S1901_C01_012E']}}
+
+
+def test_streamed_report_matches_the_in_memory_rendering(tmp_path):
+    path = str(tmp_path / 'reports' / 'Chicago.md')
+    with StreamingMarkdownWriter(path, show_variable_key=True) as writer:
+        for statistic, years_data in DATA.items():
+            writer.write_statistic(statistic, years_data)
+    with open(path, encoding='utf8') as file:
+        assert file.read() == MarkdownFormatter(DATA).generate_markdown(True)
+    assert os.listdir(tmp_path / 'reports') == ['Chicago.md']
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_failed_report_leaves_no_partial_file(tmp_path):
+    path = str(tmp_path / 'Chicago.md')
+    with pytest.raises(RuntimeError):
+        with StreamingMarkdownWriter(path) as writer:
+            writer.write_statistic('Population', DATA['Population'])
+            raise RuntimeError("fetch failed")
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,28 @@
+import json
+from metrics import Histogram, MetricsCollector
+
+
+def test_histogram_percentiles_interpolate_within_buckets():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.percentile(0.5) == 1.5
+    assert histogram.percentile(1.0) == 3.0
+    assert Histogram().percentile(0.5) == 0.0
+
+
+def test_summary_and_prometheus_export(tmp_path):
+    metrics = MetricsCollector()
+    metrics.increment('requests', 3)
+    metrics.record_status(200)
+    metrics.record_status(429)
+    metrics.observe('total', 0.02)
+    text = metrics.to_prometheus()
+    assert 'census_client_requests_total 3' in text
+    assert 'census_client_responses_total{status="429"} 1' in text
+    assert 'census_client_total_seconds_bucket{le="0.025"} 1' in text
+    metrics.write_json(str(tmp_path / 'metrics.json'))
+    with open(tmp_path / 'metrics.json') as file:
+        summary = json.load(file)
+    assert summary['statuses'] == {'200': 1, '429': 1} and summary['timings_s']['total']['count'] == 1
@@ -0,0 +1,46 @@
+import os
+import sys
+import asyncio
+import aiohttp
+from mock_census_server import MockCensusServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+
+def get(server, *paths):
+    async def run():
+        base_url = await server.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                responses = []
+                for path in paths:
+                    async with session.get(base_url + path) as response:
+                        responses.append((response.status, await response.json() if response.status == 200 else None))
+                return responses
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+
+def test_responses_are_census_shaped_and_deterministic():
+    paths = ['/data/2022/acs/acs5?get=B01003_001E,NAME&ucgid=1600000US1743250',
+             '/data/2022/acs/acs5?get=group(B19001)&for=place:*&in=state:06', '/data/2022/acs/acs5?get=']
+    (single_status, single), (group_status, group), (empty_status, _) = get(MockCensusServer(0.001, wildcard_rows=3, group_size=2), *paths)
+    assert (single_status, group_status, empty_status) == (200, 200, 400)
+    assert single[0] == ['B01003_001E', 'NAME', 'ucgid'] and single[1][1:] == ['Mock place 1600000US1743250', '1600000US1743250']
+    assert group[0] == ['B19001_001E', 'B19001_002E', 'GEO_ID', 'NAME', 'state', 'place']
+    assert [row[2] for row in group[1:]] == ['1600000US0600001', '1600000US0600002', '1600000US0600003']
+    assert get(MockCensusServer(0.001), paths[0]) == [(single_status, single)]
+
+
+def test_error_and_throttle_rates():
+    statuses = [status for status, _ in get(MockCensusServer(0.001, error_rate=0.5, throttle_rate=0.5, seed=1),
+                                            *['/data/2022/acs/acs5?get=B01003_001E'] * 10)]
+    assert set(statuses) == {429, 500}
+
+
+def test_microbenchmarks_run(settings):
+    import microbenchmarks
+    results = microbenchmarks.main(items=20, repeat=1)
+    assert set(results) == {'reformat_data', 'reformat_rows', 'generate_urls', 'generate_batched_urls', 'generate_markdown'}
+    assert all(result['items'] == 20 and result['seconds'] >= 0 for result in results.values())
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+from request_plan import RequestPlan
+from response_cache import ResponseCache
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def batch(year, statistics, url):
+    return {'year': year, 'primary': url, 'strategy': 'batched', 'statistics': {name: None for name in statistics}}
+
+
+BATCHES = [
+    batch(2022, ['Population'], 'https://api.census.gov/data/2022/acs/acs5?get=B01003_001E&for=place:43250&in=state:17&key=k'),
+    batch(2022, ['Total'], 'https://api.census.gov/data/2022/acs/acs5?in=state:17&get=B01003_001E&for=place:43250'),
+    batch(2021, ['Income'], 'https://api.census.gov/data/2021/acs/acs5?get=B19013_001E&for=place:43250&in=state:17'),
+]
+
+
+def test_compile_merges_identical_requests_and_sorts():
+    plan = RequestPlan.compile(BATCHES)
+    assert len(plan) == 2 and plan.cells() == 3
+    first, second = plan
+    assert (first.year, second.year) == (2021, 2022)
+    assert second.statistics == ('Population', 'Total')
+    assert second.dataset == 'acs/acs5' and second.variables == ('B01003_001E',)
+    assert 'key=' not in second.url and second.scope == 'for=place:43250&in=state:17'
+
+
+def test_plans_round_trip_through_json_and_diff(tmp_path):
+    plan = RequestPlan.compile(BATCHES)
+    plan.save(str(tmp_path / 'plan.json'))
+    assert RequestPlan.load(str(tmp_path / 'plan.json')) == plan
+    previous = RequestPlan.compile(BATCHES[:2])
+    added, removed = plan.diff(previous)
+    assert [request.year for request in added] == [2021] and removed == []
+
+
+def test_estimate_counts_cached_requests(tmp_path):
+    plan = RequestPlan.compile(BATCHES)
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    cache.set(BATCHES[2]['primary'], '[["B19013_001E"],["1"]]')
+    estimate = plan.estimate(cache, concurrency=2, latency=1.0)
+    assert (estimate.requests, estimate.cached, estimate.network_requests) == (2, 1, 1)
+    assert estimate.cache_hit_ratio == 0.5 and estimate.estimated_seconds == 0.5
+    cache.close()
+
+
+def test_importing_the_planner_does_not_load_aiohttp():
+    code = "import sys, request_plan; sys.exit('aiohttp' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=SRC).returncode == 0
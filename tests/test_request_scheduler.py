@@ -0,0 +1,56 @@
+import time
+import asyncio
+from request_scheduler import TokenBucket, AdaptiveConcurrencyLimiter, RequestScheduler
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=5)
+        start = time.monotonic()
+        for _ in range(10):
+            await bucket.acquire()
+        return time.monotonic() - start
+    # 5 tokens are available at once, the other 5 arrive at 50 per second
+    assert 0.08 <= asyncio.run(run()) < 0.5
+
+
+def test_limiter_grows_after_healthy_windows_and_halves_on_throttling():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=1, max_limit=3, target_latency=1.0)
+        for _ in range(2):
+            await limiter.acquire()
+            await limiter.release(200, 0.1)
+        grown = limiter.limit
+        for _ in range(10):
+            await limiter.acquire()
+            await limiter.release(200, 0.1)
+        capped = limiter.limit
+        await limiter.acquire()
+        await limiter.release(429, 0.1)
+        await limiter.acquire()
+        await limiter.release(503, 0.1)
+        return grown, capped, limiter.limit
+    # Throttled responses within one latency window count as a single congestion event
+    assert asyncio.run(run()) == (3, 3, 1)
+
+
+def test_slots_wait_for_the_concurrency_limit(settings):
+    settings['performance']['concurrent_requests'] = 1
+    settings['performance']['max_concurrent_requests'] = 1
+    settings['performance']['rate_limit_per_second'] = 1000
+    scheduler = RequestScheduler()
+    active, peak = 0, 0
+
+    async def request():
+        nonlocal active, peak
+        async with scheduler.slot('http://api.example/data') as slot:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            slot.status = 200
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(4)))
+    asyncio.run(run())
+    assert peak == 1 and scheduler.limiter.in_flight == 0
@@ -0,0 +1,80 @@
+import asyncio
+import sqlite3
+from response_cache import ResponseCache
+
+URL = 'https://api.census.gov/data/2022/acs/acs5?get=B01003_001E&for=place:43250&in=state:17&key=secret'
+
+
+def test_normalized_keys_ignore_api_key_and_parameter_order(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    cache.set(URL, '[["B01003_001E"],["1"]]')
+    reordered = 'https://API.census.gov/data/2022/acs/acs5?in=state:17&for=place:43250&get=B01003_001E'
+    assert cache.get(reordered) == '[["B01003_001E"],["1"]]'
+    assert cache.contains(reordered)
+    assert cache.get(URL.replace('43250', '1')) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_dataset_ttls_expire_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), default_ttl=60, dataset_ttls={'acs': 1e-9, 'dec': 0})
+    cache.set(URL, 'body')
+    decennial = 'https://api.census.gov/data/2020/dec/pl?get=P1_001N&for=us:1'
+    cache.set(decennial, 'body')
+    assert cache.get(URL) is None
+    assert cache.get(decennial) == 'body'
+    assert cache.ttl_for('acs/acs5') == 1e-9 and cache.ttl_for('timeseries/x') == 60
+    cache.close()
+
+
+def test_eviction_keeps_the_total_under_the_cap(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_size_mb=10 / 1024)
+    for index in range(30):
+        cache.set(f'{URL}&n={index}', b'x' * 1024)
+    cache.get(f'{URL}&n=0')
+    assert cache.total_size <= cache.max_size_bytes
+    assert cache.get(f'{URL}&n=29') is not None
+    assert cache.get(f'{URL}&n=1') is None
+    assert cache.stats()['size_bytes'] == cache.total_size
+    cache.close()
+    reopened = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    assert reopened.total_size == cache.total_size
+    reopened.close()
+
+
+def test_replacing_an_entry_updates_the_running_total(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    cache.set(URL, b'x' * 100)
+    cache.set(URL, b'x' * 40)
+    assert cache.total_size == 40
+    cache.close()
+
+
+def test_writes_are_committed_in_batches(tmp_path, settings):
+    settings['cache']['commit_every'] = 3
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResponseCache(path)
+
+    def committed():
+        with sqlite3.connect(path) as other:
+            return other.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    cache.set(f'{URL}&n=1', 'a')
+    cache.set(f'{URL}&n=2', 'b')
+    assert committed() == 0
+    cache.set(f'{URL}&n=3', 'c')
+    assert committed() == 3
+    cache.set(f'{URL}&n=4', 'd')
+    cache.close()
+    assert committed() == 4
+
+
+def test_async_methods_run_off_the_event_loop(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+
+    async def run():
+        await cache.set_async(URL, b'[["A"],["1"]]')
+        body = await cache.get_async(URL)
+        await cache.flush_async()
+        return body
+    assert asyncio.run(run()) == '[["A"],["1"]]'
+    cache.close()
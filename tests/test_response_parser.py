@@ -0,0 +1,66 @@
+import asyncio
+import json
+import random
+import pytest
+from census_api_client import CensusAPIClient
+from mock_census_server import MockCensusServer
+from response_cache import ResponseCache
+from response_parser import RowStreamParser, parse_rows
+
+ROWS = [['NAME', 'B01003_001E', 'GEO_ID']] + [[f'Place "{index}", [IL]', str(index * 7), f'1600000US17{index:05d}'] for index in range(2000)]
+BODY = json.dumps(ROWS).encode('utf8')
+
+
+def stream(body, sizes):
+    parser, rows, position = RowStreamParser(), [], 0
+    while position < len(body):
+        size = sizes()
+        rows.extend(parser.feed(body[position:position + size]))
+        position += size
+    parser.close()
+    return rows
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_streamed_rows_match_a_full_parse_for_any_chunking(seed):
+    generator = random.Random(seed)
+    assert stream(BODY, lambda: generator.randint(1, 4096)) == parse_rows(BODY) == ROWS
+
+
+def test_truncated_and_malformed_bodies_are_rejected():
+    with pytest.raises(ValueError):
+        stream(BODY[:-10], lambda: 1000)
+    with pytest.raises(ValueError):
+        stream(BODY + b'[1]', lambda: 1000)
+    with pytest.raises(ValueError):
+        parse_rows(b'{"error": "unknown variable"}')
+
+
+def test_column_conversion(settings):
+    client = CensusAPIClient()
+    assert client._convert_values(['1', None, '2.5']) == [1.0, None, 2.5]
+    assert client._convert_values(['1', 'N/A', None]) == [1.0, 'N/A', None]
+
+
+def test_streamed_responses_are_cached_from_a_spooled_body(settings, tmp_path):
+    settings['cache']['enabled'] = True
+    settings['performance']['stream_parse_threshold'] = 0
+
+    async def run():
+        server = MockCensusServer(latency_median=0.001, seed=1)
+        base = await server.start()
+        url = f'{base}/data/2022/acs/acs5?get=NAME,B01003_001E,GEO_ID&for=place:*&in=state:17'
+        try:
+            async with CensusAPIClient() as client:
+                fetched = await client._make_request(client.session, url)
+                cached = client.cache.get(url)
+            async with CensusAPIClient(cache_mode='offline') as client:
+                offline = await client._make_request(client.session, url)
+        finally:
+            await server.stop()
+        return fetched, cached, offline
+    fetched, cached, offline = asyncio.run(run())
+    assert len(fetched) > 1 and parse_rows(cached) == fetched == offline
+    cache = ResponseCache()
+    assert cache.total_size == len(cached)
+    cache.close()
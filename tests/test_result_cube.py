@@ -0,0 +1,49 @@
+import numpy as np
+from result_cube import ResultCube
+from census_api_client import ResultRecord
+
+
+def batch(year, statistics):
+    return {'year': year, 'statistics': {name: None for name in statistics}, 'primary': '', 'fallback': {}}
+
+
+def test_years_are_ascending_whatever_the_batch_order():
+    cube = ResultCube.from_batches([batch(2020, ['Population']), batch(2018, ['Population', 'Median Income']),
+                                    batch(2022, ['Population'])])
+    assert cube.years == [2018, 2020, 2022]
+    assert cube.years_of('Population') == [2018, 2020, 2022]
+    assert cube.years_of('Median Income') == [2018]
+    cube.add(ResultRecord('Population', 2022, None, [100.0, 'B01003_001E']))
+    assert list(cube.location(None)['Population']) == [2018, 2020, 2022]
+
+
+def test_from_dict_round_trips_with_sorted_years():
+    results = {'A': {'Population': {2021: [10.0, 'P'], 2019: None}, 'Name': {2021: ['text', 'N']}},
+               'B': {'Population': {2021: [20.0, 'P'], 2019: [15.0, 'P']}, 'Name': {2021: None}}}
+    cube = ResultCube.from_dict(results)
+    assert cube.years == [2019, 2021]
+    assert cube.to_dict() == {'A': {'Population': {2019: None, 2021: [10.0, 'P']}, 'Name': {2021: ['text', 'N']}},
+                              'B': {'Population': {2019: [15.0, 'P'], 2021: [20.0, 'P']}, 'Name': {2021: None}}}
+    assert list(cube.to_dict()['A']['Population']) == [2019, 2021]
+
+
+def test_cells_and_slices():
+    cube = ResultCube(['Population', 'Income'], [2021, 2022])
+    cube.requested[:] = True
+    for index in range(40):
+        cube.set(f'geo{index}', 'Population', 2022, float(index), 'P')
+    assert len(cube.geographies) == 40
+    assert cube.get('geo7', 'Population', 2022) == [7.0, 'P']
+    assert cube.get('geo7', 'Income', 2022) is None
+    assert cube.get('missing', 'Population', 2022) is None
+    np.testing.assert_array_equal(cube.statistic('Population')[:, 1], np.arange(40.0))
+    assert cube.values.shape == (40, 2, 2)
+
+
+def test_derive_shares_axes_and_headers():
+    cube = ResultCube(['Population'], [2022], ['a'])
+    cube.requested[:] = True
+    cube.set('a', 'Population', 2022, 5.0, 'P')
+    parents = cube.derive(['p'], np.array([[[12.0]]]))
+    assert parents.get('p', 'Population', 2022) == [12.0, 'P']
+    assert parents.years == cube.years
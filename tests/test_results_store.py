@@ -0,0 +1,50 @@
+import os
+import asyncio
+import main
+from census_api_client import ResultRecord
+from mock_census_server import MockCensusServer
+from results_store import ResultsStore
+
+BATCH = {'year': 2022, 'primary': 'https://api.census.gov/data/2022/acs/acs5?get=B01003_001E,B19013_001E&ucgid=1600000US1743250',
+         'statistics': {'Population': 'B01003_001E', 'Income': 'B19013_001E'}, 'geography': None, 'fallback': {}}
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'input', 'census_stats_config.json')
+
+
+def test_only_missing_or_invalidated_cells_are_pending(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    assert store.pending_batches([BATCH]) == [BATCH]
+    # A failed cell is not stored, so its batch is requested again
+    assert store.save([BATCH], [ResultRecord('Population', 2022, None, [10.0, 'B01003_001E']), ResultRecord('Income', 2022, None, None)]) == 1
+    assert store.pending_batches([BATCH]) == [BATCH]
+    store.save([BATCH], [ResultRecord('Income', 2022, None, [5.0, 'B19013_001E'])])
+    assert store.pending_batches([BATCH]) == []
+    assert store.load([BATCH]) == {None: {'Population': {2022: [10.0, 'B01003_001E']}, 'Income': {2022: [5.0, 'B19013_001E']}}}
+    assert store.invalidate(statistic='Income') == 1 and store.pending_batches([BATCH]) == [BATCH]
+    store.close()
+
+
+def test_reports_are_regenerated_only_when_their_inputs_change(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    results = {'Population': {2022: [10.0, 'B01003_001E']}}
+    assert store.report_changed('Chicago', results)
+    store.mark_report('Chicago', results)
+    assert not store.report_changed('Chicago', results)
+    assert store.report_changed('Chicago', {'Population': {2022: [11.0, 'B01003_001E']}})
+    assert store.report_changed('Chicago', results, str(tmp_path / 'missing.md'))
+    store.close()
+
+
+def test_second_incremental_run_makes_no_requests(settings, tmp_path):
+    async def run():
+        server = MockCensusServer(latency_median=0.001, seed=1)
+        settings['api']['base_url'] = await server.start()
+        try:
+            statuses = []
+            for _ in range(2):
+                statuses.append(await main.main(json_path=CONFIG, output_dir=str(tmp_path), incremental=True))
+                statuses.append(server.request_count)
+            return statuses
+        finally:
+            await server.stop()
+    first_status, first_requests, second_status, second_requests = asyncio.run(run())
+    assert (first_status, second_status) == (0, 0) and first_requests > 0 and second_requests == first_requests
@@ -0,0 +1,68 @@
+import asyncio
+import time
+import pytest
+from census_api_client import CensusAPIClient
+from retry_policy import CircuitBreaker
+
+URL = 'http://127.0.0.1:1/data/2022/acs/acs5?get=B01003_001E&for=place:43250&in=state:17'
+
+
+def half_open(breaker: CircuitBreaker) -> None:
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+
+def test_breaker_opens_after_threshold_and_lets_one_trial_through():
+    breaker = CircuitBreaker('api', failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    half_open(breaker)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_released_trial_lets_the_next_request_through():
+    breaker = CircuitBreaker('api', failure_threshold=1, reset_timeout=30)
+    half_open(breaker)
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.state == 'half-open' and breaker.allow()
+
+
+async def _fetch(client, make_request):
+    client._make_request = make_request
+    breaker = client._circuit_breaker_for(URL)
+    half_open(breaker)
+    return breaker, asyncio.ensure_future(client._fetch_url_with_retry(None, 'Population', 2022, URL, 'primary'))
+
+
+def test_trial_ending_in_value_error_is_released(settings):
+    async def malformed(session, url):
+        raise ValueError("Malformed response")
+
+    async def run():
+        breaker, task = await _fetch(CensusAPIClient(), malformed)
+        assert await task is None
+        return breaker
+    breaker = asyncio.run(run())
+    assert not breaker.trial_in_flight and breaker.allow()
+
+
+def test_cancelled_trial_is_released(settings):
+    async def slow(session, url):
+        await asyncio.sleep(60)
+
+    async def run():
+        breaker, task = await _fetch(CensusAPIClient(), slow)
+        await asyncio.sleep(0.01)
+        assert breaker.trial_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return breaker
+    breaker = asyncio.run(run())
+    assert not breaker.trial_in_flight and breaker.allow()
@@ -0,0 +1,65 @@
+import numpy as np
+from result_cube import ResultCube
+from similar_places import SimilarPlaces
+
+
+def make_cube(places=50, years=(2022,), seed=0):
+    rng = np.random.default_rng(seed)
+    cube = ResultCube(['Population', 'Median Income'], list(years))
+    cube.requested[:] = True
+    for index in range(places):
+        for year in years:
+            cube.set(f'geo{index}', 'Population', year, float(rng.integers(1000, 100000)), 'P')
+            cube.set(f'geo{index}', 'Median Income', year, float(rng.integers(20000, 150000)), 'I')
+    return cube
+
+
+def test_query_matches_brute_force():
+    index = SimilarPlaces(make_cube(), weights={'Median Income': 2.0})
+    features = index.features
+    for row, geography in enumerate(index.geographies[:10]):
+        distances = np.sqrt(((features - features[row]) ** 2).sum(axis=1))
+        distances[row] = np.inf
+        expected = [index.geographies[other] for other in np.argsort(distances, kind='stable')[:5]]
+        assert [place for place, _ in index.query(geography, k=5)] == expected
+
+
+def test_save_and_load_round_trip(tmp_path):
+    cube = make_cube()
+    index = SimilarPlaces(cube)
+    index.save(str(tmp_path / 'places.npz'))
+    loaded = SimilarPlaces.load(str(tmp_path / 'places.npz'))
+    assert loaded.query('geo3', k=4) == index.query('geo3', k=4)
+    assert loaded.matches(cube)
+
+
+def test_from_config_rebuilds_a_stale_index(tmp_path):
+    path = str(tmp_path / 'places.npz')
+    cube = make_cube(places=20, years=(2021, 2022))
+    SimilarPlaces.from_config({'index': path}, cube)
+    assert SimilarPlaces.from_config({'index': path}, cube).matches(cube)
+
+    # Other weights, another year and newly fetched places each invalidate the saved index
+    reweighted = SimilarPlaces.from_config({'index': path, 'weights': {'Population': 3.0}}, cube)
+    assert reweighted.weights.tolist() == [3.0, 1.0]
+    earlier = SimilarPlaces.from_config({'index': path, 'year': 2021}, cube)
+    assert earlier.years == [2021, 2021]
+    grown = make_cube(places=30, years=(2021, 2022))
+    rebuilt = SimilarPlaces.from_config({'index': path}, grown)
+    assert 'geo25' in rebuilt and SimilarPlaces.load(path).matches(grown)
+
+    # A prebuilt index holding every fetched place is reused
+    assert SimilarPlaces.from_config({'index': path}, make_cube(places=10, years=(2021, 2022))).geography_count == 30
+
+
+def test_changed_values_invalidate_a_saved_index(tmp_path):
+    path = str(tmp_path / 'places.npz')
+    SimilarPlaces.from_config({'index': path}, make_cube(places=20))
+    assert SimilarPlaces.load(path).matches(make_cube(places=20))
+
+    # Same places and statistics, other values: a full index fails its content hash, a prebuilt one the value check
+    refreshed = make_cube(places=20, seed=1)
+    assert not SimilarPlaces.load(path).matches(refreshed)
+    assert not SimilarPlaces.load(path).matches(make_cube(places=10, seed=1))
+    rebuilt = SimilarPlaces.from_config({'index': path}, refreshed)
+    assert rebuilt.raw.tolist() == SimilarPlaces(refreshed).raw.tolist() and SimilarPlaces.load(path).matches(refreshed)
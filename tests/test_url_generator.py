@@ -0,0 +1,51 @@
+from url_generator import URLGenerator
+
+UCGID = 'ucgid=1600000US1743250'
+
+
+def stat(name, variable, dataset='acs/acs5/subject', years=(2022,)):
+    return {'name': name, 'api_url': f'https://api.census.gov/data/[year]/{dataset}?get={variable}&{UCGID}', 'years': list(years)}
+
+
+def test_statistics_sharing_a_dataset_and_year_are_batched(settings):
+    statistics = [stat('Median Income', 'S1901_C01_012E', years=(2021, 2022)), stat('Mean Income', 'S1901_C01_013E'),
+                  stat('Occupied', 'DP04_0002PE', dataset='acs/acs5/profile')]
+    batches = URLGenerator(statistics).generate_batched_urls()
+    assert [(batch['year'], batch['strategy'], list(batch['statistics'])) for batch in batches] == [
+        (2021, 'single', ['Median Income']), (2022, 'batched', ['Median Income', 'Mean Income']), (2022, 'single', ['Occupied'])]
+    assert 'get=S1901_C01_012E,S1901_C01_013E&ucgid=1600000US1743250' in batches[1]['primary']
+    assert batches[1]['positions'] == {'Median Income': 0, 'Mean Income': 1}
+    assert set(batches[1]['fallback']) == {'Median Income', 'Mean Income'}
+
+
+def test_batches_respect_the_variable_limit(settings):
+    settings['performance']['max_variables_per_request'] = 2
+    settings['performance']['group_fetch_threshold'] = 0
+    batches = URLGenerator([stat(f'S{index}', f'B0100{index}_001E') for index in range(5)]).generate_batched_urls()
+    assert [len(batch['statistics']) for batch in batches] == [2, 2, 1]
+    assert [batch['strategy'] for batch in batches] == ['batched', 'batched', 'single']
+
+
+def test_geography_override_replaces_the_location_of_every_url(settings):
+    statistics = [stat('Median Income', 'S1901_C01_012E'), stat('Mean Income', 'S1901_C01_013E')]
+    ucgid = URLGenerator(statistics, {'ucgid': '1600000US1743250,1600000US1738570'}).generate_batched_urls()
+    assert len(ucgid) == 1 and ucgid[0]['primary'].endswith('get=S1901_C01_012E,S1901_C01_013E&ucgid=1600000US1743250,1600000US1738570')
+    wildcard = URLGenerator(statistics, {'for': 'place:*', 'in': 'state:17'}).generate_batched_urls()
+    assert wildcard[0]['primary'].endswith('get=S1901_C01_012E,S1901_C01_013E,NAME,GEO_ID&for=place:*&in=state:17')
+    assert wildcard[0]['geography'] == {'for': 'place:*', 'in': 'state:17'}
+    assert all('ucgid' not in urls['primary'] for urls in wildcard[0]['fallback'].values())
+
+
+def test_tables_with_enough_variables_are_fetched_as_a_group(settings):
+    settings['performance']['group_fetch_threshold'] = 3
+    statistics = [stat(f'Income {index}', f'S1901_C01_0{index:02d}E') for index in range(10, 14)] + [stat('Population', 'B01003_001E', dataset='acs/acs5')]
+    batches = URLGenerator(statistics).generate_batched_urls()
+    assert [batch['strategy'] for batch in batches] == ['group', 'single']
+    assert 'get=group(S1901)&ucgid=1600000US1743250' in batches[0]['primary']
+    assert batches[0]['statistics'] == {f'Income {index}': f'S1901_C01_0{index:02d}E' for index in range(10, 14)}
+
+
+def test_group_fetch_is_skipped_when_it_adds_requests(settings):
+    settings['performance']['group_fetch_threshold'] = 2
+    statistics = [stat('Income', 'S1901_C01_012E'), stat('Mean', 'S1901_C01_013E'), stat('Population', 'B01003_001E')]
+    assert [batch['strategy'] for batch in URLGenerator(statistics).generate_batched_urls()] == ['batched']
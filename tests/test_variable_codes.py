@@ -0,0 +1,53 @@
+import asyncio
+from census_api_client import CensusAPIClient
+from url_generator import URLGenerator
+from variable_codes import LearnedCodes, vintage_for, codes_of
+
+POPULATION = {'name': 'Population', 'api_url': 'https://api.census.gov/data/[year]/dec/pl?get=P1_001N&ucgid=1600000US1743250',
+              'years': [2010, 2020], 'vintages': [{'to': 2019, 'variable': 'P001001', 'dataset': 'dec/sf1'}]}
+
+
+def test_vintage_ranges_are_inclusive_and_open_ended():
+    vintages = {'vintages': [{'to': 2019, 'variable': 'A'}, {'from': 2020, 'to': 2021, 'variable': 'B'}]}
+    assert [vintage_for(vintages, year).get('variable') for year in (2000, 2019, 2020, 2021, 2022)] == ['A', 'A', 'B', 'B', None]
+    assert codes_of('https://api.census.gov/data/2022/acs/acs5?get=B01003_001E,NAME,GEO_ID&for=place:*') == ('acs/acs5', 'B01003_001E')
+
+
+def test_each_year_is_requested_with_its_vintage_code(settings):
+    batches = URLGenerator([POPULATION]).generate_batched_urls()
+    assert [batch['primary'].split('?')[0].rsplit('/data/', 1)[1] for batch in batches] == ['2010/dec/sf1', '2020/dec/pl']
+    assert [batch['statistics']['Population'] for batch in batches] == ['P001001', 'P1_001N']
+
+
+def test_learned_codes_are_requested_up_front(settings):
+    statistic = {'name': 'Income', 'api_url': 'https://api.census.gov/data/[year]/acs/acs5?get=B19013_001E&ucgid=1600000US1743250',
+                 'cell_number': 'B19013_001EA', 'years': [2021, 2022]}
+    codes = LearnedCodes()
+    codes.record(2021, 'https://api.census.gov/data/2021/acs/acs5?get=B19013_001E&ucgid=1600000US1743250',
+                 'https://api.census.gov/data/2021/acs/acs5?get=B19013_001EA&ucgid=1600000US1743250')
+    codes.close()
+    batches = URLGenerator([statistic]).generate_batched_urls()
+    assert [batch['statistics']['Income'] for batch in batches] == ['B19013_001EA', 'B19013_001E']
+    settings['variable_codes']['learn'] = False
+    assert [batch['statistics']['Income'] for batch in URLGenerator([statistic]).generate_batched_urls()] == ['B19013_001E'] * 2
+
+
+def test_client_writes_learned_codes_when_closed(settings):
+    primary = 'https://api.census.gov/data/2021/acs/acs5?get=B19013_001E&ucgid=1600000US1743250'
+    backup = 'https://api.census.gov/data/2021/acs/acs5?get=B19013_001EA&ucgid=1600000US1743250'
+
+    async def run():
+        async with CensusAPIClient() as client:
+            client.rejected_urls[primary] = None
+            client._learn_code(2021, primary, backup)
+            client._learn_code(2021, primary, backup)
+            # Nothing is written on the event loop while requests are running
+            assert LearnedCodes.load_mappings() == {}
+    asyncio.run(run())
+    learned = LearnedCodes.load_mappings()
+    assert learned == {('acs/acs5', 2021, 'B19013_001E'): 'B19013_001EA'}
+
+    # A service passes the mappings it loaded at startup instead of reading them per request
+    statistic = {'name': 'Income', 'api_url': primary.replace('2021', '[year]'), 'years': [2021]}
+    assert URLGenerator([statistic], learned_codes={}).generate_batched_urls()[0]['statistics']['Income'] == 'B19013_001E'
+    assert URLGenerator([statistic], learned_codes=learned).generate_batched_urls()[0]['statistics']['Income'] == 'B19013_001EA'
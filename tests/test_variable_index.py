@@ -0,0 +1,42 @@
+import json
+import pytest
+from input_parser import InputParser
+from variable_index import VariableIndex, parse_api_url
+
+VARIABLES = {'variables': {'S1901_C01_012E': {'label': 'Estimate!!Households!!Median income (dollars)', 'concept': 'INCOME', 'group': 'S1901'},
+                           'S1901_C01_013E': {'label': 'Estimate!!Households!!Mean income (dollars)', 'concept': 'INCOME', 'group': 'S1901'}}}
+
+
+@pytest.fixture
+def index(tmp_path):
+    metadata = tmp_path / 'metadata' / '2022' / 'acs' / 'acs5' / 'subject'
+    metadata.mkdir(parents=True)
+    (metadata / 'variables.json').write_text(json.dumps(VARIABLES))
+    (metadata / 'groups.json').write_text(json.dumps({'groups': [{'name': 'S1901', 'description': 'Income'}]}))
+    index = VariableIndex(str(tmp_path / 'variables.sqlite'))
+    assert index.build_from_directory(str(tmp_path / 'metadata')) == 1
+    yield index
+    index.close()
+
+
+def test_parse_api_url():
+    assert parse_api_url('https://api.census.gov/data/[year]/acs/acs5/profile?get=DP04_0002PE,NAME&ucgid=1') == ('acs/acs5/profile', ['DP04_0002PE', 'NAME'])
+
+
+def test_lookups_and_search(index):
+    assert index.has_dataset('acs/acs5/subject', 2022) and not index.has_dataset('acs/acs5/subject', 2021)
+    assert index.has_variable('acs/acs5/subject', 2022, 'S1901_C01_012E')
+    assert index.has_variable('acs/acs5/subject', 2022, 'group(S1901)') and index.has_variable('acs/acs5/subject', 2022, 'NAME')
+    assert not index.has_variable('acs/acs5/subject', 2022, 'S1901_C01_099E')
+    assert [row['name'] for row in index.search('median income')] == ['S1901_C01_012E']
+
+
+def test_configs_are_validated_offline(index):
+    def parser(variable, years=(2021, 2022)):
+        return InputParser.from_dict({'location': 'Chicago', 'statistics': [
+            {'name': 'Income', 'description': 'Income',
+             'api_url': f'https://api.census.gov/data/[year]/acs/acs5/subject?get={variable}&ucgid=1600000US1743250', 'years': list(years)}]})
+    # Vintages without indexed metadata are not checked
+    parser('S1901_C01_012E').validate_structure(index)
+    with pytest.raises(ValueError):
+        parser('S1901_C01_099E').validate_structure(index)